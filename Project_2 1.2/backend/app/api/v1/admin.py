@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Dict, Any
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, case, exists, or_
+from typing import Dict, Any, Optional
 
 from app.db.session import get_db
-from app.models.user import User, UserRole
+from app.core.analytics import analytics_snapshot
+from app.core.counters import bump_student_counter
+from app.core.pagination import DEFAULT_PAGE_SIZE, clamp_limit, keyset_filter, keyset_order, build_page
+from app.models.user import User, UserRole, Profile
 from app.models.job import Job
 from app.models.event import Event
 from app.models.file import FileUpload
@@ -21,10 +24,42 @@ router = APIRouter()
 
 # Removed duplicate /admin/analytics endpoint to avoid routing conflicts
 
+def get_file_flags_by_user(db: Session, user_ids=None) -> Dict[int, Dict[str, Any]]:
+    """Look up verified-resume and offer-letter file ids for many users in one grouped query"""
+    resume_id = func.min(case(
+        ((FileUpload.file_type == 'resume') & (FileUpload.is_verified == True), FileUpload.id)
+    ))
+    offer_letter_id = func.min(case(
+        (FileUpload.file_type == 'offer_letter', FileUpload.id)
+    ))
+    
+    query = db.query(
+        FileUpload.user_id,
+        resume_id.label("resume_file_id"),
+        offer_letter_id.label("offer_letter_file_id")
+    ).filter(FileUpload.file_type.in_(['resume', 'offer_letter']))
+    
+    if user_ids is not None:
+        if not user_ids:
+            return {}
+        query = query.filter(FileUpload.user_id.in_(user_ids))
+    
+    flags = {}
+    for row in query.group_by(FileUpload.user_id).all():
+        flags[row.user_id] = {
+            "resume_file_id": row.resume_file_id,
+            "offer_letter_file_id": row.offer_letter_file_id,
+        }
+    return flags
+
+
 @router.get("/admin/users")
 def get_all_users(db: Session = Depends(get_db)):
     """Get all users for manage users section"""
-    users = db.query(User).all()
+    # Profiles are fetched with a single IN query and file flags with one grouped
+    # query, so the number of statements stays constant regardless of user count
+    users = db.query(User).options(selectinload(User.profile)).order_by(User.id).all()
+    file_flags = get_file_flags_by_user(db)
     
     result = []
     for user in users:
@@ -37,22 +72,13 @@ def get_all_users(db: Session = Depends(get_db)):
             if role_value not in ['STUDENT', 'TPO', 'ADMIN']:
                 role_value = 'STUDENT'
         
-        # Check for uploaded and verified resume
-        from app.models.file import FileUpload
-        resume = db.query(FileUpload).filter(
-            FileUpload.user_id == user.id,
-            FileUpload.file_type == 'resume',
-            FileUpload.is_verified == True
-        ).first()
-        
-        # Check for uploaded offer letter (regardless of verification status)
-        offer_letter = db.query(FileUpload).filter(
-            FileUpload.user_id == user.id,
-            FileUpload.file_type == 'offer_letter'
-        ).first()
+        # Verified resume and offer letter (regardless of verification status)
+        flags = file_flags.get(user.id, {})
+        resume_file_id = flags.get("resume_file_id")
+        offer_letter_file_id = flags.get("offer_letter_file_id")
         
         # Get user's profile if exists
-        profile = user.profile if hasattr(user, 'profile') and user.profile else None
+        profile = user.profile
         
         user_info = {
             "id": user.id,
@@ -61,10 +87,10 @@ def get_all_users(db: Session = Depends(get_db)):
             "role": role_value,
             "status": "Active" if user.is_active else "Inactive",
             "created_at": user.created_at.isoformat() if user.created_at else None,
-            "has_verified_resume": resume is not None,
-            "has_verified_offer_letter": offer_letter is not None,
-            "resume_file_id": resume.id if resume else None,
-            "offer_letter_file_id": offer_letter.id if offer_letter else None,
+            "has_verified_resume": resume_file_id is not None,
+            "has_verified_offer_letter": offer_letter_file_id is not None,
+            "resume_file_id": resume_file_id,
+            "offer_letter_file_id": offer_letter_file_id,
         }
         
         if profile:
@@ -93,44 +119,62 @@ def get_all_users(db: Session = Depends(get_db)):
     return result
 
 
+def has_file_clause(file_type: str, verified_only: bool = False):
+    """EXISTS clause matching users that uploaded a file of the given type"""
+    conditions = [FileUpload.user_id == User.id, FileUpload.file_type == file_type]
+    if verified_only:
+        conditions.append(FileUpload.is_verified == True)
+    return exists().where(*conditions)
+
+
 @router.get("/admin/students")
-def get_all_students(db: Session = Depends(get_db)):
-    """Get all students with their profile information and placement status"""
-    # Query for students using string comparison to avoid enum issues
-    students = db.query(User).filter(User.role.like('%STUDENT%') | (func.upper(User.role) == 'STUDENT')).all()
+def get_all_students(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    placement_status: Optional[str] = None,
+    degree: Optional[str] = None,
+    year: Optional[str] = None,
+    is_approved: Optional[bool] = None,
+    has_verified_resume: Optional[bool] = None,
+    has_offer_letter: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    """Get a page of students with their profile information and placement status"""
+    limit = clamp_limit(limit)
+    
+    query = db.query(User, Profile).outerjoin(Profile, Profile.user_id == User.id).filter(
+        User.role == UserRole.STUDENT
+    )
+    
+    if placement_status:
+        if placement_status == 'Not Placed':
+            query = query.filter(or_(Profile.placement_status == placement_status, Profile.id.is_(None)))
+        else:
+            query = query.filter(Profile.placement_status == placement_status)
+    if degree:
+        query = query.filter(Profile.degree == degree)
+    if year:
+        query = query.filter(Profile.year == year)
+    if is_approved is not None:
+        query = query.filter(User.is_approved == is_approved)
+    if has_verified_resume is not None:
+        clause = has_file_clause('resume', verified_only=True)
+        query = query.filter(clause if has_verified_resume else ~clause)
+    if has_offer_letter is not None:
+        clause = has_file_clause('offer_letter')
+        query = query.filter(clause if has_offer_letter else ~clause)
+    if cursor:
+        query = query.filter(keyset_filter(User.created_at, User.id, cursor))
+    
+    rows = query.order_by(*keyset_order(User.created_at, User.id)).limit(limit + 1).all()
+    rows, next_cursor = build_page(rows, limit, key=lambda row: (row[0].created_at, row[0].id))
+    file_flags = get_file_flags_by_user(db, [student.id for student, _ in rows])
     
     result = []
-    for student in students:
-        # Handle role enum conversion gracefully
-        try:
-            role_value = student.role.value
-        except:
-            # If enum conversion fails, use the raw value and convert to uppercase
-            role_value = getattr(student, 'role', 'STUDENT').upper()
-            if role_value not in ['STUDENT', 'TPO', 'ADMIN']:
-                role_value = 'STUDENT'
-        
-        # Get student's profile
-        profile = student.profile if hasattr(student, 'profile') and student.profile else None
-        
-        # Check for uploaded and verified resume
-        resume = None
-        if profile:
-            from app.models.file import FileUpload
-            resume = db.query(FileUpload).filter(
-                FileUpload.user_id == student.id,
-                FileUpload.file_type == 'resume',
-                FileUpload.is_verified == True
-            ).first()
-        
-        # Check for uploaded offer letter (regardless of verification status)
-        offer_letter = None
-        if profile:
-            from app.models.file import FileUpload
-            offer_letter = db.query(FileUpload).filter(
-                FileUpload.user_id == student.id,
-                FileUpload.file_type == 'offer_letter'
-            ).first()
+    for student, profile in rows:
+        flags = file_flags.get(student.id, {})
+        resume_file_id = flags.get("resume_file_id")
+        offer_letter_file_id = flags.get("offer_letter_file_id")
         
         student_info = {
             "id": student.id,
@@ -141,7 +185,7 @@ def get_all_students(db: Session = Depends(get_db)):
             "profile_complete": student.profile_complete,
             "is_approved": student.is_approved,
             "created_at": student.created_at.isoformat() if student.created_at else None,
-            "role": role_value,
+            "role": UserRole.STUDENT.value,
             "placement_status": profile.placement_status if profile else "Not Placed",
             "company_name": profile.company_name if profile else None,
             "approval_status": profile.approval_status if profile else "Pending",
@@ -149,46 +193,45 @@ def get_all_students(db: Session = Depends(get_db)):
             "year": profile.year if profile else None,
             "skills": profile.skills if profile else None,
             "about": profile.about if profile else None,
-            "has_verified_resume": resume is not None,
-            "has_verified_offer_letter": offer_letter is not None,
-            "resume_file_id": resume.id if resume else None,
-            "offer_letter_file_id": offer_letter.id if offer_letter else None,
+            "has_verified_resume": resume_file_id is not None,
+            "has_verified_offer_letter": offer_letter_file_id is not None,
+            "resume_file_id": resume_file_id,
+            "offer_letter_file_id": offer_letter_file_id,
         }
         result.append(student_info)
     
-    return result
+    return {"items": result, "next_cursor": next_cursor}
 
 
 @router.get("/admin/tpos")
-def get_all_tpos(db: Session = Depends(get_db)):
-    """Get all TPO users with basic information"""
-    # Query for TPOs using string comparison to avoid enum issues
-    tpos = db.query(User).filter(User.role.like('%TPO%') | (func.upper(User.role) == 'TPO')).all()
+def get_all_tpos(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    is_approved: Optional[bool] = None,
+    is_active: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    """Get a page of TPO users with basic information"""
+    limit = clamp_limit(limit)
+    
+    query = db.query(User).filter(User.role == UserRole.TPO)
+    
+    if is_approved is not None:
+        query = query.filter(User.is_approved == is_approved)
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if cursor:
+        query = query.filter(keyset_filter(User.created_at, User.id, cursor))
+    
+    tpos = query.order_by(*keyset_order(User.created_at, User.id)).limit(limit + 1).all()
+    tpos, next_cursor = build_page(tpos, limit, key=lambda tpo: (tpo.created_at, tpo.id))
+    file_flags = get_file_flags_by_user(db, [tpo.id for tpo in tpos])
     
     result = []
     for tpo in tpos:
-        # Handle role enum conversion gracefully
-        try:
-            role_value = tpo.role.value
-        except:
-            # If enum conversion fails, use the raw value and convert to uppercase
-            role_value = getattr(tpo, 'role', 'STUDENT').upper()
-            if role_value not in ['STUDENT', 'TPO', 'ADMIN']:
-                role_value = 'TPO'
-        
-        # Check for uploaded and verified resume for TPO (if applicable)
-        from app.models.file import FileUpload
-        resume = db.query(FileUpload).filter(
-            FileUpload.user_id == tpo.id,
-            FileUpload.file_type == 'resume',
-            FileUpload.is_verified == True
-        ).first()
-        
-        # Check for uploaded offer letter for TPO (regardless of verification status)
-        offer_letter = db.query(FileUpload).filter(
-            FileUpload.user_id == tpo.id,
-            FileUpload.file_type == 'offer_letter'
-        ).first()
+        flags = file_flags.get(tpo.id, {})
+        resume_file_id = flags.get("resume_file_id")
+        offer_letter_file_id = flags.get("offer_letter_file_id")
         
         tpo_info = {
             "id": tpo.id,
@@ -198,15 +241,15 @@ def get_all_tpos(db: Session = Depends(get_db)):
             "status": "Active" if tpo.is_active else "Inactive",
             "is_approved": tpo.is_approved,
             "created_at": tpo.created_at.isoformat() if tpo.created_at else None,
-            "role": role_value,
-            "has_verified_resume": resume is not None,
-            "has_verified_offer_letter": offer_letter is not None,
-            "resume_file_id": resume.id if resume else None,
-            "offer_letter_file_id": offer_letter.id if offer_letter else None,
+            "role": UserRole.TPO.value,
+            "has_verified_resume": resume_file_id is not None,
+            "has_verified_offer_letter": offer_letter_file_id is not None,
+            "resume_file_id": resume_file_id,
+            "offer_letter_file_id": offer_letter_file_id,
         }
         result.append(tpo_info)
     
-    return result
+    return {"items": result, "next_cursor": next_cursor}
 
 
 @router.get("/admin/user/{user_id}")
@@ -329,7 +372,7 @@ def create_user(
     """Create a new user"""
     from app.models.user import User, UserRole
     from app.core.config import settings
-    from werkzeug.security import generate_password_hash
+    from app.core.passwords import hash_password
     import secrets
     
     # Check if user already exists
@@ -354,11 +397,12 @@ def create_user(
         last_name=user_data.last_name,
         phone_number=user_data.phone_number,
         role=role_upper,
-        hashed_password=generate_password_hash(user_data.password),
+        hashed_password=hash_password(user_data.password),
         is_approved=True  # Auto-approve users created by admin
     )
     
     db.add(db_user)
+    bump_student_counter(db, role_upper)
     db.commit()
     db.refresh(db_user)
     
@@ -449,50 +493,108 @@ def deactivate_user(user_id: int, db: Session = Depends(get_db)):
 
 
 # CSV export functionality
+from fastapi import HTTPException, Request
 from fastapi.responses import StreamingResponse
 from io import StringIO
+from datetime import datetime
+from sqlalchemy import select
 import csv
+import zlib
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def _yes_no(value):
+    return "Yes" if value else "No"
+
+
+# Exportable columns: key -> (header, column, formatter)
+EXPORT_COLUMNS = {
+    "id": ("ID", User.id, None),
+    "email": ("Email", User.email, None),
+    "first_name": ("First Name", User.first_name, None),
+    "last_name": ("Last Name", User.last_name, None),
+    "phone_number": ("Phone Number", User.phone_number, None),
+    "role": ("Role", User.role, lambda role: role.value if hasattr(role, 'value') else role),
+    "status": ("Status", User.is_active, lambda active: "Active" if active else "Inactive"),
+    "profile_complete": ("Profile Complete", User.profile_complete, _yes_no),
+    "approved": ("Approved", User.is_approved, _yes_no),
+    "created_at": ("Created At", User.created_at, lambda created_at: created_at.isoformat() if created_at else None),
+}
+
+
+def generate_users_csv(db: Session, stmt, columns):
+    """Yield the CSV export as encoded chunks of EXPORT_BATCH_SIZE rows"""
+    formatters = [EXPORT_COLUMNS[key][2] for key in columns]
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    
+    writer.writerow([EXPORT_COLUMNS[key][0] for key in columns])
+    
+    # yield_per streams rows through a server-side cursor where the driver supports it
+    result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for partition in result.partitions():
+        for row in partition:
+            writer.writerow([
+                fmt(value) if fmt else value
+                for fmt, value in zip(formatters, row)
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+    
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of byte chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
 
 @router.get("/admin/export-users")
-def export_users_csv(db: Session = Depends(get_db)):
-    """Export all users data to CSV format"""
-    users = db.query(User).all()
-    
-    # Create a StringIO object to write CSV data
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Write header row
-    writer.writerow([
-        "ID", "Email", "First Name", "Last Name", "Phone Number", 
-        "Role", "Status", "Profile Complete", "Approved", "Created At"
-    ])
-    
-    # Write data rows
-    for user in users:
-        writer.writerow([
-            user.id,
-            user.email,
-            user.first_name,
-            user.last_name,
-            user.phone_number,
-            user.role.value if hasattr(user.role, 'value') else user.role,
-            "Active" if user.is_active else "Inactive",
-            "Yes" if user.profile_complete else "No",
-            "Yes" if user.is_approved else "No",
-            user.created_at.isoformat() if user.created_at else None
-        ])
-    
-    # Get the CSV content
-    csv_content = output.getvalue()
-    output.close()
-    
-    # Create a streaming response
-    def generate():
-        yield csv_content.encode('utf-8')
-    
-    return StreamingResponse(generate(), media_type="text/csv", headers={"Content-Disposition": "attachment; filename=users_export.csv"})
+def export_users_csv(
+    request: Request,
+    columns: Optional[str] = None,
+    role: Optional[UserRole] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Export users data to CSV format, streamed in batches"""
+    # Comma-separated column keys, defaulting to every column
+    selected = list(EXPORT_COLUMNS)
+    if columns:
+        selected = [key.strip() for key in columns.split(",") if key.strip()]
+        unknown = [key for key in selected if key not in EXPORT_COLUMNS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown export columns: {', '.join(unknown)}. Available: {', '.join(EXPORT_COLUMNS)}"
+            )
+    
+    stmt = select(*[EXPORT_COLUMNS[key][1] for key in selected]).order_by(User.id)
+    if role:
+        stmt = stmt.where(User.role == role)
+    if created_from:
+        stmt = stmt.where(User.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(User.created_at < created_to)
+    
+    body = generate_users_csv(db, stmt, selected)
+    headers = {"Content-Disposition": "attachment; filename=users_export.csv", "Vary": "Accept-Encoding"}
+    
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    
+    return StreamingResponse(body, media_type="text/csv", headers=headers)
 
 
 @router.get("/admin/pending-certificates")
@@ -520,100 +622,32 @@ def get_pending_certificates(db: Session = Depends(get_db)):
     return result
 
 
+@router.get("/admin/db-metrics")
+def get_db_metrics(reset: bool = False):
+    """Connection pool occupancy, checkout wait and session hold times per engine"""
+    from app.db import session as db_session
+    from app.core.db_metrics import sync_pool_metrics, async_pool_metrics
+    
+    metrics = {"sync": sync_pool_metrics.snapshot(db_session.engine.pool)}
+    if db_session.async_engine is not None:
+        metrics["async"] = async_pool_metrics.snapshot(db_session.async_engine.pool)
+    
+    # ?reset=true starts a new measurement window after reading
+    if reset:
+        sync_pool_metrics.reset()
+        async_pool_metrics.reset()
+    return metrics
+
+
 @router.get("/admin/analytics")
-def get_analytics(db: Session = Depends(get_db)):
+def get_analytics(fresh: bool = False, db: Session = Depends(get_db)):
     """Get comprehensive analytics data for the admin dashboard"""
-    from app.models.user import User, Profile
-    from app.models.job import Job
-    from app.models.event import Event
-    from app.models.notification import Notification
-    from sqlalchemy import func
-    
-    # Total Users
-    total_users = db.query(User).count()
-    
-    # Total Students and TPOs
-    total_students = db.query(User).filter(
-        (User.role == 'STUDENT') | (func.upper(User.role) == 'STUDENT')
-    ).count()
-    
-    total_tpos = db.query(User).filter(
-        (User.role == 'TPO') | (func.upper(User.role) == 'TPO')
-    ).count()
-    
-    # Placed vs Unplaced Students (based on offer letter upload)
-    from app.models.file import FileUpload
-    
-    # Students who have uploaded offer letters (regardless of verification)
-    placed_students_subquery = db.query(FileUpload.user_id).filter(
-        FileUpload.file_type == 'offer_letter'
-    ).subquery()
-    
-    placed_students = db.query(User).filter(
-        (User.role == 'STUDENT') | (func.upper(User.role) == 'STUDENT'),
-        User.id.in_(placed_students_subquery)
-    ).count()
-    
-    # Students who have NOT uploaded offer letters
-    unplaced_students = total_students - placed_students
-    
-    # Active vs Inactive Jobs
-    total_jobs = db.query(Job).count()
-    active_jobs = db.query(Job).filter(Job.is_active == True).count()
-    inactive_jobs = total_jobs - active_jobs
-    
-    # Total Applications
-    total_applications = db.query(Notification).filter(
-        Notification.notification_type == 'APPLICATION_UPDATE'
-    ).count()
-    
-    # Total Events and Registrations
-    total_events = db.query(Event).count()
-    
-    # Count events by status
-    upcoming_events = db.query(Event).filter(Event.status == 'Upcoming').count()
-    completed_events = db.query(Event).filter(Event.status == 'Completed').count()
-    cancelled_events = db.query(Event).filter(Event.status == 'Cancelled').count()
-    
-    # Count registrations for events
-    from app.models.event import EventRegistration
-    total_registrations = db.query(EventRegistration).count()
-    
-    # Calculate placement percentage
-    placement_percentage = 0
-    if total_students > 0:
-        placement_percentage = round((placed_students / total_students) * 100, 2)
-    
-    # Active vs Inactive Users
-    active_users = db.query(User).filter(User.is_active == True).count()
-    inactive_users = total_users - active_users
-    
-    # Prepare analytics data
-    analytics_data = {
-        "totalUsers": total_users,
-        "totalStudents": total_students,
-        "totalTPO": total_tpos,
-        "placedStudents": placed_students,
-        "unplacedStudents": unplaced_students,
-        "activeJobs": active_jobs,
-        "inactiveJobs": inactive_jobs,
-        "totalApplications": total_applications,
-        "totalEvents": total_events,
-        "upcomingEvents": upcoming_events,
-        "completedEvents": completed_events,
-        "cancelledEvents": cancelled_events,
-        "totalRegistrations": total_registrations,
-        "placementPercentage": placement_percentage,
-        "totalJobs": total_jobs,
-        "activeUsers": active_users,
-        "inactiveUsers": inactive_users,
-    }
-    
-    return analytics_data
+    # Served from the in-process snapshot; ?fresh=true forces a recompute
+    return analytics_snapshot.get(db, fresh=fresh)
 
 
 @router.get("/admin/analytics/report")
-def get_analytics_report(db: Session = Depends(get_db)):
+def get_analytics_report(fresh: bool = False, db: Session = Depends(get_db)):
     """Generate a PDF report of the analytics data"""
     from fastapi.responses import StreamingResponse
     import io
@@ -626,7 +660,7 @@ def get_analytics_report(db: Session = Depends(get_db)):
     
     try:
         # Get the analytics data
-        analytics_data = get_analytics(db)
+        analytics_data = analytics_snapshot.get(db, fresh=fresh)
         
         # Create a PDF in memory
         buffer = io.BytesIO()
@@ -723,7 +757,7 @@ def get_analytics_report(db: Session = Depends(get_db)):
 
 
 @router.get("/admin/analytics/report-text")
-def get_analytics_report_text(db: Session = Depends(get_db)):
+def get_analytics_report_text(fresh: bool = False, db: Session = Depends(get_db)):
     """Generate a text report of the analytics data"""
     from fastapi.responses import StreamingResponse
     import io
@@ -731,7 +765,7 @@ def get_analytics_report_text(db: Session = Depends(get_db)):
     
     try:
         # Get the analytics data
-        analytics_data = get_analytics(db)
+        analytics_data = analytics_snapshot.get(db, fresh=fresh)
         
         # Create a text report
         report_content = []
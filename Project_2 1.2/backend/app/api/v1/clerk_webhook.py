@@ -1,150 +1,56 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 import json
-import hmac
-import hashlib
-from typing import Dict, Any
 
 from app.db.session import get_db
-from app.models.user import User
-from app.schemas.user import UserCreate
 from app.core.config import settings
+from app.core.clerk_webhooks import (
+    USER_EVENTS, InvalidWebhookSignature, record_webhook_event, verify_svix_signature
+)
 
 router = APIRouter()
 
-# Webhook secret from Clerk dashboard
-# In production, this should be stored in environment variables
-WEBHOOK_SECRET = "whsec_your_webhook_secret_here"
-
-def verify_webhook_signature(payload: bytes, signature: str, secret: str) -> bool:
-    """
-    Verify the webhook signature from Clerk
-    """
-    expected_signature = hmac.new(
-        secret.encode('utf-8'),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
-    
-    return hmac.compare_digest(expected_signature, signature)
-
 @router.post("/webhook", status_code=status.HTTP_200_OK)
 async def clerk_webhook(
-    request: Request, 
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
-    Handle Clerk webhook events for user creation and updates
+    Receive Clerk webhook events. Events are stored in the inbox and applied
+    by a background task, so this only verifies, de-duplicates and acknowledges.
     """
     # Get the payload
     payload = await request.body()
-    
-    # Get the signature from headers
-    signature = request.headers.get("svix-signature")
-    
-    # Verify the webhook signature (in production)
-    # if not verify_webhook_signature(payload, signature, WEBHOOK_SECRET):
-    #     raise HTTPException(status_code=400, detail="Invalid signature")
-    
+
+    # Secret from the Clerk dashboard (Webhooks > endpoint > Signing Secret)
+    if not settings.CLERK_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="Webhook secret is not configured")
+
+    svix_id = request.headers.get("svix-id")
+    try:
+        verify_svix_signature(
+            settings.CLERK_WEBHOOK_SECRET,
+            svix_id,
+            request.headers.get("svix-timestamp"),
+            request.headers.get("svix-signature"),
+            payload
+        )
+    except InvalidWebhookSignature:
+        raise HTTPException(status_code=400, detail="Invalid signature")
+
     # Parse the JSON payload
     try:
         data = json.loads(payload.decode('utf-8'))
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, UnicodeDecodeError):
         raise HTTPException(status_code=400, detail="Invalid JSON")
-    
-    # Handle different event types
-    event_type = data.get("type")
-    
-    if event_type == "user.created":
-        return handle_user_created(data, db)
-    elif event_type == "user.updated":
-        return handle_user_updated(data, db)
-    elif event_type == "user.deleted":
-        return handle_user_deleted(data, db)
-    
-    return {"message": "Event processed"}
 
-def handle_user_created(data: Dict[str, Any], db: Session):
-    """
-    Handle user creation event from Clerk
-    """
-    user_data = data.get("data", {})
-    
-    # Extract user information
-    clerk_user_id = user_data.get("id")
-    email_addresses = user_data.get("email_addresses", [])
-    first_name = user_data.get("first_name", "")
-    last_name = user_data.get("last_name", "")
-    
-    # Get email (primary email if multiple)
-    email = ""
-    if email_addresses:
-        primary_email = next((email for email in email_addresses if email.get("id") == user_data.get("primary_email_address_id")), email_addresses[0])
-        email = primary_email.get("email_address", "")
-    
-    # Get role from unsafe_metadata
-    unsafe_metadata = user_data.get("unsafe_metadata", {})
-    role = unsafe_metadata.get("role", "STUDENT")  # Default to STUDENT
-    
-    # Check if user already exists
-    existing_user = db.query(User).filter(User.clerk_user_id == clerk_user_id).first()
-    if existing_user:
-        return {"message": "User already exists"}
-    
-    # Create new user with the role from signup
-    db_user = User(
-        clerk_user_id=clerk_user_id,
-        email=email,
-        first_name=first_name,
-        last_name=last_name,
-        role=role  # This will use the role selected during signup
-    )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return {"message": "User created successfully", "user_id": db_user.id}
+    event_type = data.get("type")
+    if event_type not in USER_EVENTS:
+        return {"message": "Event ignored"}
 
-def handle_user_updated(data: Dict[str, Any], db: Session):
-    """
-    Handle user update event from Clerk
-    """
-    user_data = data.get("data", {})
-    clerk_user_id = user_data.get("id")
-    
-    # Find user in database
-    db_user = db.query(User).filter(User.clerk_user_id == clerk_user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Update user information
-    email_addresses = user_data.get("email_addresses", [])
-    if email_addresses:
-        primary_email = next((email for email in email_addresses if email.get("id") == user_data.get("primary_email_address_id")), email_addresses[0])
-        db_user.email = primary_email.get("email_address", "")
-    
-    db_user.first_name = user_data.get("first_name", db_user.first_name)
-    db_user.last_name = user_data.get("last_name", db_user.last_name)
-    
+    # Redeliveries of an event already in the inbox are acknowledged again
+    if not record_webhook_event(db, svix_id, event_type, data.get("data") or {}):
+        return {"message": "Duplicate event"}
     db.commit()
-    db.refresh(db_user)
-    
-    return {"message": "User updated successfully"}
 
-def handle_user_deleted(data: Dict[str, Any], db: Session):
-    """
-    Handle user deletion event from Clerk
-    """
-    user_data = data.get("data", {})
-    clerk_user_id = user_data.get("id")
-    
-    # Find and delete user
-    db_user = db.query(User).filter(User.clerk_user_id == clerk_user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    db.delete(db_user)
-    db.commit()
-    
-    return {"message": "User deleted successfully"}
\ No newline at end of file
+    return {"message": "Event received"}
@@ -1,7 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
+from app.core.counters import bump_counter, EVENT_REGISTRATIONS_TOTAL
 from app.models.event import Event, EventRegistration
 from app.schemas.event import EventCreate, EventResponse, EventUpdate
 from pydantic import BaseModel
@@ -50,6 +53,7 @@ def register_event(event_id: int, registration: EventRegistrationCreate, db: Ses
     
     # Update count
     event.registered_count += 1
+    bump_counter(db, EVENT_REGISTRATIONS_TOTAL)
     
     db.commit()
     db.refresh(new_reg)
@@ -69,21 +73,21 @@ def create_event(event: EventCreate, db: Session = Depends(get_db)):
     return db_event
 
 @router.get("/", response_model=List[EventResponse])
-def get_events(
+async def get_events(
     skip: int = 0, 
     limit: int = 100, 
     status: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Event)
+    query = select(Event)
     if status:
-        query = query.filter(Event.status == status)
-    events = query.offset(skip).limit(limit).all()
-    return events
+        query = query.where(Event.status == status)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.get("/{event_id}", response_model=EventResponse)
-def get_event(event_id: int, db: Session = Depends(get_db)):
-    db_event = db.query(Event).filter(Event.id == event_id).first()
+async def get_event(event_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_event = await db.get(Event, event_id)
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     return db_event
@@ -108,6 +112,9 @@ def delete_event(event_id: int, db: Session = Depends(get_db)):
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
+    # Registrations are removed with the event (cascade)
+    registration_count = db.query(EventRegistration).filter(EventRegistration.event_id == event_id).count()
     db.delete(db_event)
+    bump_counter(db, EVENT_REGISTRATIONS_TOTAL, -registration_count)
     db.commit()
     return {"message": "Event deleted successfully"}
\ No newline at end of file
@@ -1,36 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Body
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form, Body
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
-import uuid
 from pathlib import Path
-import boto3
 from botocore.exceptions import ClientError
-import base64
 import hashlib
-from datetime import datetime
+import re
 
-from app.db.session import get_db
-from app.models.file import FileUpload
+from app.db.session import get_db, get_async_db
+from app.models.file import FileUpload, FileBlob
+from app.schemas.file import UploadIntentCreate, UploadIntentResponse, PresignedUrlBatchRequest, BulkFileReview
 from app.models.user import User
 from app.core.config import settings
+from app.core.counters import bump_file_counter
+from app.core.blobs import acquire_blob, delete_after_commit, register_blob, store_blob, release_blob
+from app.core.downloads import FileMeta, download_meta, serve_local_file
+from app.core.streaming import JsonBase64FieldReader
+from app.core.storage import (
+    FileTooLarge, hash_upload_file, iter_upload_file, spool_stream, iter_spool, is_r2_path, r2_file_url,
+    r2_enabled, blob_key, new_blob_key, presign_blob_upload, verify_r2_blob, presigned_urls
+)
 
 router = APIRouter()
 
-# Initialize S3 client
-s3_client = None
-if settings.R2_ACCESS_KEY_ID and settings.R2_SECRET_ACCESS_KEY and settings.R2_ENDPOINT:
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=settings.R2_ENDPOINT,
-        aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-        region_name='auto'
-    )
-
 # Create local upload directory if it doesn't exist
 Path(settings.UPLOAD_FOLDER).mkdir(parents=True, exist_ok=True)
 
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+INTENT_KEY_SUFFIX = re.compile(r"^[0-9a-f]{32}$")
+MAX_PRESIGNED_BATCH = 500
+MAX_BULK_REVIEW = 1000
+
 def get_file_hash(content: bytes) -> str:
     return hashlib.sha256(content).hexdigest()
 
@@ -42,221 +45,345 @@ async def upload_r2_multipart(
     db: Session = Depends(get_db)
 ):
     # Verify user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    await run_in_threadpool(check_user_exists, db, user_id)
 
     # Validate file size
     if file.size and file.size > settings.MAX_FILE_SIZE:
         raise HTTPException(status_code=400, detail="File size exceeds limit")
     
-    # Read file content
-    content = await file.read()
-    if len(content) > settings.MAX_FILE_SIZE:
-         raise HTTPException(status_code=400, detail="File size exceeds limit")
+    # Hash the spooled upload first; content already stored under that hash
+    # is reused, anything new is streamed to R2 (or local storage) in chunks
+    try:
+        file_hash, _ = await hash_upload_file(file)
+        blob = await store_blob(db, file_hash, lambda: iter_upload_file(file), user_id, file.filename, file.content_type)
+    except FileTooLarge:
+        raise HTTPException(status_code=400, detail="File size exceeds limit")
+    except Exception as e:
+        print(f"R2 upload error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
 
-    file_hash = get_file_hash(content)
-    
-    # Generate safe filename and key
-    safe_name = f"{int(datetime.now().timestamp())}_{file.filename}"
-    object_key = f"{user_id}/{safe_name}"
-    
-    file_url = ""
-    file_path = ""
+    # Save to DB
+    return await run_in_threadpool(record_upload, db, blob, user_id, file.filename, file.content_type, file_type)
 
-    if s3_client and settings.R2_BUCKET_NAME:
-        try:
-            s3_client.put_object(
-                Bucket=settings.R2_BUCKET_NAME,
-                Key=object_key,
-                Body=content,
-                ContentType=file.content_type
-            )
-            file_url = f"{settings.R2_ENDPOINT}/{settings.R2_BUCKET_NAME}/{object_key}"
-            file_path = object_key
-        except Exception as e:
-            print(f"R2 upload error: {e}")
-            raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
-    else:
-        # Fallback to local storage
-        local_filename = f"{uuid.uuid4()}_{file.filename}"
-        local_path = Path(settings.UPLOAD_FOLDER) / local_filename
-        with open(local_path, "wb") as f:
-            f.write(content)
-        file_path = str(local_path)
-        file_url = f"{settings.API_V1_STR}/files/{local_filename}/download" # Placeholder
+def check_user_exists(db: Session, user_id: int):
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    # Save to DB
+def local_download_url(file_id: int) -> str:
+    return f"{settings.API_V1_STR}/files/{file_id}/download"
+
+def record_upload(db: Session, blob: FileBlob, user_id: int, file_name: str, mime_type: str,
+                  file_type: str) -> FileUpload:
+    """Insert the FileUpload for a blob whose reference was taken and commit"""
     db_file = FileUpload(
         user_id=user_id,
-        file_name=file.filename,
-        file_path=file_path,
-        file_size=len(content),
-        mime_type=file.content_type,
+        file_name=file_name,
+        file_path=blob.file_path,
+        file_size=blob.file_size,
+        mime_type=mime_type,
         file_type=file_type,
-        file_url=file_url,
-        file_hash=file_hash,
+        file_hash=blob.file_hash,
         status="Pending"
     )
     db.add(db_file)
+    if blob.storage == "r2":
+        db_file.file_url = r2_file_url(blob.file_path)
+    else:
+        # Local files are served by the download endpoint, which needs the id
+        db.flush()
+        db_file.file_url = local_download_url(db_file.id)
+    bump_file_counter(db, file_type)
     db.commit()
     db.refresh(db_file)
-    
     return db_file
 
-@router.post("/upload")
-async def upload_base64(
-    payload: dict = Body(...),
+async def save_spooled_upload(db: Session, spool, file_hash: str, user_id: int,
+                              file_name: str, mime_type: str, file_type: str) -> FileUpload:
+    """
+    Store spooled content (or reuse an identical blob) and record the
+    FileUpload; database work runs in the threadpool, off the event loop
+    """
+    try:
+        blob = await store_blob(db, file_hash, lambda: iter_spool(spool), user_id, file_name, mime_type)
+    except Exception as e:
+        print(f"R2 upload error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
+
+    return await run_in_threadpool(record_upload, db, blob, user_id, file_name, mime_type, file_type)
+
+@router.post("/upload-binary")
+async def upload_binary(
+    request: Request,
+    user_id: int,
+    file_type: str,
+    file_name: str,
     db: Session = Depends(get_db)
 ):
-    user_id = payload.get("user_id")
-    file_name = payload.get("file_name")
-    mime_type = payload.get("mime_type")
-    file_type = payload.get("file_type")
-    content_base64 = payload.get("content_base64")
-
-    if not all([user_id, file_name, mime_type, file_type, content_base64]):
-        raise HTTPException(status_code=400, detail="Missing fields")
+    """
+    Upload raw file bytes as the request body, plain or with chunked
+    transfer encoding. The Content-Type header is stored as the MIME type.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File size exceeds limit")
 
     # Verify user exists
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    await run_in_threadpool(check_user_exists, db, user_id)
 
     try:
-        content = base64.b64decode(content_base64)
-    except:
-        raise HTTPException(status_code=400, detail="Invalid base64 content")
+        spool, file_hash, size = await spool_stream(request.stream())
+    except FileTooLarge:
+        raise HTTPException(status_code=400, detail="File size exceeds limit")
+    if size == 0:
+        spool.close()
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    mime_type = request.headers.get("content-type") or "application/octet-stream"
+    try:
+        return await save_spooled_upload(db, spool, file_hash, user_id, file_name, mime_type, file_type)
+    finally:
+        spool.close()
+
+async def _decode_base64_body(request: Request, reader: JsonBase64FieldReader):
+    async for chunk in request.stream():
+        decoded = reader.feed(chunk)
+        if decoded:
+            yield decoded
+
+@router.post("/upload")
+async def upload_base64(request: Request, db: Session = Depends(get_db)):
+    """
+    Legacy JSON upload: {user_id, file_name, mime_type, file_type, content_base64}.
+    content_base64 is decoded incrementally as the body streams in; prefer
+    /upload-binary or /upload-intent for new clients.
+    """
+    # Content problems are only recorded while streaming, so the checks below
+    # keep their original order: fields, user, base64, then size
+    reader = JsonBase64FieldReader("content_base64", max_size=settings.MAX_FILE_SIZE)
+    spool, file_hash, size = await spool_stream(_decode_base64_body(request, reader))
+
+    try:
+        try:
+            payload = reader.close()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+        user_id = payload.get("user_id")
+        file_name = payload.get("file_name")
+        mime_type = payload.get("mime_type")
+        file_type = payload.get("file_type")
 
-    if len(content) > settings.MAX_FILE_SIZE:
+        if not all([user_id, file_name, mime_type, file_type, reader.value_size]):
+            raise HTTPException(status_code=400, detail="Missing fields")
+
+        # Verify user exists
+        await run_in_threadpool(check_user_exists, db, user_id)
+
+        if reader.invalid:
+            raise HTTPException(status_code=400, detail="Invalid base64 content")
+        if reader.too_large:
+            raise HTTPException(status_code=400, detail="File size exceeds limit")
+        if not size:
+            raise HTTPException(status_code=400, detail="Missing fields")
+
+        return await save_spooled_upload(db, spool, file_hash, user_id, file_name, mime_type, file_type)
+    finally:
+        spool.close()
+
+@router.post("/upload-r2")
+async def upload_r2_base64(request: Request, db: Session = Depends(get_db)):
+    return await upload_base64(request, db)
+
+def check_upload_intent(intent: UploadIntentCreate, db: Session):
+    if not SHA256_HEX.match(intent.file_hash):
+        raise HTTPException(status_code=400, detail="file_hash must be a lowercase hex SHA-256")
+    if intent.file_size <= 0 or intent.file_size > settings.MAX_FILE_SIZE:
         raise HTTPException(status_code=400, detail="File size exceeds limit")
+    user = db.query(User).filter(User.id == intent.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
 
-    file_hash = get_file_hash(content)
+def owned_blob(intent: UploadIntentCreate, db: Session) -> Optional[FileBlob]:
+    """
+    The stored blob for the intent's hash, if this user already uploaded it.
+    Anyone else must upload the bytes themselves: the hash alone (shown by the
+    file-info endpoints) is no proof of having the content.
+    """
+    owned = db.query(FileUpload.id).filter(
+        FileUpload.user_id == intent.user_id, FileUpload.file_hash == intent.file_hash
+    ).first()
+    if owned is None:
+        return None
+    return db.query(FileBlob).filter(FileBlob.file_hash == intent.file_hash).first()
+
+
+def check_intent_object_key(intent: UploadIntentCreate, db: Session):
+    """
+    The object_key must be a per-intent key for this hash that is not stored
+    yet. Keys of stored files are visible through the file-info endpoints,
+    so they prove nothing, and the duplicate copy is deleted after completion.
+    """
+    key = intent.object_key or ""
+    prefix = f"{blob_key(intent.file_hash)}."
+    if not (key.startswith(prefix) and INTENT_KEY_SUFFIX.match(key[len(prefix):])):
+        raise HTTPException(status_code=400, detail="object_key from /upload-intent is required")
+    blob = db.get(FileBlob, intent.file_hash)
+    stored = db.query(FileUpload.id).filter(
+        FileUpload.file_hash == intent.file_hash, FileUpload.file_path == key
+    ).first()
+    if (blob and blob.file_path == key) or stored:
+        raise HTTPException(status_code=400, detail="This upload was already completed")
+
+
+@router.post("/upload-intent", response_model=UploadIntentResponse)
+def create_upload_intent(intent: UploadIntentCreate, db: Session = Depends(get_db)):
+    """
+    Start a direct-to-R2 upload. PUT the file to the returned url with the
+    returned headers, then call /upload-complete with the same body plus the
+    returned object_key. Content this user already uploaded needs no upload.
+    """
+    check_upload_intent(intent, db)
     
-    safe_name = f"{int(datetime.now().timestamp())}_{file_name}"
-    object_key = f"{user_id}/{safe_name}"
+    blob = owned_blob(intent, db)
+    if blob:
+        return UploadIntentResponse(upload_required=False, object_key=blob.file_path)
     
-    file_url = ""
-    file_path = ""
+    if not r2_enabled():
+        raise HTTPException(status_code=400, detail="Direct uploads require cloud storage")
+    
+    # A fresh key per intent, so completing proves this caller PUT the bytes
+    object_key = new_blob_key(intent.file_hash)
+    expires_in = settings.PRESIGNED_UPLOAD_EXPIRES_SECONDS
+    presigned = presign_blob_upload(object_key, intent.file_hash, intent.file_size, intent.mime_type, expires_in)
+    return UploadIntentResponse(
+        upload_required=True,
+        object_key=object_key,
+        url=presigned["url"],
+        method="PUT",
+        headers=presigned["headers"],
+        expires_in=expires_in
+    )
 
-    if s3_client and settings.R2_BUCKET_NAME:
-        try:
-            s3_client.put_object(
-                Bucket=settings.R2_BUCKET_NAME,
-                Key=object_key,
-                Body=content,
-                ContentType=mime_type
-            )
-            file_url = f"{settings.R2_ENDPOINT}/{settings.R2_BUCKET_NAME}/{object_key}"
-            file_path = object_key
-        except Exception as e:
-            print(f"R2 upload error: {e}")
-            raise HTTPException(status_code=500, detail="Failed to upload to cloud storage")
-    else:
-        local_filename = f"{uuid.uuid4()}_{file_name}"
-        local_path = Path(settings.UPLOAD_FOLDER) / local_filename
-        with open(local_path, "wb") as f:
-            f.write(content)
-        file_path = str(local_path)
-        file_url = f"{settings.API_V1_STR}/files/local/{local_filename}"
 
-    db_file = FileUpload(
-        user_id=user_id,
-        file_name=file_name,
-        file_path=file_path,
-        file_size=len(content),
-        mime_type=mime_type,
-        file_type=file_type,
-        file_url=file_url,
-        file_hash=file_hash,
-        status="Pending"
-    )
-    db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
+@router.post("/upload-complete")
+def complete_upload(intent: UploadIntentCreate, db: Session = Depends(get_db)):
+    """Record a direct upload once its size and hash check out"""
+    check_upload_intent(intent, db)
     
-    return db_file
-
-@router.post("/upload-r2")
-async def upload_r2_base64(
-    payload: dict = Body(...),
-    db: Session = Depends(get_db)
-):
-    return await upload_base64(payload, db)
+    blob = acquire_blob(db, intent.file_hash) if owned_blob(intent, db) else None
+    if blob is None:
+        if not r2_enabled():
+            raise HTTPException(status_code=400, detail="Direct uploads require cloud storage")
+        check_intent_object_key(intent, db)
+        try:
+            error = verify_r2_blob(intent.object_key, intent.file_hash, intent.file_size)
+        except ClientError as e:
+            print(f"R2 verification error: {e}")
+            raise HTTPException(status_code=500, detail="Failed to verify upload")
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        blob = register_blob(db, intent.file_hash, intent.object_key, intent.file_size, "r2")
+        if blob.file_path != intent.object_key:
+            # The same bytes were already stored; the uploaded copy only proved possession
+            delete_after_commit(db, intent.object_key, True)
+    elif blob.file_size != intent.file_size:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Uploaded size does not match")
+    
+    return record_upload(db, blob, intent.user_id, intent.file_name, intent.mime_type, intent.file_type)
 
 @router.get("/by-user/{user_id}")
-async def get_user_files(user_id: int, db: Session = Depends(get_db)):
-    files = db.query(FileUpload).filter(FileUpload.user_id == user_id).order_by(FileUpload.uploaded_at.desc()).all()
-    return files
+async def get_user_files(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+        select(FileUpload).where(FileUpload.user_id == user_id).order_by(FileUpload.uploaded_at.desc())
+    )
+    return result.scalars().all()
 
 @router.get("/{file_id}")
-async def get_file_info(file_id: int, db: Session = Depends(get_db)):
-    file = db.query(FileUpload).filter(FileUpload.id == file_id).first()
+async def get_file_info(file_id: int, db: AsyncSession = Depends(get_async_db)):
+    file = await db.get(FileUpload, file_id)
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     return file
 
-@router.get("/{file_id}/presigned")
-async def get_presigned_url(file_id: int, db: Session = Depends(get_db)):
-    file = db.query(FileUpload).filter(FileUpload.id == file_id).first()
-    if not file:
-        raise HTTPException(status_code=404, detail="File not found")
-
-    is_r2 = False
-    if s3_client and settings.R2_BUCKET_NAME:
-        if file.file_path and file.file_path[0].isdigit() and "uploads" not in file.file_path:
-             is_r2 = True
+async def get_file_meta(file_id: int, db: AsyncSession) -> FileMeta:
+    # Repeat lookups are answered from cached metadata without a query
+    file = download_meta.get(file_id)
+    if file is None:
+        row = await db.get(FileUpload, file_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="File not found")
+        file = FileMeta.from_row(row)
+        download_meta.set(file_id, file)
+    return file
 
-    if is_r2:
+def presigned_url_for(file_id: int, file: FileMeta) -> str:
+    """Cached presigned URL for R2 files, the download endpoint for local ones"""
+    if is_r2_path(file.file_path):
         try:
-            url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': settings.R2_BUCKET_NAME, 'Key': file.file_path},
-                ExpiresIn=3600
-            )
-            return {"url": url}
+            return presigned_urls.get(file_id, file.file_path, file.file_name)
         except ClientError as e:
             raise HTTPException(status_code=500, detail="Failed to generate presigned URL")
     
-    # If local, maybe return a download URL?
-    # Or just raise error as this endpoint implies presigned (cloud) URL
-    # But for compatibility, we can return the local download URL if it exists
+    # If local, return the local download URL if it exists
     if os.path.exists(file.file_path):
-         return {"url": f"{settings.API_V1_STR}/files/{file.id}/download"}
+         return local_download_url(file_id)
 
     raise HTTPException(status_code=400, detail="Not a cloud file")
 
-@router.get("/{file_id}/download")
-async def download_file(file_id: int, db: Session = Depends(get_db)):
-    file = db.query(FileUpload).filter(FileUpload.id == file_id).first()
-    if not file:
-        raise HTTPException(status_code=404, detail="File not found")
+@router.post("/presigned")
+async def get_presigned_urls(batch: PresignedUrlBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Presigned URLs for many files in one round trip, e.g. bulk review pages.
+    Returns {"urls": {file_id: url}, "errors": {file_id: reason}}.
+    """
+    file_ids = list(dict.fromkeys(batch.file_ids))
+    if len(file_ids) > MAX_PRESIGNED_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PRESIGNED_BATCH} file ids per request")
+    
+    files = {file_id: download_meta.get(file_id) for file_id in file_ids}
+    missing = [file_id for file_id, file in files.items() if file is None]
+    if missing:
+        result = await db.execute(select(FileUpload).where(FileUpload.id.in_(missing)))
+        for row in result.scalars():
+            files[row.id] = FileMeta.from_row(row)
+            download_meta.set(row.id, files[row.id])
+    
+    urls, errors = {}, {}
+    for file_id, file in files.items():
+        if file is None:
+            errors[file_id] = "File not found"
+            continue
+        try:
+            urls[file_id] = presigned_url_for(file_id, file)
+        except HTTPException as e:
+            errors[file_id] = e.detail
+    return {"urls": urls, "errors": errors}
 
-    # Determine if file is likely in R2 or Local
-    # R2 keys are typically "user_id/filename" (starting with digit)
-    # Local paths are typically "uploads/filename"
-    is_r2 = False
-    if s3_client and settings.R2_BUCKET_NAME:
-        # Check if it looks like an R2 key (starts with digit and has no "uploads")
-        if file.file_path and file.file_path[0].isdigit() and "uploads" not in file.file_path:
-             is_r2 = True
+@router.get("/{file_id}/presigned")
+async def get_presigned_url(file_id: int, db: AsyncSession = Depends(get_async_db)):
+    file = await get_file_meta(file_id, db)
+    return {"url": presigned_url_for(file_id, file)}
 
-    if is_r2:
+@router.get("/{file_id}/download")
+async def download_file(file_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    file = await get_file_meta(file_id, db)
+
+    # Determine if file is in R2 or Local
+    if is_r2_path(file.file_path):
          try:
-            url = s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': settings.R2_BUCKET_NAME, 'Key': file.file_path},
-                ExpiresIn=3600
-            )
+            url = presigned_urls.get(file_id, file.file_path, file.file_name)
             from fastapi.responses import RedirectResponse
             return RedirectResponse(url)
          except:
              pass
     
-    # If local
-    if os.path.exists(file.file_path):
-        from fastapi.responses import FileResponse
-        return FileResponse(file.file_path, filename=file.file_name, media_type=file.mime_type)
+    # If local: ETag from the content hash, 304s, Range and zero-copy sends
+    response = await serve_local_file(request, file)
+    if response is not None:
+        return response
         
     # If file_url is a full URL (e.g. from previous system)
     if file.file_url and file.file_url.startswith("http"):
@@ -347,3 +474,105 @@ async def reject_file(file_id: int, reason: str = Body(...), db: Session = Depen
     db.commit()
     
     return file_record
+
+
+@router.delete("/{file_id}")
+def delete_file(file_id: int, db: Session = Depends(get_db)):
+    file_record = db.query(FileUpload).filter(FileUpload.id == file_id).first()
+    if not file_record:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # Stored content is only removed, after commit, once no other upload references it
+    release_blob(db, file_record)
+    db.delete(file_record)
+    bump_file_counter(db, file_record.file_type, -1)
+    db.commit()
+    download_meta.invalidate(file_id)
+    presigned_urls.invalidate(file_id)
+    return {"message": "File deleted successfully"}
+
+
+@router.post("/bulk-review")
+def bulk_review_files(review: BulkFileReview, db: Session = Depends(get_db)):
+    """
+    Verify, unverify or reject many files at once: one UPDATE for all rows,
+    one batched notification insert and a single commit.
+    Returns an outcome per requested id ("verified", "unverified",
+    "rejected" or "not_found").
+    """
+    from app.core.inbox import notification_payload, publish_notifications
+    from app.models.notification import Notification, NotificationType
+    
+    file_ids = list(dict.fromkeys(review.file_ids))
+    if not file_ids:
+        raise HTTPException(status_code=400, detail="No file ids given")
+    if len(file_ids) > MAX_BULK_REVIEW:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_REVIEW} files per request")
+    if review.action == "reject" and not review.notes:
+        raise HTTPException(status_code=400, detail="A reason is required to reject files")
+    
+    # Same field changes as the single-file verify/reject endpoints
+    values = {
+        "is_verified": review.action == "verify",
+        "status": {"verify": "Verified", "unverify": "Pending", "reject": "Rejected"}[review.action],
+    }
+    if review.notes:
+        values["verification_notes"] = review.notes
+    if review.verified_by and review.action != "reject":
+        values["verified_by"] = review.verified_by
+    
+    updated = db.execute(
+        update(FileUpload)
+        .where(FileUpload.id.in_(file_ids))
+        .values(**values)
+        .returning(FileUpload.id, FileUpload.user_id, FileUpload.file_type)
+        .execution_options(synchronize_session=False)
+    ).all()
+    
+    notifications = []
+    for _, user_id, file_type in updated:
+        if review.action == "reject":
+            notifications.append({
+                "user_id": user_id,
+                "title": "Resume Rejected",
+                "message": review.notes,
+                "sent_by": None,
+                "notification_type": NotificationType.PROFILE_REJECTED,
+                "is_read": False,
+            })
+        else:
+            notifications.append({
+                "user_id": user_id,
+                "title": "File Verification Status Updated",
+                "message": f"Your {file_type} has been {'verified' if review.action == 'verify' else 'marked as unverified'}." + (f" Notes: {review.notes}" if review.notes else ""),
+                "sent_by": review.verified_by,
+                "notification_type": NotificationType.SYSTEM,
+                "is_read": False,
+            })
+    
+    inserted = []
+    if notifications:
+        # RETURNING rows of a multi-row insert are not in parameter order,
+        # so payloads are built from the returned columns alone
+        inserted = db.execute(
+            insert(Notification).returning(
+                Notification.id, Notification.user_id, Notification.title, Notification.message,
+                Notification.notification_type, Notification.sent_by
+            ),
+            notifications
+        ).all()
+    db.commit()
+    
+    # Push the new notifications to connected clients
+    publish_notifications(notification_payload(*row) for row in inserted)
+    
+    outcome = {"verify": "verified", "unverify": "unverified", "reject": "rejected"}[review.action]
+    updated_ids = {row[0] for row in updated}
+    return {
+        "action": review.action,
+        "updated": len(updated_ids),
+        "results": [
+            {"file_id": file_id, "outcome": outcome if file_id in updated_ids else "not_found"}
+            for file_id in file_ids
+        ],
+    }
@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
+from app.core.counters import bump_counter, JOBS_TOTAL, APPLICATIONS_TOTAL
+from app.core.job_search import search_jobs
+from app.core.pagination import clamp_limit
 from app.models.job import Job, JobApplication
-from app.schemas.job import JobCreate, JobResponse, JobUpdate, JobApplicationCreate, JobApplicationResponse, JobApplicationUpdate, JobApplyRequest
+from app.schemas.job import JobCreate, JobResponse, JobUpdate, JobApplicationCreate, JobApplicationResponse, JobApplicationUpdate, JobApplyRequest, JobSearchResponse
 
 router = APIRouter()
 
@@ -12,18 +17,32 @@ router = APIRouter()
 def create_job(job: JobCreate, db: Session = Depends(get_db)):
     db_job = Job(**job.dict())
     db.add(db_job)
+    bump_counter(db, JOBS_TOTAL)
     db.commit()
     db.refresh(db_job)
     return db_job
 
 @router.get("/", response_model=List[JobResponse])
-def get_jobs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    jobs = db.query(Job).offset(skip).limit(limit).all()
-    return jobs
+async def get_jobs(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(Job).offset(skip).limit(limit))
+    return result.scalars().all()
+
+@router.get("/search", response_model=JobSearchResponse)
+async def search_job_postings(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = 20,
+    offset: int = Query(0, ge=0),
+    include_inactive: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked full-text search over title, company, location, description and requirements"""
+    limit = clamp_limit(limit)
+    results, has_more = await search_jobs(db, q, limit, offset, include_inactive)
+    return {"results": results, "next_offset": offset + limit if has_more else None}
 
 @router.get("/{job_id}", response_model=JobResponse)
-def get_job(job_id: int, db: Session = Depends(get_db)):
-    db_job = db.query(Job).filter(Job.id == job_id).first()
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_job = await db.get(Job, job_id)
     if not db_job:
         raise HTTPException(status_code=404, detail="Job not found")
     return db_job
@@ -69,6 +88,7 @@ def apply_job(job_id: int, application: JobApplyRequest, db: Session = Depends(g
         status="PENDING"
     )
     db.add(db_application)
+    bump_counter(db, APPLICATIONS_TOTAL)
     db.commit()
     db.refresh(db_application)
     return db_application
@@ -93,7 +113,11 @@ def delete_job(job_id: int, db: Session = Depends(get_db)):
     if not db_job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    # Applications are removed with the job (cascade)
+    application_count = db.query(JobApplication).filter(JobApplication.job_id == job_id).count()
     db.delete(db_job)
+    bump_counter(db, JOBS_TOTAL, -1)
+    bump_counter(db, APPLICATIONS_TOTAL, -application_count)
     db.commit()
     return {"message": "Job deleted successfully"}
 
@@ -110,6 +134,7 @@ def create_application(application: JobApplicationCreate, db: Session = Depends(
     # Create application
     db_application = JobApplication(**application.dict())
     db.add(db_application)
+    bump_counter(db, APPLICATIONS_TOTAL)
     db.commit()
     db.refresh(db_application)
     return db_application
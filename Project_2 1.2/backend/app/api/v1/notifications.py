@@ -1,14 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import select, update
+from typing import List, Optional
+from datetime import datetime
+import asyncio
+import json
+from collections import Counter
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
+from app.core.broadcasts import bump_read_counts
+from app.core.inbox import unread_counts, user_channel
+from app.core.pubsub import broker
+from app.core.pagination import clamp_limit, keyset_filter, keyset_order, build_page
 from app.models.notification import Notification
 from app.models.user import User
 from app.schemas.notification import NotificationCreate, NotificationResponse, NotificationUpdate
 
 router = APIRouter()
 
+SSE_HEARTBEAT_SECONDS = 15
+
 @router.post("/", response_model=NotificationResponse)
 def create_notification(notification: NotificationCreate, db: Session = Depends(get_db)):
     db_notification = Notification(**notification.dict())
@@ -23,20 +36,93 @@ def get_notifications(skip: int = 0, limit: int = 100, db: Session = Depends(get
     return notifications
 
 @router.get("/user/{user_id}", response_model=List[NotificationResponse])
-def get_user_notifications(user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_user_notifications(
+    user_id: int,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    unread_only: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Pass the X-Next-Cursor header value back as ?cursor= for the next page;
+    # skip is kept for older clients
     try:
-        notifications = db.query(Notification).filter(Notification.user_id == user_id).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
-        # Debug: Print first notification
-        if notifications:
-            print(f"DEBUG: Found {len(notifications)} notifications")
-            print(f"DEBUG: First notification: {notifications[0].__dict__}")
+        query = select(Notification).where(Notification.user_id == user_id)
+        if unread_only:
+            query = query.where(Notification.is_read == False)
+        if cursor:
+            query = query.where(keyset_filter(Notification.created_at, Notification.id, cursor))
+        elif skip:
+            query = query.offset(skip)
+        
+        limit = clamp_limit(limit)
+        result = await db.execute(
+            query.order_by(*keyset_order(Notification.created_at, Notification.id)).limit(limit + 1)
+        )
+        notifications = result.scalars().all()
+        notifications, next_cursor = build_page(notifications, limit, key=lambda n: (n.created_at, n.id))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return notifications
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERROR in get_user_notifications: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/user/{user_id}/unread-count")
+def get_unread_count(user_id: int, db: Session = Depends(get_db)):
+    return {"user_id": user_id, "unread_count": unread_counts.get(db, user_id)}
+
+@router.get("/user/{user_id}/stream")
+async def stream_user_notifications(user_id: int, request: Request):
+    """
+    Server-Sent Events stream of new notifications for a user.
+    Each message is a `notification` event whose data matches NotificationResponse.
+    """
+    async def event_stream():
+        queue = broker.subscribe(user_channel(user_id))
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {payload['id']}\nevent: notification\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            broker.unsubscribe(user_channel(user_id), queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.put("/user/{user_id}/read-all")
+def mark_all_read(user_id: int, db: Session = Depends(get_db)):
+    # Broadcast read counters move by the number of copies this UPDATE marked
+    # read, taken from its own RETURNING rows so concurrent reads and new
+    # notifications cannot skew them
+    broadcast_ids = db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read == False)
+        .values(is_read=True, read_at=datetime.now())
+        .returning(Notification.broadcast_id)
+        .execution_options(synchronize_session=False, inbox_user_id=user_id)
+    ).scalars().all()
+    bump_read_counts(db, Counter(broadcast_ids))
+    db.commit()
+    
+    return {"user_id": user_id, "updated": len(broadcast_ids)}
+
 @router.get("/{notification_id}", response_model=NotificationResponse)
 def get_notification(notification_id: int, db: Session = Depends(get_db)):
     db_notification = db.query(Notification).filter(Notification.id == notification_id).first()
@@ -50,10 +136,16 @@ def update_notification(notification_id: int, notification_update: NotificationU
     if not db_notification:
         raise HTTPException(status_code=404, detail="Notification not found")
     
+    was_read = bool(db_notification.is_read)
     update_data = notification_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_notification, key, value)
     
+    is_read = bool(db_notification.is_read)
+    if is_read != was_read:
+        db_notification.read_at = datetime.now() if is_read else None
+        bump_read_counts(db, {db_notification.broadcast_id: 1 if is_read else -1})
+    
     db.commit()
     db.refresh(db_notification)
     return db_notification
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.db.session import get_db
+from app.core.counters import bump_counter, APPROVED_PROFILES
 from app.models.user import User, Profile
 from app.models.notification import Notification, NotificationType
 
@@ -26,6 +27,8 @@ def approve_profile(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    was_approved = profile.is_approved
+    
     profile.is_approved = True
     profile.approval_status = 'Approved'
     if notes:
@@ -34,6 +37,9 @@ def approve_profile(
     # Also update user approval status so the student appears in approved students
     user.is_approved = True
     
+    if not was_approved:
+        bump_counter(db, APPROVED_PROFILES)
+    
     db.commit()
     db.refresh(profile)
     db.refresh(user)
@@ -75,6 +81,8 @@ def reject_profile(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    was_approved = profile.is_approved
+    
     profile.is_approved = False
     profile.approval_status = 'Rejected'
     if reason:
@@ -83,6 +91,9 @@ def reject_profile(
     # Also update user approval status
     user.is_approved = False
     
+    if was_approved:
+        bump_counter(db, APPROVED_PROFILES, -1)
+    
     db.commit()
     db.refresh(profile)
     db.refresh(user)
@@ -6,10 +6,17 @@ from pydantic import BaseModel
 from datetime import datetime
 
 from app.db.session import get_db
+from app.core.counters import (
+    bump_counter, read_counters,
+    JOBS_TOTAL, APPLICATIONS_TOTAL, STUDENTS_TOTAL, PLACED_STUDENTS, EVENT_REGISTRATIONS_TOTAL
+)
 from app.models.user import User, UserRole, Profile
 from app.models.job import Job, JobApplication
 from app.models.event import Event, EventRegistration
-from app.models.notification import Notification, NotificationType
+from app.models.notification import NotificationBroadcast as NotificationBroadcastModel
+from app.core.broadcasts import create_broadcast, get_broadcast_history
+from app.core.tasks import enqueue
+from app.core.pagination import clamp_limit
 from app.schemas.job import JobCreate, JobResponse, JobUpdate, JobApplicationResponse
 from app.schemas.event import EventCreate, EventResponse, EventUpdate
 
@@ -70,6 +77,7 @@ def get_tpo_job_applications(job_id: int, db: Session = Depends(get_db)):
 def create_tpo_job(job: JobCreate, db: Session = Depends(get_db)):
     db_job = Job(**job.dict())
     db.add(db_job)
+    bump_counter(db, JOBS_TOTAL)
     db.commit()
     db.refresh(db_job)
     return db_job
@@ -85,21 +93,18 @@ def get_tpo_profile(user_id: int, db: Session = Depends(get_db)):
 
 @router.get("/stats/summary")
 def get_dashboard_stats(db: Session = Depends(get_db)):
-    total_jobs = db.query(Job).count()
-    total_applications = db.query(JobApplication).count()
-    total_students = db.query(User).filter(User.role == UserRole.STUDENT).count()
-    
-    # Count placed students (those with placement_status='Placed')
-    total_placed = db.query(Profile).filter(Profile.placement_status == 'Placed').count()
+    # Precomputed counters maintained by the job, application and profile write paths
+    counters = read_counters(db, [JOBS_TOTAL, APPLICATIONS_TOTAL, STUDENTS_TOTAL, PLACED_STUDENTS])
+    total_placed = counters[PLACED_STUDENTS]
     
     # Calculate selected (hired) applications if applicable, or use placement count
     total_selected = total_placed 
     
     return {
-        "total_jobs": total_jobs,
-        "total_applications": total_applications,
+        "total_jobs": counters[JOBS_TOTAL],
+        "total_applications": counters[APPLICATIONS_TOTAL],
         "total_selected": total_selected,
-        "total_students": total_students,
+        "total_students": counters[STUDENTS_TOTAL],
         "total_placed": total_placed,
         "applications_by_job": [] # Can be populated if needed
     }
@@ -225,6 +230,7 @@ class NotificationBroadcast(BaseModel):
     title: str
     message: str
     filters: NotificationFilters
+    sent_by: Optional[int] = None
 
 # --- Notifications ---
 
@@ -233,69 +239,65 @@ def broadcast_notification(
     payload: NotificationBroadcast,
     db: Session = Depends(get_db)
 ):
-    # Join User and Profile to filter students
-    query = db.query(User).join(Profile).filter(User.role == UserRole.STUDENT)
+    # Record the broadcast; a background worker fans out to matching students
+    broadcast = create_broadcast(
+        db,
+        title=payload.title,
+        message=payload.message,
+        degree=payload.filters.degree,
+        year=payload.filters.year,
+        sent_by=payload.sent_by
+    )
+    if broadcast.status == "Pending":
+        enqueue(db, "broadcasts.deliver", broadcast_id=broadcast.id)
+        db.commit()
     
-    if payload.filters.degree:
-        query = query.filter(Profile.degree == payload.filters.degree)
-    if payload.filters.year:
-        query = query.filter(Profile.year == payload.filters.year)
-        
-    students = query.all()
-    count = 0
+    count = broadcast.recipient_count
+    return {
+        "broadcast_id": broadcast.id,
+        "status": broadcast.status,
+        "count": count,
+        "message": f"Sending to {count} students"
+    }
+
+@router.get("/notifications/broadcasts/{broadcast_id}")
+def get_broadcast_status(broadcast_id: int, db: Session = Depends(get_db)):
+    broadcast = db.query(NotificationBroadcastModel).filter(NotificationBroadcastModel.id == broadcast_id).first()
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
     
-    for student in students:
-        notif = Notification(
-            user_id=student.id,
-            title=payload.title,
-            message=payload.message,
-            notification_type=NotificationType.SYSTEM,
-            is_read=False
-        )
-        db.add(notif)
-        count += 1
-        
-    db.commit()
-    return {"count": count, "message": f"Sent to {count} students"}
+    return {
+        "broadcast_id": broadcast.id,
+        "title": broadcast.title,
+        "status": broadcast.status,
+        "recipient_count": broadcast.recipient_count,
+        "delivered_count": broadcast.delivered_count,
+        "error": broadcast.error,
+        "created_at": broadcast.created_at,
+        "completed_at": broadcast.completed_at
+    }
 
 @router.get("/notifications/history")
-def get_notification_history(db: Session = Depends(get_db)):
-    recent_notifs = db.query(Notification).filter(
-        Notification.notification_type == NotificationType.SYSTEM
-    ).order_by(Notification.created_at.desc()).limit(500).all()
+def get_notification_history(limit: int = 20, before_id: Optional[int] = None, db: Session = Depends(get_db)):
+    broadcasts = get_broadcast_history(db, limit=clamp_limit(limit), before_id=before_id)
     
     history = []
-    if not recent_notifs:
-        return history
-        
-    current_group = None
+    for broadcast in broadcasts:
+        recipients = broadcast.recipient_count or 0
+        read_count = broadcast.read_count or 0
+        history.append({
+            "broadcast_id": broadcast.id,
+            "title": broadcast.title,
+            "message": broadcast.message,
+            "sent_at": broadcast.created_at,
+            "status": broadcast.status,
+            "recipient_count": recipients,
+            "delivered_count": broadcast.delivered_count or 0,
+            "read_count": read_count,
+            "read_rate": round(read_count / recipients * 100, 2) if recipients else 0
+        })
     
-    for notif in recent_notifs:
-        is_match = False
-        if current_group:
-            time_diff = abs((current_group['sent_at'] - notif.created_at).total_seconds())
-            if (current_group['title'] == notif.title and 
-                current_group['message'] == notif.message and 
-                time_diff < 60): 
-                is_match = True
-        
-        if is_match:
-            current_group['recipient_count'] += 1
-        else:
-            if current_group:
-                history.append(current_group)
-            
-            current_group = {
-                "title": notif.title,
-                "message": notif.message,
-                "sent_at": notif.created_at,
-                "recipient_count": 1
-            }
-            
-    if current_group:
-        history.append(current_group)
-        
-    return history[:20]
+    return history
 
 # --- Jobs ---
 
@@ -353,6 +355,7 @@ def get_tpo_jobs(
 def create_tpo_job(job: JobCreate, db: Session = Depends(get_db)):
     db_job = Job(**job.dict())
     db.add(db_job)
+    bump_counter(db, JOBS_TOTAL)
     db.commit()
     db.refresh(db_job)
     return db_job
@@ -390,7 +393,11 @@ def delete_tpo_job(job_id: int, db: Session = Depends(get_db)):
     if not db_job:
         raise HTTPException(status_code=404, detail="Job not found")
     
+    # Applications are removed with the job (cascade)
+    application_count = db.query(JobApplication).filter(JobApplication.job_id == job_id).count()
     db.delete(db_job)
+    bump_counter(db, JOBS_TOTAL, -1)
+    bump_counter(db, APPLICATIONS_TOTAL, -application_count)
     db.commit()
     return {"message": "Job deleted successfully"}
 
@@ -434,7 +441,10 @@ def delete_tpo_event(event_id: int, db: Session = Depends(get_db)):
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
+    # Registrations are removed with the event (cascade)
+    registration_count = db.query(EventRegistration).filter(EventRegistration.event_id == event_id).count()
     db.delete(db_event)
+    bump_counter(db, EVENT_REGISTRATIONS_TOTAL, -registration_count)
     db.commit()
     return {"message": "Event deleted successfully"}
 
@@ -1,12 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
-from passlib.context import CryptContext
-from werkzeug.security import check_password_hash
 import secrets
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
 import os
 
@@ -14,8 +9,16 @@ from app.db.session import get_db
 from app.models.user import User, Profile, PasswordResetToken
 from app.schemas.user import UserCreate, UserResponse, UserUpdate, ProfileCreate, ProfileResponse, ProfileUpdate, ProfileBase, UserRegistration, UserLogin, ForgotPasswordRequest, ResetPasswordRequest
 from app.core.config import settings
+from app.core.tasks import enqueue, task
+from app.core.mail import mail_service
+from app.core.passwords import hash_password, verify_password
+from app.core.counters import (
+    bump_counter, bump_student_counter, bump_placement_counter,
+    remove_user, APPROVED_PROFILES
+)
+from app.core.downloads import download_meta
+from app.core.storage import presigned_urls
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 router = APIRouter()
 
@@ -60,6 +63,7 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
         phone_number=user.phone_number
     )
     db.add(db_user)
+    bump_student_counter(db, db_user.role)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -84,9 +88,7 @@ def register_user(
     if db_user:
         raise HTTPException(status_code=400, detail="User with this email already registered")
     
-    # Hash the password using werkzeug instead of bcrypt due to library issues
-    from werkzeug.security import generate_password_hash
-    hashed_password = generate_password_hash(password)
+    hashed_password = hash_password(password)
     
     # Generate a unique user ID if needed
     clerk_user_id = f"local_{secrets.token_hex(8)}"
@@ -106,6 +108,7 @@ def register_user(
         hashed_password=hashed_password  # Assuming User model has this field
     )
     db.add(db_user)
+    bump_student_counter(db, role_upper)
     db.commit()
     db.refresh(db_user)
     
@@ -138,19 +141,12 @@ def login_user(
     if not db_user.hashed_password:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    # Verify the password - try both bcrypt and werkzeug methods
-    password_valid = False
-    try:
-        # Try bcrypt verification first
-        if pwd_context.verify(password, db_user.hashed_password):
-            password_valid = True
-    except:
-        # If bcrypt fails, try werkzeug verification
-        try:
-            if check_password_hash(db_user.hashed_password, password):
-                password_valid = True
-        except:
-            password_valid = False
+    # One verification, using the scheme the stored hash was made with
+    password_valid, new_hash = verify_password(password, db_user.hashed_password)
+    if password_valid and new_hash:
+        # Upgrade legacy werkzeug hashes (and old work factors) to bcrypt
+        db_user.hashed_password = new_hash
+        db.commit()
     
     if not password_valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
@@ -165,17 +161,10 @@ def login_user(
     }
 
 
+@task("users.send_reset_email")
 def send_reset_email(to_email: str, reset_token: str):
-    """Send password reset email using SMTP"""
-    # Use the provided SMTP credentials directly
-    smtp_host = 'smtp.gmail.com'
-    smtp_port = 587
-    smtp_user = 'maneswapnil.0406@gmail.com'
-    smtp_pass = 'glvuhgbcsqjqnkvk'
-    smtp_from = 'PrepSphere <maneswapnil.0406@gmail.com>'
-    
-    # Create the reset link (using the actual frontend port)
-    reset_link = f"http://localhost:3003/reset-password?token={reset_token}"
+    """Background task: send the password reset email (retried on failure)"""
+    reset_link = f"{settings.FRONTEND_URL}/reset-password?token={reset_token}"
     
     # Create email content
     subject = "Password Reset Request - PrepSphere"
@@ -196,31 +185,8 @@ def send_reset_email(to_email: str, reset_token: str):
     The PrepSphere Team
     """
     
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = smtp_from
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    
-    # Attach body to email
-    msg.attach(MIMEText(body, 'plain'))
-    
-    try:
-        # Create SMTP session
-        server = smtplib.SMTP(smtp_host, smtp_port)
-        server.starttls()  # Enable security
-        server.login(smtp_user, smtp_pass)  # Login with sender's email and password
-        
-        # Convert message to string and send
-        text = msg.as_string()
-        server.sendmail(smtp_user, to_email, text)
-        server.quit()
-        
-        print(f"Password reset email sent successfully to {to_email}")
-        return True
-    except Exception as e:
-        print(f"Error occurred while sending email: {str(e)}")
-        return False
+    mail_service.send(to_email, subject, body)
+    print(f"Password reset email sent successfully to {to_email}")
 
 
 @router.post("/forgot-password")
@@ -259,16 +225,10 @@ def forgot_password(
     )
     
     db.add(reset_token_record)
-    db.commit()
-    
-    # Send reset email
-    email_sent = send_reset_email(db_user.email, reset_token)
     
-    if not email_sent:
-        # If email fails, remove the token and return error
-        db.delete(reset_token_record)
-        db.commit()
-        raise HTTPException(status_code=500, detail="Failed to send reset email")
+    # Queue the email in the same transaction as the token
+    enqueue(db, "users.send_reset_email", to_email=db_user.email, reset_token=reset_token)
+    db.commit()
     
     return {"message": "Password reset link has been sent to your email address"}
 
@@ -298,9 +258,7 @@ def reset_password(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Hash the new password using werkzeug instead of bcrypt due to library issues
-    from werkzeug.security import generate_password_hash
-    hashed_password = generate_password_hash(new_password)
+    hashed_password = hash_password(new_password)
     
     # Update the user's password
     user.hashed_password = hashed_password
@@ -329,10 +287,15 @@ def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
+    old_role = db_user.role
     update_data = user_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_user, key, value)
     
+    if db_user.role != old_role:
+        bump_student_counter(db, old_role, -1)
+        bump_student_counter(db, db_user.role, 1)
+    
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -343,8 +306,11 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(db_user)
+    upload_ids = remove_user(db, db_user)
     db.commit()
+    for file_id in upload_ids:
+        download_meta.invalidate(file_id)
+        presigned_urls.invalidate(file_id)
     return {"message": "User deleted successfully"}
 
 @router.post("/{user_id}/profile", response_model=ProfileResponse)
@@ -358,9 +324,11 @@ def create_user_profile(user_id: int, profile: ProfileBase, db: Session = Depend
     db_profile = db.query(Profile).filter(Profile.user_id == user_id).first()
     if db_profile:
         # Update existing profile
+        old_status = db_profile.placement_status
         update_data = profile.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_profile, key, value)
+        bump_placement_counter(db, old_status, db_profile.placement_status)
         db.commit()
         db.refresh(db_profile)
         return db_profile
@@ -370,6 +338,7 @@ def create_user_profile(user_id: int, profile: ProfileBase, db: Session = Depend
     profile_data['user_id'] = user_id
     db_profile = Profile(**profile_data)
     db.add(db_profile)
+    bump_placement_counter(db, None, db_profile.placement_status)
     db.commit()
     db.refresh(db_profile)
     return db_profile
@@ -387,10 +356,16 @@ def update_user_profile(user_id: int, profile_update: ProfileUpdate, db: Session
     if not db_profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
+    old_status = db_profile.placement_status
+    was_approved = db_profile.is_approved
     update_data = profile_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_profile, key, value)
     
+    bump_placement_counter(db, old_status, db_profile.placement_status)
+    if bool(db_profile.is_approved) != bool(was_approved):
+        bump_counter(db, APPROVED_PROFILES, 1 if db_profile.is_approved else -1)
+    
     db.commit()
     db.refresh(db_profile)
     return db_profile
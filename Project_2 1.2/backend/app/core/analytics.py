@@ -0,0 +1,203 @@
+"""
+Admin analytics snapshot
+Computes dashboard analytics in a single aggregate query and keeps the result
+in an in-process cache that is refreshed on a TTL or when a write touches
+users, jobs, events, file uploads or notifications
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, exists, func, select, true
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User, UserRole
+from app.models.job import Job
+from app.models.event import Event, EventRegistration
+from app.models.file import FileUpload
+from app.models.notification import Notification, NotificationType
+
+# Writes to these models invalidate the cached snapshot
+TRACKED_MODELS = (User, Job, Event, EventRegistration, FileUpload, Notification)
+TRACKED_TABLES = {model.__table__ for model in TRACKED_MODELS}
+
+
+def compute_analytics(db: Session) -> Dict[str, Any]:
+    """Compute all admin analytics figures in one round trip"""
+    is_student = User.role == UserRole.STUDENT
+    has_offer_letter = exists().where(
+        FileUpload.user_id == User.id,
+        FileUpload.file_type == 'offer_letter'
+    )
+
+    users = select(
+        func.count(User.id).label("total_users"),
+        func.count(User.id).filter(is_student).label("total_students"),
+        func.count(User.id).filter(User.role == UserRole.TPO).label("total_tpos"),
+        func.count(User.id).filter(is_student, has_offer_letter).label("placed_students"),
+        func.count(User.id).filter(User.is_active == True).label("active_users"),
+    ).subquery()
+
+    jobs = select(
+        func.count(Job.id).label("total_jobs"),
+        func.count(Job.id).filter(Job.is_active == True).label("active_jobs"),
+    ).subquery()
+
+    events = select(
+        func.count(Event.id).label("total_events"),
+        func.count(Event.id).filter(Event.status == 'Upcoming').label("upcoming_events"),
+        func.count(Event.id).filter(Event.status == 'Completed').label("completed_events"),
+        func.count(Event.id).filter(Event.status == 'Cancelled').label("cancelled_events"),
+    ).subquery()
+
+    registrations = select(
+        func.count(EventRegistration.id).label("total_registrations"),
+    ).subquery()
+
+    applications = select(
+        func.count(Notification.id).label("total_applications"),
+    ).where(Notification.notification_type == NotificationType.APPLICATION_UPDATE).subquery()
+
+    stmt = select(users, jobs, events, registrations, applications).select_from(
+        users.join(jobs, true())
+        .join(events, true())
+        .join(registrations, true())
+        .join(applications, true())
+    )
+    row = db.execute(stmt).one()
+
+    total_students = row.total_students or 0
+    placed_students = row.placed_students or 0
+    placement_percentage = 0
+    if total_students > 0:
+        placement_percentage = round((placed_students / total_students) * 100, 2)
+
+    return {
+        "totalUsers": row.total_users,
+        "totalStudents": total_students,
+        "totalTPO": row.total_tpos,
+        "placedStudents": placed_students,
+        "unplacedStudents": total_students - placed_students,
+        "activeJobs": row.active_jobs,
+        "inactiveJobs": row.total_jobs - row.active_jobs,
+        "totalApplications": row.total_applications,
+        "totalEvents": row.total_events,
+        "upcomingEvents": row.upcoming_events,
+        "completedEvents": row.completed_events,
+        "cancelledEvents": row.cancelled_events,
+        "totalRegistrations": row.total_registrations,
+        "placementPercentage": placement_percentage,
+        "totalJobs": row.total_jobs,
+        "activeUsers": row.active_users,
+        "inactiveUsers": row.total_users - row.active_users,
+        "generatedAt": datetime.now().isoformat(),
+    }
+
+
+class AnalyticsSnapshot:
+    """
+    In-process cache of the latest analytics computation. One thread
+    recomputes at a time and the others wait for its result. Invalidation
+    bumps a generation counter, so a computation that was already running
+    when a write committed is returned to its caller but not cached.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._data: Optional[Dict[str, Any]] = None
+        self._computed_at = 0.0
+        self._generation = 0
+        self._state_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self._data is None or time.monotonic() - self._computed_at > self.ttl_seconds
+
+    def invalidate(self):
+        with self._state_lock:
+            self._generation += 1
+            self._data = None
+
+    def refresh(self, db: Session, force: bool = False) -> Dict[str, Any]:
+        """
+        Recompute unless another thread cached a usable result while this one
+        waited for the lock; with force only a result computed after the call
+        started counts.
+        """
+        started = time.monotonic()
+        with self._refresh_lock:
+            data = self._data
+            if data is not None and (self._computed_at >= started if force else not self.is_stale()):
+                return data
+            generation = self._generation
+            data = compute_analytics(db)
+            with self._state_lock:
+                if self._generation == generation:
+                    self._data = data
+                    self._computed_at = time.monotonic()
+            return data
+
+    def get(self, db: Session, fresh: bool = False) -> Dict[str, Any]:
+        data = self._data
+        if fresh:
+            return self.refresh(db, force=True)
+        if data is None or self.is_stale():
+            return self.refresh(db)
+        return data
+
+
+analytics_snapshot = AnalyticsSnapshot(settings.ANALYTICS_SNAPSHOT_TTL_SECONDS)
+
+
+def _refresh_snapshot():
+    db = SessionLocal()
+    try:
+        analytics_snapshot.refresh(db, force=True)
+    finally:
+        db.close()
+
+
+async def run_snapshot_refresher():
+    """Background task keeping the snapshot warm, started from the app lifespan"""
+    while True:
+        try:
+            await run_in_threadpool(_refresh_snapshot)
+        except Exception as e:
+            print(f"Error refreshing analytics snapshot: {e}")
+        await asyncio.sleep(settings.ANALYTICS_SNAPSHOT_TTL_SECONDS)
+
+
+# --- Invalidation hooks ---
+
+@event.listens_for(Session, "before_flush")
+def _track_analytics_writes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, TRACKED_MODELS):
+            session.info["analytics_dirty"] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_analytics_bulk_writes(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table in TRACKED_TABLES:
+            orm_execute_state.session.info["analytics_dirty"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_analytics(session):
+    if session.info.pop("analytics_dirty", False):
+        analytics_snapshot.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_analytics_tracking(session):
+    session.info.pop("analytics_dirty", None)
@@ -0,0 +1,132 @@
+"""
+Content-addressed file storage
+Uploads are keyed by SHA-256 in file_blobs; identical bytes are stored once
+and every FileUpload pointing at them holds one reference, so re-uploads
+skip the storage write entirely. Each stored copy gets its own key, and a
+copy whose last reference is dropped is only removed from storage once that
+transaction commits, so neither a rollback nor a concurrent re-upload of the
+same bytes can be left pointing at a deleted object.
+"""
+
+from typing import AsyncIterator, Callable, Optional
+
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.storage import StoredFile, delete_stored_file, is_r2_path, store_stream
+from app.models.file import FileBlob, FileUpload
+
+
+def delete_after_commit(db: Session, file_path: str, in_r2: bool):
+    """Remove a stored object once the session's transaction commits"""
+    db.info.setdefault("released_objects", []).append((file_path, in_r2))
+
+
+@event.listens_for(Session, "after_commit")
+def _delete_released_objects(session):
+    for file_path, in_r2 in session.info.pop("released_objects", []):
+        try:
+            delete_stored_file(file_path, in_r2)
+        except Exception as e:
+            # The rows are gone; at worst an unreferenced object is left behind
+            print(f"Error deleting stored file {file_path}: {e}")
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _keep_released_objects(session, transaction):
+    # Savepoints end inside the transaction; only its real end (rollback or
+    # close without commit) discards the pending deletions
+    if transaction.parent is None:
+        session.info.pop("released_objects", None)
+
+
+def acquire_blob(db: Session, file_hash: str) -> Optional[FileBlob]:
+    """Take a reference on an existing blob, or return None if it is not stored yet"""
+    result = db.execute(
+        update(FileBlob)
+        .where(FileBlob.file_hash == file_hash)
+        .values(ref_count=FileBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    return db.query(FileBlob).populate_existing().filter(FileBlob.file_hash == file_hash).one()
+
+
+async def store_blob(
+    db: Session,
+    file_hash: str,
+    chunks: Callable[[], AsyncIterator[bytes]],
+    user_id: int,
+    file_name: str,
+    content_type: Optional[str]
+) -> FileBlob:
+    """
+    Return the blob for file_hash with one reference taken, streaming the
+    content from chunks() only when no blob with that hash exists yet.
+    Database work runs in the threadpool, and the transaction is ended
+    before streaming so no connection is held during the upload.
+    """
+    blob = await run_in_threadpool(acquire_blob, db, file_hash)
+    if blob is not None:
+        return blob
+    await run_in_threadpool(db.commit)
+
+    stored = await store_stream(chunks(), user_id, file_name, content_type, file_hash=file_hash)
+    return await run_in_threadpool(register_stored_blob, db, file_hash, stored)
+
+
+def register_stored_blob(db: Session, file_hash: str, stored: StoredFile) -> FileBlob:
+    """register_blob for a copy just written by store_stream"""
+    blob = register_blob(db, file_hash, stored.file_path, stored.size, "r2" if stored.in_r2 else "local")
+    if blob.file_path != stored.file_path:
+        # Another upload of the same bytes registered first; this copy is unreferenced
+        delete_stored_file(stored.file_path, stored.in_r2)
+    return blob
+
+
+def register_blob(db: Session, file_hash: str, file_path: str, file_size: int, storage: str) -> FileBlob:
+    """
+    Record newly stored content with one reference taken. If another upload
+    of the same bytes registered first, its blob is shared instead and the
+    returned blob's file_path differs from file_path.
+    """
+    while True:
+        try:
+            with db.begin_nested():
+                blob = FileBlob(
+                    file_hash=file_hash,
+                    file_path=file_path,
+                    file_size=file_size,
+                    storage=storage,
+                    ref_count=1
+                )
+                db.add(blob)
+            return blob
+        except IntegrityError:
+            blob = acquire_blob(db, file_hash)
+            if blob is not None:
+                return blob
+            # Its last reference was released meanwhile; register this copy after all
+
+
+def release_blob(db: Session, file_upload: FileUpload):
+    """
+    Drop a FileUpload's reference; the last reference removes the blob row
+    and, after commit, the stored object. Rows that predate deduplication
+    own their copy, which is removed after commit as well.
+    """
+    blob = None
+    if file_upload.file_hash:
+        blob = db.query(FileBlob).filter(FileBlob.file_hash == file_upload.file_hash).with_for_update().first()
+    if blob is None or blob.file_path != file_upload.file_path:
+        if file_upload.file_path:
+            delete_after_commit(db, file_upload.file_path, is_r2_path(file_upload.file_path))
+        return
+
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        delete_after_commit(db, blob.file_path, blob.storage == "r2")
+        db.delete(blob)
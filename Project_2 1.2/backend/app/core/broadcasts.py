@@ -0,0 +1,198 @@
+"""
+Bulk notification fan-out
+Broadcasts are recorded up front and delivered by a background task with
+INSERT ... SELECT statements over users joined to profiles, one batch of
+recipients per short transaction, so progress can be reported while sending
+and a delivery interrupted by an error or a worker restart resumes where it
+stopped on the task's next attempt
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import cast, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.db.session import SessionLocal
+from app.core.inbox import notification_payload, publish_notifications
+from app.core.tasks import task
+from app.models.user import User, UserRole, Profile
+from app.models.notification import Notification, NotificationBroadcast, NotificationType
+
+BROADCAST_BATCH_SIZE = 5000
+
+
+def recipients_query(degree: Optional[str], year: Optional[str]):
+    """Select the ids of students matching the broadcast filters"""
+    stmt = select(User.id).join(Profile, Profile.user_id == User.id).where(User.role == UserRole.STUDENT)
+    if degree:
+        stmt = stmt.where(Profile.degree == degree)
+    if year:
+        stmt = stmt.where(Profile.year == year)
+    return stmt
+
+
+def create_broadcast(
+    db: Session,
+    title: str,
+    message: str,
+    degree: Optional[str] = None,
+    year: Optional[str] = None,
+    sent_by: Optional[int] = None,
+    notification_type: NotificationType = NotificationType.SYSTEM
+) -> NotificationBroadcast:
+    """Record a broadcast and the number of students it targets"""
+    recipient_count = db.execute(
+        select(func.count()).select_from(recipients_query(degree, year).subquery())
+    ).scalar()
+
+    broadcast = NotificationBroadcast(
+        title=title,
+        message=message,
+        notification_type=notification_type,
+        sent_by=sent_by,
+        filter_degree=degree or None,
+        filter_year=year or None,
+        status="Pending" if recipient_count else "Completed",
+        recipient_count=recipient_count,
+        delivered_count=0,
+        read_count=0,
+        completed_at=None if recipient_count else datetime.now()
+    )
+    db.add(broadcast)
+    db.commit()
+    db.refresh(broadcast)
+    return broadcast
+
+
+def _next_batch_upper_bound(db: Session, recipients, last_id: int) -> Optional[int]:
+    """Highest user id in the next batch, or None when the rest fits in one batch"""
+    return db.execute(
+        recipients.where(User.id > last_id)
+        .order_by(User.id)
+        .offset(BROADCAST_BATCH_SIZE - 1)
+        .limit(1)
+    ).scalar()
+
+
+def fan_out_broadcast(db: Session, broadcast_id: int):
+    """Insert one notification per recipient of a broadcast, batch by batch"""
+    broadcast = db.query(NotificationBroadcast).filter(NotificationBroadcast.id == broadcast_id).first()
+    if not broadcast or broadcast.status not in ("Pending", "Sending"):
+        return
+
+    # Batches are committed in user id order, so a delivery that was cut off
+    # continues after the last recipient it reached
+    last_id = 0
+    if broadcast.status == "Sending":
+        last_id = db.execute(
+            select(func.max(Notification.user_id)).where(Notification.broadcast_id == broadcast.id)
+        ).scalar() or 0
+    else:
+        broadcast.status = "Sending"
+        db.commit()
+
+    recipients = recipients_query(broadcast.filter_degree, broadcast.filter_year)
+    columns = Notification.__table__.c
+    # Constant values are cast to their column types so PostgreSQL does not
+    # resolve them as text in the INSERT ... SELECT
+    constants = {
+        "title": broadcast.title,
+        "message": broadcast.message,
+        "notification_type": broadcast.notification_type,
+        "is_read": False,
+        "sent_by": broadcast.sent_by,
+        "broadcast_id": broadcast.id,
+    }
+    values = [cast(literal(value, columns[name].type), columns[name].type) for name, value in constants.items()]
+
+    try:
+        while True:
+            upper = _next_batch_upper_bound(db, recipients, last_id)
+
+            batch = recipients.where(User.id > last_id)
+            if upper is not None:
+                batch = batch.where(User.id <= upper)
+
+            inserted = db.execute(
+                insert(Notification).from_select(
+                    ["user_id", *constants],
+                    batch.with_only_columns(User.id, *values)
+                ).returning(Notification.id, Notification.user_id)
+            ).all()
+            db.execute(
+                update(NotificationBroadcast)
+                .where(NotificationBroadcast.id == broadcast.id)
+                .values(delivered_count=NotificationBroadcast.delivered_count + len(inserted))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            
+            publish_notifications(
+                notification_payload(notification_id, user_id, broadcast.title, broadcast.message,
+                                     broadcast.notification_type, broadcast.sent_by)
+                for notification_id, user_id in inserted
+            )
+
+            if upper is None:
+                break
+            last_id = upper
+
+        broadcast.status = "Completed"
+        broadcast.completed_at = datetime.now()
+        broadcast.error = None
+        db.commit()
+    except Exception as e:
+        # The broadcast stays "Sending" so the task's retry resumes it; it is
+        # marked Failed only when the last attempt fails
+        db.rollback()
+        broadcast.error = str(e)
+        db.commit()
+        print(f"Error delivering broadcast {broadcast_id}: {e}")
+        raise
+
+
+def bump_read_counts(db: Session, read_counts: Dict[int, int]):
+    """Adjust broadcast read counters, given {broadcast_id: delta}"""
+    for broadcast_id, delta in read_counts.items():
+        if broadcast_id is not None and delta:
+            db.execute(
+                update(NotificationBroadcast)
+                .where(NotificationBroadcast.id == broadcast_id)
+                .values(read_count=NotificationBroadcast.read_count + delta)
+                .execution_options(synchronize_session=False)
+            )
+
+
+def get_broadcast_history(db: Session, limit: int = 20, before_id: Optional[int] = None):
+    """Newest broadcasts first, paged by id"""
+    query = db.query(NotificationBroadcast)
+    if before_id:
+        query = query.filter(NotificationBroadcast.id < before_id)
+    return query.order_by(NotificationBroadcast.id.desc()).limit(limit).all()
+
+
+def mark_broadcast_failed(broadcast_id: int):
+    """Failure hook for deliver_broadcast once its retries are used up"""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(NotificationBroadcast)
+            .where(NotificationBroadcast.id == broadcast_id,
+                   NotificationBroadcast.status.in_(("Pending", "Sending")))
+            .values(status="Failed")
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+@task("broadcasts.deliver", on_failure=mark_broadcast_failed)
+def deliver_broadcast(broadcast_id: int):
+    """Background task entry point with its own session"""
+    db = SessionLocal()
+    try:
+        fan_out_broadcast(db, broadcast_id)
+    finally:
+        db.close()
@@ -6,33 +6,37 @@ Handles user authentication and sync with Clerk
 from app.core.config import settings
 from app.db.session import SessionLocal
 from app.models import User, UserRole
+from app.core.counters import bump_student_counter
+from app.core.clerk_tokens import InvalidSessionToken, verify_session_token
+from app.core.http_client import http_client, request_with_retries
 from typing import Optional
-import httpx
 
 class ClerkAuth:
     """Clerk authentication helper"""
     
     CLERK_API_URL = "https://api.clerk.com/v1"
     
+    @staticmethod
+    def api_headers() -> dict:
+        return {
+            "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
+            "Content-Type": "application/json"
+        }
+    
     @staticmethod
     async def get_user_from_clerk(clerk_user_id: str) -> Optional[dict]:
         """
         Fetch user data from Clerk API
         """
-        headers = {
-            "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{ClerkAuth.CLERK_API_URL}/users/{clerk_user_id}",
-                    headers=headers,
-                    timeout=10
-                )
-                if response.status_code == 200:
-                    return response.json()
+            response = await request_with_retries(
+                http_client.client,
+                "GET",
+                f"{ClerkAuth.CLERK_API_URL}/users/{clerk_user_id}",
+                headers=ClerkAuth.api_headers()
+            )
+            if response.status_code == 200:
+                return response.json()
         except Exception as e:
             print(f"Error fetching user from Clerk: {e}")
         
@@ -61,6 +65,7 @@ class ClerkAuth:
                     is_approved=(role == UserRole.STUDENT)  # Students auto-approved
                 )
                 db.add(user)
+                bump_student_counter(db, role)
                 db.commit()
                 db.refresh(user)
             else:
@@ -78,24 +83,11 @@ class ClerkAuth:
     @staticmethod
     async def verify_clerk_session(session_token: str) -> Optional[str]:
         """
-        Verify Clerk session token and return clerk_user_id
+        Verify Clerk session token locally and return clerk_user_id
         """
-        headers = {
-            "Authorization": f"Bearer {settings.CLERK_SECRET_KEY}",
-        }
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{ClerkAuth.CLERK_API_URL}/sessions/verify",
-                    json={"token": session_token},
-                    headers=headers,
-                    timeout=10
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("user_id")
-        except Exception as e:
+            claims = await verify_session_token(session_token)
+        except InvalidSessionToken as e:
             print(f"Error verifying Clerk session: {e}")
-        
-        return None
+            return None
+        return claims["sub"]
@@ -0,0 +1,159 @@
+"""
+Bulk user sync from Clerk
+Pages through the Clerk user list with a bounded number of requests in
+flight and upserts each page with a single INSERT ... ON CONFLICT statement
+instead of one query and commit per user. Used by sync_clerk_users.py to
+repair drift that webhooks missed.
+"""
+
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.clerk_auth import ClerkAuth
+from app.core.counters import bump_student_counter
+from app.core.http_client import http_client, request_with_retries
+from app.db.session import SessionLocal, dialect_insert
+from app.models.user import User, UserRole
+
+CLERK_PAGE_SIZE = 500  # Clerk's maximum
+CLERK_SYNC_CONCURRENCY = 4
+
+
+def primary_email(data: Dict[str, Any]) -> str:
+    email_addresses = data.get("email_addresses") or []
+    if not email_addresses:
+        return ""
+    primary = next(
+        (email for email in email_addresses if email.get("id") == data.get("primary_email_address_id")),
+        email_addresses[0]
+    )
+    return primary.get("email_address") or ""
+
+
+def clerk_user_row(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """users row values for a Clerk user object, or None if it has no email"""
+    email = primary_email(data)
+    if not data.get("id") or not email:
+        return None
+    role = UserRole((data.get("unsafe_metadata") or {}).get("role") or UserRole.STUDENT.value)
+    return {
+        "clerk_user_id": data["id"],
+        "email": email,
+        "first_name": data.get("first_name") or "",
+        "last_name": data.get("last_name") or "",
+        "role": role,
+        "is_active": True,
+        "is_approved": role == UserRole.STUDENT,  # Students auto-approved
+    }
+
+
+def upsert_clerk_users(db: Session, clerk_users: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Create or update users from Clerk user objects in one statement, within
+    the caller's transaction. Existing users keep their role and approval;
+    only email and name are refreshed, as with the user.updated webhook.
+    """
+    counts = {"created": 0, "updated": 0, "skipped": 0}
+    rows: Dict[str, Dict[str, Any]] = {}
+    for data in clerk_users:
+        row = clerk_user_row(data)
+        if row is None:
+            counts["skipped"] += 1
+        else:
+            rows[row["clerk_user_id"]] = row
+    if not rows:
+        return counts
+
+    existing = set(db.execute(
+        select(User.clerk_user_id).where(User.clerk_user_id.in_(list(rows)))
+    ).scalars())
+    # An email held by another account (e.g. a local registration) would
+    # violate the unique constraint and abort the whole batch
+    email_owners = dict(db.execute(
+        select(User.email, User.clerk_user_id).where(User.email.in_({row["email"] for row in rows.values()}))
+    ).all())
+
+    batch: List[Dict[str, Any]] = []
+    for clerk_user_id, row in rows.items():
+        owner = email_owners.setdefault(row["email"], clerk_user_id)
+        if owner != clerk_user_id:
+            print(f"Skipping Clerk user {clerk_user_id}: {row['email']} belongs to {owner}")
+            counts["skipped"] += 1
+            continue
+        batch.append(row)
+    if not batch:
+        return counts
+
+    insert = dialect_insert(db)
+    stmt = insert(User).values(batch)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[User.clerk_user_id],
+        set_={
+            "email": stmt.excluded.email,
+            "first_name": stmt.excluded.first_name,
+            "last_name": stmt.excluded.last_name,
+            "updated_at": func.now(),
+        },
+    ))
+
+    created = [row for row in batch if row["clerk_user_id"] not in existing]
+    bump_student_counter(db, UserRole.STUDENT.value, sum(1 for row in created if row["role"] == UserRole.STUDENT))
+    counts["created"] += len(created)
+    counts["updated"] += len(batch) - len(created)
+    return counts
+
+
+async def _get_json(client: httpx.AsyncClient, path: str, **params) -> Any:
+    response = await request_with_retries(
+        client, "GET", f"{ClerkAuth.CLERK_API_URL}{path}", headers=ClerkAuth.api_headers(), params=params
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def _upsert_page(users: List[Dict[str, Any]]) -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        counts = upsert_clerk_users(db, users)
+        db.commit()
+        return counts
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def sync_all_clerk_users(
+    page_size: int = CLERK_PAGE_SIZE,
+    concurrency: int = CLERK_SYNC_CONCURRENCY,
+    client: Optional[httpx.AsyncClient] = None
+) -> Dict[str, int]:
+    """Fetch every Clerk user and upsert them page by page; returns totals"""
+    client = client or http_client.client
+    total = (await _get_json(client, "/users/count"))["total_count"]
+    totals = {"created": 0, "updated": 0, "skipped": 0, "failed_pages": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def sync_page(offset: int):
+        async with semaphore:
+            # Oldest first, so users signing up during the sync land on later pages
+            users = await _get_json(client, "/users", limit=page_size, offset=offset, order_by="+created_at")
+            # The database write runs in a thread so other pages keep downloading
+            counts = await asyncio.to_thread(_upsert_page, users)
+        for name, value in counts.items():
+            totals[name] += value
+
+    results = await asyncio.gather(
+        *(sync_page(offset) for offset in range(0, total, page_size)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            totals["failed_pages"] += 1
+            print(f"Error syncing Clerk users page: {result}")
+    return totals
@@ -0,0 +1,153 @@
+"""
+Local verification of Clerk session tokens
+Session JWTs are checked against Clerk's signing keys (JWKS) held in memory,
+so an authenticated request costs a signature check instead of a round trip
+to api.clerk.com. Keys are refetched after CLERK_JWKS_TTL_SECONDS, and
+immediately (at most once per CLERK_JWKS_MIN_REFRESH_SECONDS) when a token
+names a key id we have not seen, which is how Clerk key rotation shows up.
+If a refresh fails the previous keys stay in use.
+
+Setting CLERK_JWT_KEY to the PEM public key from the Clerk dashboard skips
+fetching altogether.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from jose import jwk, jwt
+from jose.exceptions import JOSEError
+
+from app.core.config import settings
+from app.core.http_client import http_client, request_with_retries
+
+CLERK_JWKS_URL = "https://api.clerk.com/v1/jwks"
+ALGORITHMS = ["RS256"]
+
+
+class InvalidSessionToken(Exception):
+    pass
+
+
+async def fetch_clerk_jwks() -> Dict[str, Any]:
+    url = settings.CLERK_JWKS_URL or CLERK_JWKS_URL
+    headers = {}
+    if url.startswith(CLERK_JWKS_URL) and settings.CLERK_SECRET_KEY:
+        headers["Authorization"] = f"Bearer {settings.CLERK_SECRET_KEY}"
+    response = await request_with_retries(http_client.client, "GET", url, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+
+class JWKSCache:
+    """Signing keys by key id, built into verification keys once per fetch"""
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        ttl_seconds: int,
+        min_refresh_seconds: int
+    ):
+        self.fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = float("-inf")
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _fresh(self) -> bool:
+        return bool(self._keys) and time.monotonic() - self._fetched_at < self.ttl_seconds
+
+    async def refresh(self, force: bool = False):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        started = time.monotonic()
+        async with self._lock:
+            # Another request refreshed while this one waited
+            if self._attempted_at >= started or (not force and self._fresh()):
+                return
+            # Bounds fetches for unknown key ids and while Clerk is unreachable
+            if time.monotonic() - self._attempted_at < self.min_refresh_seconds:
+                return
+            self._attempted_at = time.monotonic()
+            try:
+                jwks = await self.fetch()
+                keys = {}
+                for key_data in jwks.get("keys", []):
+                    if key_data.get("kty") == "RSA" and key_data.get("use", "sig") == "sig":
+                        keys[key_data.get("kid")] = jwk.construct(key_data, key_data.get("alg", "RS256"))
+            except Exception as e:
+                print(f"Error fetching Clerk JWKS: {e}")
+                return
+            if keys:
+                self._keys = keys
+                self._fetched_at = time.monotonic()
+
+    async def get_key(self, kid: Optional[str]):
+        if not self._fresh():
+            await self.refresh()
+        key = self._lookup(kid)
+        if key is None:
+            # Unknown key id: Clerk may have rotated its signing key
+            await self.refresh(force=True)
+            key = self._lookup(kid)
+        return key
+
+    def _lookup(self, kid: Optional[str]):
+        if kid is None and len(self._keys) == 1:
+            return next(iter(self._keys.values()))
+        return self._keys.get(kid)
+
+    def clear(self):
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._attempted_at = float("-inf")
+
+
+clerk_jwks = JWKSCache(fetch_clerk_jwks, settings.CLERK_JWKS_TTL_SECONDS, settings.CLERK_JWKS_MIN_REFRESH_SECONDS)
+_static_key = None
+
+
+def _configured_key():
+    global _static_key
+    if _static_key is None and settings.CLERK_JWT_KEY:
+        _static_key = jwk.construct(settings.CLERK_JWT_KEY.replace("\\n", "\n"), "RS256")
+    return _static_key
+
+
+async def verify_session_token(token: str, jwks: JWKSCache = clerk_jwks) -> Dict[str, Any]:
+    """Claims of a valid Clerk session token; raises InvalidSessionToken otherwise"""
+    try:
+        header = jwt.get_unverified_header(token)
+    except JOSEError as e:
+        raise InvalidSessionToken(f"Malformed token: {e}")
+    if header.get("alg") not in ALGORITHMS:
+        raise InvalidSessionToken("Unsupported signing algorithm")
+
+    key = _configured_key() or await jwks.get_key(header.get("kid"))
+    if key is None:
+        raise InvalidSessionToken("Unknown signing key")
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=ALGORITHMS,
+            issuer=settings.CLERK_JWT_ISSUER or None,
+            options={
+                "verify_aud": False,
+                "verify_iss": bool(settings.CLERK_JWT_ISSUER),
+                "leeway": settings.CLERK_JWT_LEEWAY_SECONDS,
+            },
+        )
+    except JOSEError as e:
+        raise InvalidSessionToken(str(e))
+
+    # Clerk sets azp to the origin that requested the token
+    azp = claims.get("azp")
+    if settings.CLERK_AUTHORIZED_PARTIES and azp and azp not in settings.CLERK_AUTHORIZED_PARTIES:
+        raise InvalidSessionToken("Token was issued for another origin")
+    if not claims.get("sub"):
+        raise InvalidSessionToken("Token has no subject")
+    return claims
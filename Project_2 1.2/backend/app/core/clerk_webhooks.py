@@ -0,0 +1,222 @@
+"""
+Clerk webhook inbox
+The webhook endpoint only verifies the Svix signature and stores the event
+in clerk_webhook_events keyed by svix-id, so redeliveries are dropped by the
+primary key and Clerk gets its acknowledgement straight away. A background
+task then drains pending events in batches: events for the same user collapse
+to the latest one, creates and updates become a single upsert and deletes are
+applied together, so a burst of deliveries costs a few statements.
+"""
+
+import base64
+import hashlib
+import hmac
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.clerk_sync import upsert_clerk_users
+from app.core.config import settings
+from app.core.counters import remove_user
+from app.core.downloads import download_meta
+from app.core.storage import presigned_urls
+from app.core.tasks import enqueue, task
+from app.db.session import SessionLocal, dialect_insert
+from app.models.task import QueuedTask
+from app.models.user import User
+from app.models.webhook import ClerkWebhookEvent
+
+USER_EVENTS = {"user.created", "user.updated", "user.deleted"}
+APPLY_TASK = "clerk.apply_webhook_events"
+WEBHOOK_BATCH_SIZE = 500
+# Deliveries arriving within this window are applied by the same task run
+WEBHOOK_BATCH_DELAY_SECONDS = 1
+# Svix rejects timestamps further than this from the current time
+WEBHOOK_TIMESTAMP_TOLERANCE_SECONDS = 300
+
+
+class InvalidWebhookSignature(Exception):
+    pass
+
+
+def verify_svix_signature(secret: str, svix_id: str, svix_timestamp: str, signature_header: str, payload: bytes):
+    """Check a Svix v1 signature ("v1,<base64 HMAC-SHA256>"); raises InvalidWebhookSignature"""
+    if not (svix_id and svix_timestamp and signature_header):
+        raise InvalidWebhookSignature("Missing Svix headers")
+    try:
+        timestamp = int(svix_timestamp)
+    except ValueError:
+        raise InvalidWebhookSignature("Invalid timestamp")
+    if abs(time.time() - timestamp) > WEBHOOK_TIMESTAMP_TOLERANCE_SECONDS:
+        raise InvalidWebhookSignature("Timestamp outside the tolerance window")
+
+    key = base64.b64decode(secret.removeprefix("whsec_"))
+    signed = f"{svix_id}.{svix_timestamp}.".encode() + payload
+    expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+    # Several space-separated signatures are sent while a secret is rotated
+    for candidate in signature_header.split():
+        version, _, signature = candidate.partition(",")
+        if version == "v1" and hmac.compare_digest(signature, expected):
+            return
+    raise InvalidWebhookSignature("No matching signature")
+
+
+def record_webhook_event(db: Session, svix_id: str, event_type: str, data: Dict[str, Any]) -> bool:
+    """
+    Add an event to the inbox within the caller's transaction; returns False
+    when this svix-id was already received
+    """
+    insert = dialect_insert(db)
+    result = db.execute(
+        insert(ClerkWebhookEvent)
+        .values(svix_id=svix_id, event_type=event_type, payload=data, status="pending", received_at=datetime.now())
+        .on_conflict_do_nothing(index_elements=[ClerkWebhookEvent.svix_id])
+    )
+    if result.rowcount == 0:
+        return False
+
+    # One not-yet-due task drains everything that arrives before it runs
+    scheduled = db.execute(
+        select(QueuedTask.id)
+        .where(QueuedTask.name == APPLY_TASK, QueuedTask.status == "queued", QueuedTask.run_at > datetime.now())
+        .limit(1)
+    ).first()
+    if scheduled is None:
+        enqueue(db, APPLY_TASK, delay_seconds=WEBHOOK_BATCH_DELAY_SECONDS)
+    return True
+
+
+def _latest_per_user(events: List[ClerkWebhookEvent]) -> Dict[str, ClerkWebhookEvent]:
+    """Last event per Clerk user; deliveries may arrive out of order, so deletes win and then updated_at"""
+    latest: Dict[str, ClerkWebhookEvent] = {}
+    for event in events:
+        clerk_user_id = (event.payload or {}).get("id")
+        if event.event_type not in USER_EVENTS or not clerk_user_id:
+            continue
+        rank = (event.event_type == "user.deleted", (event.payload or {}).get("updated_at") or 0)
+        current = latest.get(clerk_user_id)
+        if current is None or rank >= (current.event_type == "user.deleted", (current.payload or {}).get("updated_at") or 0):
+            latest[clerk_user_id] = event
+    return latest
+
+
+def _already_deleted(db: Session, clerk_user_ids: List[str]) -> List[str]:
+    """The given Clerk users whose user.deleted event has already been processed"""
+    if not clerk_user_ids:
+        return []
+    clerk_user_id = ClerkWebhookEvent.payload["id"].as_string()
+    return db.execute(
+        select(clerk_user_id).distinct()
+        .where(
+            ClerkWebhookEvent.event_type == "user.deleted",
+            ClerkWebhookEvent.status == "processed",
+            clerk_user_id.in_(clerk_user_ids)
+        )
+    ).scalars().all()
+
+
+def apply_events(db: Session, events: List[ClerkWebhookEvent]) -> List[int]:
+    """
+    Apply a batch of user events within the caller's transaction; returns the
+    ids of uploads deleted with their users
+    """
+    latest = _latest_per_user(events)
+    deleted = [clerk_user_id for clerk_user_id, event in latest.items() if event.event_type == "user.deleted"]
+    updated = {clerk_user_id: event.payload for clerk_user_id, event in latest.items() if event.event_type != "user.deleted"}
+    # An update delivered after the user's deletion was processed in an
+    # earlier batch must not recreate them; Clerk never reuses user ids
+    for clerk_user_id in _already_deleted(db, list(updated)):
+        updated.pop(clerk_user_id)
+    upsert_clerk_users(db, list(updated.values()))
+
+    upload_ids = []
+    if deleted:
+        for user in db.query(User).filter(User.clerk_user_id.in_(deleted)).all():
+            upload_ids += remove_user(db, user)
+    return upload_ids
+
+
+def _forget_files(file_ids: List[int]):
+    """Drop cached download metadata for uploads deleted by a committed batch"""
+    for file_id in file_ids:
+        download_meta.invalidate(file_id)
+        presigned_urls.invalidate(file_id)
+
+
+def _mark(db: Session, svix_ids: List[str], status: str, error: str = None):
+    db.execute(
+        update(ClerkWebhookEvent)
+        .where(ClerkWebhookEvent.svix_id.in_(svix_ids))
+        .values(status=status, error=error, processed_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _claim_pending(db: Session, limit: int, svix_id: str = None) -> List[ClerkWebhookEvent]:
+    query = db.query(ClerkWebhookEvent).filter(ClerkWebhookEvent.status == "pending")
+    if svix_id is not None:
+        query = query.filter(ClerkWebhookEvent.svix_id == svix_id)
+    return query.order_by(ClerkWebhookEvent.received_at).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def apply_pending_events(db: Session, limit: int = WEBHOOK_BATCH_SIZE) -> int:
+    """Apply up to limit pending events in one transaction; returns how many were taken"""
+    events = _claim_pending(db, limit)
+    if not events:
+        db.commit()
+        return 0
+    svix_ids = [event.svix_id for event in events]
+    try:
+        upload_ids = apply_events(db, events)
+        _mark(db, svix_ids, "processed")
+        db.commit()
+        _forget_files(upload_ids)
+        return len(events)
+    except Exception as e:
+        db.rollback()
+        print(f"Error applying webhook batch, retrying events one by one: {e}")
+
+    # Isolate the events that fail so they do not hold back the rest
+    for svix_id in svix_ids:
+        events = _claim_pending(db, 1, svix_id)
+        if not events:
+            db.commit()
+            continue
+        try:
+            upload_ids = apply_events(db, events)
+            _mark(db, [svix_id], "processed")
+            db.commit()
+            _forget_files(upload_ids)
+        except Exception as e:
+            db.rollback()
+            _mark(db, [svix_id], "failed", str(e))
+            db.commit()
+            print(f"Error applying webhook event {svix_id}: {e}")
+    return len(svix_ids)
+
+
+def purge_processed_events(db: Session) -> int:
+    """Forget processed events once Svix can no longer redeliver them"""
+    cutoff = datetime.now() - timedelta(days=settings.CLERK_WEBHOOK_RETENTION_DAYS)
+    result = db.execute(
+        delete(ClerkWebhookEvent)
+        .where(ClerkWebhookEvent.status == "processed", ClerkWebhookEvent.received_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+@task(APPLY_TASK)
+def apply_webhook_events():
+    """Background task: drain the inbox"""
+    db = SessionLocal()
+    try:
+        while apply_pending_events(db) == WEBHOOK_BATCH_SIZE:
+            pass
+        purge_processed_events(db)
+    finally:
+        db.close()
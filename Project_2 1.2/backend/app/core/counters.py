@@ -0,0 +1,186 @@
+"""
+Incrementally maintained statistics counters
+Write paths bump counters inside their own transaction so stats endpoints can
+read precomputed values instead of recounting tables on every request
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.blobs import release_blob
+from app.db.session import dialect_insert
+from app.models.counter import StatCounter
+from app.models.user import User, UserRole, Profile
+from app.models.job import Job, JobApplication
+from app.models.event import EventRegistration
+from app.models.file import FileUpload
+
+JOBS_TOTAL = "jobs_total"
+APPLICATIONS_TOTAL = "applications_total"
+STUDENTS_TOTAL = "students_total"
+PLACED_STUDENTS = "placed_students"
+APPROVED_PROFILES = "approved_profiles"
+EVENT_REGISTRATIONS_TOTAL = "event_registrations_total"
+
+# Upload counters are kept per file type
+FILE_TYPE_COUNTERS = {
+    "resume": "resumes_uploaded",
+    "offer_letter": "offer_letters_uploaded",
+    "certificate": "certificates_uploaded",
+}
+
+
+def _file_count_query(file_type: str):
+    return lambda db: db.query(func.count(FileUpload.id)).filter(FileUpload.file_type == file_type)
+
+
+# Source-of-truth queries used to seed and reconcile each counter
+COUNTER_QUERIES = {
+    JOBS_TOTAL: lambda db: db.query(func.count(Job.id)),
+    APPLICATIONS_TOTAL: lambda db: db.query(func.count(JobApplication.id)),
+    STUDENTS_TOTAL: lambda db: db.query(func.count(User.id)).filter(User.role == UserRole.STUDENT),
+    PLACED_STUDENTS: lambda db: db.query(func.count(Profile.id)).filter(Profile.placement_status == 'Placed'),
+    APPROVED_PROFILES: lambda db: db.query(func.count(Profile.id)).filter(Profile.is_approved == True),
+    EVENT_REGISTRATIONS_TOTAL: lambda db: db.query(func.count(EventRegistration.id)),
+    **{name: _file_count_query(file_type) for file_type, name in FILE_TYPE_COUNTERS.items()},
+}
+
+
+def recount(db: Session, name: str) -> int:
+    """Count a counter's value from the underlying tables"""
+    return COUNTER_QUERIES[name](db).scalar() or 0
+
+
+def _increment(db: Session, name: str, delta: int) -> int:
+    return db.execute(
+        update(StatCounter)
+        .where(StatCounter.name == name)
+        .values(value=StatCounter.value + delta)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def bump_counter(db: Session, name: str, delta: int = 1):
+    """
+    Adjust a counter within the caller's transaction.
+    A missing counter is seeded from a full recount, which already includes
+    the caller's pending change once flushed. When a concurrent first writer
+    seeds it instead, that recount cannot see this uncommitted change, so the
+    seed is skipped and the increment applied to their row.
+    """
+    if not delta:
+        return
+    db.flush()
+    if _increment(db, name, delta):
+        return
+    insert = dialect_insert(db)
+    seeded = db.execute(
+        insert(StatCounter)
+        .values(name=name, value=recount(db, name))
+        .on_conflict_do_nothing(index_elements=[StatCounter.name])
+    )
+    if seeded.rowcount == 0:
+        _increment(db, name, delta)
+
+
+def bump_file_counter(db: Session, file_type: Optional[str], delta: int = 1):
+    name = FILE_TYPE_COUNTERS.get(file_type)
+    if name:
+        bump_counter(db, name, delta)
+
+
+def bump_placement_counter(db: Session, old_status: Optional[str], new_status: Optional[str]):
+    if old_status != new_status:
+        if new_status == 'Placed':
+            bump_counter(db, PLACED_STUDENTS, 1)
+        elif old_status == 'Placed':
+            bump_counter(db, PLACED_STUDENTS, -1)
+
+
+def bump_student_counter(db: Session, role, delta: int = 1):
+    # Roles may arrive as raw strings in any case before the user is flushed
+    if isinstance(role, str) and role.upper() == UserRole.STUDENT.value:
+        bump_counter(db, STUDENTS_TOTAL, delta)
+
+
+def user_contributions(db: Session, user: User) -> Dict[str, int]:
+    """Counter values a user and the rows removed with it account for, used before deleting the user"""
+    contributions = {
+        STUDENTS_TOTAL: 1 if user.role == UserRole.STUDENT else 0,
+        APPLICATIONS_TOTAL: db.query(func.count(JobApplication.id)).filter(JobApplication.user_id == user.id).scalar() or 0,
+        EVENT_REGISTRATIONS_TOTAL: db.query(func.count(EventRegistration.id)).filter(EventRegistration.user_id == user.id).scalar() or 0,
+    }
+    uploads = (
+        db.query(FileUpload.file_type, func.count(FileUpload.id))
+        .filter(FileUpload.user_id == user.id)
+        .group_by(FileUpload.file_type)
+        .all()
+    )
+    for file_type, count in uploads:
+        name = FILE_TYPE_COUNTERS.get(file_type)
+        if name:
+            contributions[name] = count
+    profile = user.profile
+    if profile:
+        contributions[PLACED_STUDENTS] = 1 if profile.placement_status == 'Placed' else 0
+        contributions[APPROVED_PROFILES] = 1 if profile.is_approved else 0
+    return contributions
+
+
+def release_contributions(db: Session, contributions: Dict[str, int]):
+    """Subtract the values returned by user_contributions once the user is deleted"""
+    for name, value in contributions.items():
+        bump_counter(db, name, -value)
+
+
+def remove_user(db: Session, user: User) -> List[int]:
+    """
+    Delete a user within the caller's transaction, along with the event
+    registrations and uploads that the schema does not cascade to, and
+    release their counters. Returns the deleted upload ids so callers can
+    drop cached download metadata once they commit.
+    """
+    contributions = user_contributions(db, user)
+    db.query(EventRegistration).filter(EventRegistration.user_id == user.id).delete(synchronize_session=False)
+    upload_ids = []
+    for upload in db.query(FileUpload).filter(FileUpload.user_id == user.id).all():
+        release_blob(db, upload)
+        db.delete(upload)
+        upload_ids.append(upload.id)
+    db.delete(user)
+    release_contributions(db, contributions)
+    return upload_ids
+
+
+def read_counters(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Read several counters at once, falling back to a recount for unseeded ones"""
+    names = list(names)
+    rows = db.query(StatCounter.name, StatCounter.value).filter(StatCounter.name.in_(names)).all()
+    values = {name: value for name, value in rows}
+    for name in names:
+        if name not in values:
+            values[name] = recount(db, name)
+    return values
+
+
+def reconcile_counters(db: Session) -> Dict[str, Dict[str, Optional[int]]]:
+    """
+    Rebuild every counter from scratch and report drift.
+    Returns {name: {"stored": old value or None, "actual": recounted value}}
+    for counters whose stored value was wrong or missing.
+    """
+    stored = {row.name: row for row in db.query(StatCounter).with_for_update().all()}
+    drift = {}
+    for name in COUNTER_QUERIES:
+        actual = recount(db, name)
+        row = stored.get(name)
+        if row is None:
+            db.add(StatCounter(name=name, value=actual))
+            drift[name] = {"stored": None, "actual": actual}
+        elif row.value != actual:
+            drift[name] = {"stored": row.value, "actual": actual}
+            row.value = actual
+    db.commit()
+    return drift
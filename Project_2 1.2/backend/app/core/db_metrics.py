@@ -0,0 +1,109 @@
+"""
+Database connection pool instrumentation
+Pools built by app.db.session time every checkout, including how long a
+request waited for a free connection, and get_db records how long each
+request held its session, so pool sizing can be based on observed load
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class TimingStats:
+    """Running count / total / max of a duration in seconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PoolMetrics:
+    """Checkout wait and session hold times for one engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkout_wait = TimingStats()
+            self.session_hold = TimingStats()
+            self.checkout_timeouts = 0
+
+    def record_checkout(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkout_wait.record(seconds)
+            if timed_out:
+                self.checkout_timeouts += 1
+
+    def record_session(self, seconds: float):
+        with self._lock:
+            self.session_hold.record(seconds)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "checkout_wait": self.checkout_wait.as_dict(),
+                "session_hold": self.session_hold.as_dict(),
+                "checkout_timeouts": self.checkout_timeouts,
+            }
+        data["pool"] = pool_status(pool)
+        return data
+
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Current occupancy for pools that track it (QueuePool and subclasses)"""
+    status = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    return status
+
+
+sync_pool_metrics = PoolMetrics()
+async_pool_metrics = PoolMetrics()
+
+
+class _TimedCheckoutMixin:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record_checkout(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    metrics = sync_pool_metrics
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    metrics = async_pool_metrics
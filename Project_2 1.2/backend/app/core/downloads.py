@@ -0,0 +1,216 @@
+"""
+Local file downloads
+Serves files from the upload folder with a strong ETag derived from the
+content hash (a weak one from mtime and size for rows without a hash),
+conditional GET (304), single byte ranges and zero-copy sends
+when the ASGI server offers the pathsend or zerocopysend extension.
+File metadata is cached briefly so repeat hits skip the database.
+"""
+
+import os
+import stat
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+DOWNLOAD_META_TTL_SECONDS = 300
+DOWNLOAD_META_MAX_ENTRIES = 10000
+# Content is addressed by hash, so clients may reuse it but must revalidate
+DOWNLOAD_CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+
+class FileMeta:
+    """The FileUpload columns a download needs"""
+
+    __slots__ = ("file_path", "file_name", "mime_type", "file_hash", "file_url")
+
+    def __init__(self, file_path, file_name, mime_type, file_hash, file_url):
+        self.file_path = file_path
+        self.file_name = file_name
+        self.mime_type = mime_type
+        self.file_hash = file_hash
+        self.file_url = file_url
+
+    @classmethod
+    def from_row(cls, row) -> "FileMeta":
+        return cls(row.file_path, row.file_name, row.mime_type, row.file_hash, row.file_url)
+
+
+class FileMetaCache:
+    """In-process cache of download metadata keyed by file id"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[int, Tuple[FileMeta, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_id: int) -> Optional[FileMeta]:
+        entry = self._entries.get(file_id)
+        if entry and time.monotonic() - entry[1] < self.ttl_seconds:
+            return entry[0]
+        return None
+
+    def set(self, file_id: int, meta: FileMeta):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[file_id] = (meta, time.monotonic())
+
+    def invalidate(self, file_id: int):
+        with self._lock:
+            self._entries.pop(file_id, None)
+
+
+download_meta = FileMetaCache(DOWNLOAD_META_TTL_SECONDS, DOWNLOAD_META_MAX_ENTRIES)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as for GET)"""
+    candidates = [tag.strip() for tag in header.split(",")]
+    opaque = etag.removeprefix("W/")
+    return "*" in candidates or any(tag.removeprefix("W/") == opaque for tag in candidates)
+
+
+def if_range_matches(header: str, etag: str) -> bool:
+    """If-Range comparison: strong, so a weak ETag (or a date) never matches"""
+    return not etag.startswith("W/") and header.strip() == etag
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) for a single "bytes=" range. Returns None when the
+    header should be ignored (other units or several ranges, which are served
+    in full). Raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if start < 0 or start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def not_modified(request: Request, etag: str, mtime: Optional[float]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and mtime is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class LocalFileResponse(FileResponse):
+    """FileResponse that sends one byte range and prefers zero-copy sends"""
+
+    def __init__(self, path: str, stat_result: os.stat_result, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        size = stat_result.st_size
+        self.offset, last = byte_range or (0, size - 1)
+        self.count = last - self.offset + 1
+        self.headers["accept-ranges"] = "bytes"
+        if byte_range:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {self.offset}-{last}/{size}"
+            self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if self.send_header_only or self.count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.offset)
+                remaining = self.count
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+async def serve_local_file(request: Request, meta: FileMeta) -> Optional[Response]:
+    """Response for a locally stored file, or None when it is missing on disk"""
+    try:
+        stat_result = await run_in_threadpool(os.stat, meta.file_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+
+    if meta.file_hash:
+        etag = f'"{meta.file_hash}"'
+    else:
+        # Older rows have no hash; this replaces Starlette's default ETag so
+        # that the tag clients send back is the one compared here
+        etag = f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+    headers = {"cache-control": DOWNLOAD_CACHE_CONTROL, "etag": etag}
+
+    if not_modified(request, etag, stat_result.st_mtime):
+        headers["last-modified"] = formatdate(stat_result.st_mtime, usegmt=True)
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range_matches(if_range, etag)):
+        try:
+            byte_range = parse_range(range_header, stat_result.st_size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{stat_result.st_size}"
+            return Response(status_code=416, headers=headers)
+
+    return LocalFileResponse(
+        meta.file_path,
+        stat_result,
+        byte_range,
+        headers=headers,
+        filename=meta.file_name,
+        media_type=meta.mime_type,
+        method=request.method,
+    )
@@ -0,0 +1,91 @@
+"""
+Shared outbound HTTP client
+One httpx.AsyncClient lives for the lifetime of the application (started
+and closed in main.lifespan), so calls to Clerk reuse pooled keep-alive
+connections, over HTTP/2 when the h2 package is installed, instead of paying
+for a TLS handshake per call. Connection failures are retried by the
+transport; request_with_retries also retries rate-limited and 5xx
+responses for idempotent requests.
+"""
+
+import asyncio
+import importlib.util
+import random
+from typing import Optional
+
+import httpx
+
+HTTP_TIMEOUT_SECONDS = 10
+HTTP_CONNECT_RETRIES = 2
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE = 10
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30
+HTTP_RETRY_STATUSES = {429, 502, 503, 504}
+HTTP_MAX_RETRIES = 3
+HTTP_RETRY_BACKOFF_SECONDS = 0.5
+HTTP_MAX_RETRY_AFTER_SECONDS = 30
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def create_http_client(**kwargs) -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        http2=HTTP2_AVAILABLE,
+        retries=HTTP_CONNECT_RETRIES,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+    return httpx.AsyncClient(transport=transport, timeout=HTTP_TIMEOUT_SECONDS, **kwargs)
+
+
+class SharedHTTPClient:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = create_http_client()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use outside the app lifespan (scripts, tests)
+        if self._client is None or self._client.is_closed:
+            self._client = create_http_client()
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+http_client = SharedHTTPClient()
+
+
+def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_MAX_RETRY_AFTER_SECONDS)
+        except ValueError:
+            pass
+    return HTTP_RETRY_BACKOFF_SECONDS * 2 ** attempt * random.uniform(0.5, 1.0)
+
+
+async def request_with_retries(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send an idempotent request, retrying 429/5xx responses and read errors with backoff"""
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = await client.request(method, url, **kwargs)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt >= HTTP_MAX_RETRIES:
+                return response
+        except (httpx.TimeoutException, httpx.NetworkError):
+            if attempt >= HTTP_MAX_RETRIES:
+                raise
+        await asyncio.sleep(_retry_delay(response, attempt))
+        attempt += 1
@@ -0,0 +1,135 @@
+"""
+Notification inbox helpers
+Keeps a per-user unread count cache that is invalidated whenever a committed
+write touches that user's notifications, and pushes newly committed
+notifications to connected clients through the pub/sub broker
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from app.core.pubsub import broker
+from app.models.notification import Notification
+
+UNREAD_COUNT_TTL_SECONDS = 60
+
+TRACKED_TABLES = {Notification.__table__}
+
+
+class UnreadCountCache:
+    """In-process cache of unread notification counts keyed by user id"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._counts: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> int:
+        cached = self._counts.get(user_id)
+        if cached and time.monotonic() - cached[1] < self.ttl_seconds:
+            return cached[0]
+
+        # Served by the (user_id, is_read, created_at, id) index
+        count = db.query(func.count(Notification.id)).filter(
+            Notification.user_id == user_id,
+            Notification.is_read == False
+        ).scalar() or 0
+        with self._lock:
+            self._counts[user_id] = (count, time.monotonic())
+        return count
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._counts.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+unread_counts = UnreadCountCache(UNREAD_COUNT_TTL_SECONDS)
+
+
+def user_channel(user_id: int) -> str:
+    return f"notifications:user:{user_id}"
+
+
+def notification_payload(notification_id: int, user_id: int, title: str, message: str,
+                         notification_type, sent_by=None, created_at=None) -> Dict[str, Any]:
+    """Push payload shaped like NotificationResponse"""
+    return {
+        "id": notification_id,
+        "user_id": user_id,
+        "title": title,
+        "message": message,
+        "notification_type": getattr(notification_type, "value", notification_type),
+        "is_read": False,
+        "sent_by": sent_by,
+        "created_at": (created_at or datetime.now()).isoformat(),
+    }
+
+
+def publish_notifications(payloads: Iterable[Dict[str, Any]]):
+    for payload in payloads:
+        try:
+            broker.publish(user_channel(payload["user_id"]), payload)
+        except Exception as e:
+            print(f"Error publishing notification {payload.get('id')}: {e}")
+
+
+# --- Invalidation hooks ---
+
+@event.listens_for(Session, "before_flush")
+def _track_notification_writes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Notification) and obj.user_id is not None:
+            session.info.setdefault("inbox_users", set()).add(obj.user_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_new_notifications(session, flush_context):
+    # Ids are assigned by now; payloads are published once the commit succeeds
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            session.info.setdefault("inbox_new", []).append(notification_payload(
+                obj.id, obj.user_id, obj.title, obj.message,
+                obj.notification_type, obj.sent_by
+            ))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_notification_bulk_writes(orm_execute_state):
+    # Bulk statements may touch any user unless scoped with the
+    # inbox_user_id execution option
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table in TRACKED_TABLES:
+            user_id = orm_execute_state.execution_options.get("inbox_user_id")
+            if user_id is not None:
+                orm_execute_state.session.info.setdefault("inbox_users", set()).add(user_id)
+            else:
+                orm_execute_state.session.info["inbox_all"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_unread_counts(session):
+    publish_notifications(session.info.pop("inbox_new", ()))
+    
+    if session.info.pop("inbox_all", False):
+        session.info.pop("inbox_users", None)
+        unread_counts.clear()
+        return
+    for user_id in session.info.pop("inbox_users", ()):
+        unread_counts.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_inbox_tracking(session):
+    session.info.pop("inbox_all", None)
+    session.info.pop("inbox_users", None)
+    session.info.pop("inbox_new", None)
@@ -0,0 +1,176 @@
+"""
+Full-text job search
+PostgreSQL keeps a weighted tsvector of each posting in a generated column
+with a GIN index; SQLite (the bundled prepsphere.db) keeps an FTS5 index
+synced by triggers. Both rank matches (title and company weigh most, then
+location, description and requirements), treat every search term as a
+prefix so results appear while typing, and highlight matched terms in the
+title and a description snippet for the returned page only.
+"""
+
+import html
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.job import Job
+
+MAX_SEARCH_TERMS = 10
+# Private-use characters mark highlights in the database; they are turned
+# into <mark> tags after the text has been HTML-escaped
+HIGHLIGHT_START = "\ue000"
+HIGHLIGHT_STOP = "\ue001"
+
+_TERM = re.compile(r"\w+")
+
+PG_SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(company, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(location, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C') ||
+    setweight(to_tsvector('english', coalesce(requirements, '')), 'D')
+"""
+
+PG_INDEX_DDL = [
+    f"ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({PG_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_search_vector ON jobs USING GIN (search_vector)",
+]
+
+FTS_COLUMNS = "title, company, location, description, requirements"
+FTS_NEW_VALUES = "new.id, new.title, new.company, new.location, new.description, new.requirements"
+FTS_OLD_VALUES = "'delete', old.id, old.title, old.company, old.location, old.description, old.requirements"
+
+SQLITE_INDEX_DDL = [
+    f"CREATE VIRTUAL TABLE jobs_fts USING fts5({FTS_COLUMNS}, content='jobs', content_rowid='id', tokenize='porter unicode61')",
+    # Column weights for bm25, used by ORDER BY rank
+    "INSERT INTO jobs_fts(jobs_fts, rank) VALUES ('rank', 'bm25(10.0, 10.0, 4.0, 2.0, 1.0)')",
+    f"CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN "
+    f"INSERT INTO jobs_fts(rowid, {FTS_COLUMNS}) VALUES ({FTS_NEW_VALUES}); END",
+    f"CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN "
+    f"INSERT INTO jobs_fts(jobs_fts, rowid, {FTS_COLUMNS}) VALUES ({FTS_OLD_VALUES}); END",
+    f"CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE ON jobs BEGIN "
+    f"INSERT INTO jobs_fts(jobs_fts, rowid, {FTS_COLUMNS}) VALUES ({FTS_OLD_VALUES}); "
+    f"INSERT INTO jobs_fts(rowid, {FTS_COLUMNS}) VALUES ({FTS_NEW_VALUES}); END",
+    # Index the rows that existed before the index
+    "INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')",
+]
+
+PG_SEARCH_SQL = text("""
+    WITH query AS (SELECT to_tsquery('english', :query) AS q),
+    page AS (
+        SELECT jobs.id, ts_rank_cd(jobs.search_vector, query.q) AS rank
+        FROM jobs, query
+        WHERE jobs.search_vector @@ query.q
+          AND (:include_inactive OR coalesce(jobs.is_active, true))
+        ORDER BY rank DESC, jobs.id DESC
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.id, page.rank,
+           ts_headline('english', jobs.title, query.q, :title_options) AS title_highlight,
+           ts_headline('english', jobs.description, query.q, :snippet_options) AS snippet
+    FROM page JOIN jobs ON jobs.id = page.id, query
+    ORDER BY page.rank DESC, page.id DESC
+""")
+
+# FTS5 orders by rank itself, so highlight() and snippet() only run for the
+# rows inside LIMIT; bm25 is negative with the best match first
+SQLITE_SEARCH_SQL = text("""
+    SELECT jobs.id, -jobs_fts.rank AS rank,
+           highlight(jobs_fts, 0, :start, :stop) AS title_highlight,
+           snippet(jobs_fts, 3, :start, :stop, '…', 24) AS snippet
+    FROM jobs_fts JOIN jobs ON jobs.id = jobs_fts.rowid
+    WHERE jobs_fts MATCH :query
+      AND (:include_inactive OR coalesce(jobs.is_active, 1))
+    ORDER BY jobs_fts.rank
+    LIMIT :limit OFFSET :offset
+""")
+
+PG_TITLE_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, HighlightAll=true"
+PG_SNIPPET_OPTIONS = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30, MinWords=12, MaxFragments=2, FragmentDelimiter=\" … \""
+
+
+def install_search_index(engine: Engine):
+    """Create the search index for the engine's database if it is missing"""
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "postgresql":
+            for statement in PG_INDEX_DDL:
+                conn.execute(text(statement))
+        elif dialect == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs_fts'")
+            ).first()
+            if not exists:
+                for statement in SQLITE_INDEX_DDL:
+                    conn.execute(text(statement))
+        else:
+            print(f"Job search index is not supported on {dialect}")
+
+
+def search_terms(query: str) -> List[str]:
+    return _TERM.findall(query.lower())[:MAX_SEARCH_TERMS]
+
+
+def to_tsquery_text(terms: List[str]) -> str:
+    # Every term must match, each as a prefix: "data engi" -> data:* & engi:*
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def to_fts5_query(terms: List[str]) -> str:
+    # Quoted so FTS5 operators (AND, NEAR, column filters) are taken literally
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def render_highlight(value: Optional[str]) -> str:
+    """HTML-escape a highlighted value and turn the markers into <mark> tags"""
+    escaped = html.escape(value or "")
+    return escaped.replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
+
+
+async def search_jobs(
+    db: AsyncSession,
+    query: str,
+    limit: int,
+    offset: int = 0,
+    include_inactive: bool = False
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    Ranked matches for query as dicts with job, rank, title_highlight and
+    snippet, plus whether more results follow this page
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+
+    params = {"limit": limit + 1, "offset": offset, "include_inactive": include_inactive}
+    if db.get_bind().dialect.name == "postgresql":
+        stmt = PG_SEARCH_SQL
+        params.update(query=to_tsquery_text(terms), title_options=PG_TITLE_OPTIONS, snippet_options=PG_SNIPPET_OPTIONS)
+    else:
+        stmt = SQLITE_SEARCH_SQL
+        params.update(query=to_fts5_query(terms), start=HIGHLIGHT_START, stop=HIGHLIGHT_STOP)
+
+    rows = (await db.execute(stmt, params)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], False
+
+    jobs = {
+        job.id: job
+        for job in (await db.execute(select(Job).where(Job.id.in_([row.id for row in rows])))).scalars()
+    }
+    results = [
+        {
+            "job": jobs[row.id],
+            "rank": float(row.rank),
+            "title_highlight": render_highlight(row.title_highlight),
+            "snippet": render_highlight(row.snippet),
+        }
+        for row in rows
+        if row.id in jobs
+    ]
+    return results, has_more
@@ -0,0 +1,240 @@
+"""
+Outgoing email
+Messages are sent by background tasks (see app.core.tasks) over a small pool
+of SMTP connections that stay logged in between messages, so a burst of
+emails pays for STARTTLS and login once per connection rather than once per
+message. A token bucket keeps each process under the provider's sending
+rate, and failures surface as exceptions so the task queue retries them.
+
+MAIL_BACKEND=memory keeps the last MAIL_OUTBOX_SIZE messages in
+mail_service.outbox instead of sending them. An empty MAIL_BACKEND means smtp
+when SMTP_USER is set; with neither, sends fail so misconfigured deploys do
+not drop mail silently. To exercise real SMTP locally point SMTP_HOST/SMTP_PORT
+at a capture server such as Mailpit or "python -m aiosmtpd -n" with
+MAIL_BACKEND=smtp and SMTP_USE_TLS=false.
+"""
+
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.message import EmailMessage
+from email.utils import parseaddr
+from typing import Deque, Iterator, Optional
+
+from app.core.config import settings
+from app.core.tasks import PermanentTaskError
+
+# Messages kept by the memory backend; older ones are dropped
+MAIL_OUTBOX_SIZE = 1000
+
+
+class MailError(Exception):
+    pass
+
+
+class MailRejected(PermanentTaskError):
+    """The server refused the message; retrying will not help"""
+
+
+class RateLimiter:
+    """Token bucket allowing rate_per_minute sends with bursts of up to burst"""
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a send is allowed"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class PooledConnection:
+    __slots__ = ("smtp", "sent", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.smtp.quit()
+        except Exception:
+            self.smtp.close()
+
+
+class SMTPConnectionPool:
+    """
+    Up to size logged-in SMTP connections shared by sending threads. Idle
+    connections are checked with NOOP before reuse and replaced after
+    max_messages sends, since most providers cap messages per session.
+    """
+
+    def __init__(self, size: int, max_messages: int, idle_check_seconds: int):
+        self.max_messages = max_messages
+        self.idle_check_seconds = idle_check_seconds
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue()
+        self.connections_opened = 0
+
+    def _connect(self) -> PooledConnection:
+        if settings.SMTP_USE_SSL:
+            smtp = smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        else:
+            smtp = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        try:
+            if settings.SMTP_USE_TLS and not settings.SMTP_USE_SSL:
+                smtp.starttls()
+            if settings.SMTP_USER:
+                smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        except Exception:
+            smtp.close()
+            raise
+        self.connections_opened += 1
+        return PooledConnection(smtp)
+
+    def _take_idle(self) -> Optional[PooledConnection]:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if time.monotonic() - conn.last_used < self.idle_check_seconds:
+                return conn
+            try:
+                if conn.smtp.noop()[0] == 250:
+                    return conn
+            except (smtplib.SMTPException, OSError):
+                pass
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        if not self._slots.acquire(timeout=settings.SMTP_TIMEOUT_SECONDS * 3):
+            raise MailError("Timed out waiting for an SMTP connection")
+        conn = None
+        try:
+            conn = self._take_idle() or self._connect()
+            yield conn
+        except smtplib.SMTPRecipientsRefused:
+            # smtplib has already reset the transaction; the session is fine
+            raise
+        except Exception:
+            # The session is in an unknown state; never hand it out again
+            if conn is not None:
+                conn.close()
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                conn.last_used = time.monotonic()
+                if conn.sent >= self.max_messages:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+            self._slots.release()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class MailService:
+    def __init__(self):
+        self.outbox: Deque[EmailMessage] = deque(maxlen=MAIL_OUTBOX_SIZE)
+        self._pool: Optional[SMTPConnectionPool] = None
+        self._limiter: Optional[RateLimiter] = None
+        self._init_lock = threading.Lock()
+
+    @property
+    def pool(self) -> SMTPConnectionPool:
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._limiter = RateLimiter(settings.SMTP_RATE_LIMIT_PER_MINUTE, settings.SMTP_RATE_LIMIT_BURST)
+                    self._pool = SMTPConnectionPool(
+                        settings.SMTP_POOL_SIZE,
+                        settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+                        settings.SMTP_IDLE_CHECK_SECONDS,
+                    )
+        return self._pool
+
+    @property
+    def backend(self) -> Optional[str]:
+        """The configured backend, or None when mail is not configured"""
+        if settings.MAIL_BACKEND:
+            return settings.MAIL_BACKEND
+        if settings.SMTP_USER:
+            return "smtp"
+        return None
+
+    def build_message(self, to_email: str, subject: str, body: str) -> EmailMessage:
+        msg = EmailMessage()
+        msg["From"] = settings.SMTP_FROM or settings.SMTP_USER
+        msg["To"] = to_email
+        msg["Subject"] = subject
+        msg.set_content(body)
+        return msg
+
+    def send(self, to_email: str, subject: str, body: str):
+        """Send one plain-text message, raising MailError or MailRejected on failure"""
+        msg = self.build_message(to_email, subject, body)
+        backend = self.backend
+        if backend is None:
+            print(f"ERROR: mail is not configured (set SMTP_USER or MAIL_BACKEND); not sending to {to_email}")
+            raise MailError("Mail is not configured: set SMTP_USER/SMTP_PASSWORD or MAIL_BACKEND")
+        if backend == "memory":
+            self.outbox.append(msg)
+            return
+        if backend != "smtp":
+            raise MailError(f"Unknown MAIL_BACKEND {backend}")
+
+        pool = self.pool
+        self._limiter.acquire()
+        envelope_from = parseaddr(msg["From"])[1]
+        # A pooled connection may have been dropped by the server since its
+        # last use; that is retried once on a fresh connection
+        for attempt in range(2):
+            try:
+                with pool.connection() as conn:
+                    conn.smtp.send_message(msg, from_addr=envelope_from, to_addrs=[to_email])
+                    conn.sent += 1
+                return
+            except smtplib.SMTPServerDisconnected as e:
+                if attempt:
+                    raise MailError(f"SMTP server disconnected: {e}") from e
+            except smtplib.SMTPRecipientsRefused as e:
+                raise MailRejected(f"Recipient refused: {to_email}") from e
+            except smtplib.SMTPResponseException as e:
+                if 500 <= e.smtp_code < 600:
+                    raise MailRejected(f"SMTP error {e.smtp_code}: {e.smtp_error!r}") from e
+                raise MailError(f"SMTP error {e.smtp_code}: {e.smtp_error!r}") from e
+            except (smtplib.SMTPException, OSError) as e:
+                raise MailError(str(e)) from e
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close_all()
+
+
+mail_service = MailService()
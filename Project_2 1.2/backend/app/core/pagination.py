@@ -0,0 +1,68 @@
+"""
+Keyset (cursor) pagination helpers
+Cursors are opaque url-safe tokens encoding the sort key of the last row on a page
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, literal, DateTime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: int) -> str:
+    """Encode a (created_at, id) sort key into an opaque cursor"""
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_order(created_at_column, id_column):
+    """
+    ORDER BY clauses for newest-first (created_at DESC, id DESC) pages.
+    created_at has a server default, so the default NULL placement is kept;
+    it is the exact reverse of an ascending index, which can then be read backwards.
+    """
+    return created_at_column.desc(), id_column.desc()
+
+
+def keyset_filter(created_at_column, id_column, cursor: str):
+    """Filter selecting rows strictly after the cursor in keyset_order"""
+    created_at, row_id = decode_cursor(cursor)
+    if created_at is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Compared with the bare column so the (.., created_at, id) indexes apply
+    value = literal(created_at, DateTime(timezone=True))
+    return or_(
+        created_at_column < value,
+        and_(created_at_column == value, id_column < row_id)
+    )
+
+
+def build_page(rows, limit: int, key):
+    """
+    Trim a result fetched with limit + 1 rows and compute the next cursor.
+    `key` maps a row to its (created_at, id) sort key.
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*key(rows[-1])) if has_more and rows else None
+    return rows, next_cursor
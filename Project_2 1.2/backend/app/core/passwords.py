@@ -0,0 +1,100 @@
+"""
+Password hashing
+All hashing and verification runs on a small dedicated thread pool (bcrypt
+and hashlib release the GIL), so a login rush queues for
+PASSWORD_HASH_WORKERS cores instead of tying up every request thread.
+
+New hashes are bcrypt with PASSWORD_BCRYPT_ROUNDS. Older accounts may hold
+werkzeug (pbkdf2 / scrypt) hashes or bcrypt hashes with a different cost;
+the scheme is read from the stored hash so each login runs exactly one
+verification, and a successful login returns a replacement hash to store.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+from app.core.config import settings
+
+# bcrypt only looks at the first 72 bytes; truncate explicitly so longer
+# passwords behave the same across bcrypt versions
+BCRYPT_MAX_BYTES = 72
+WERKZEUG_PREFIXES = ("pbkdf2:", "scrypt:")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PASSWORD_HASH_WORKERS,
+                    thread_name_prefix="password-hash"
+                )
+    return _executor
+
+
+def _encode(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+def _bcrypt_rounds(hashed: str) -> Optional[int]:
+    # $2b$12$<salt+hash>
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _hash(password: str) -> str:
+    salt = bcrypt.gensalt(rounds=settings.PASSWORD_BCRYPT_ROUNDS)
+    return bcrypt.hashpw(_encode(password), salt).decode("ascii")
+
+
+def _verify(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    if hashed.startswith("$2"):
+        try:
+            valid = bcrypt.checkpw(_encode(password), hashed.encode("ascii"))
+        except ValueError:
+            return False, None
+        current = _bcrypt_rounds(hashed) == settings.PASSWORD_BCRYPT_ROUNDS
+    elif hashed.startswith(WERKZEUG_PREFIXES):
+        from werkzeug.security import check_password_hash
+        valid = check_password_hash(hashed, password)
+        current = False
+    else:
+        return False, None
+
+    if not valid:
+        return False, None
+    return True, None if current else _hash(password)
+
+
+def hash_password(password: str) -> str:
+    """bcrypt hash of password, computed on the hashing pool"""
+    return _pool().submit(_hash, password).result()
+
+
+def verify_password(password: str, hashed: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Check password against a stored hash on the hashing pool. Returns
+    (valid, new_hash); new_hash is set when the stored hash uses a legacy
+    scheme or work factor and should be replaced.
+    """
+    if not hashed:
+        return False, None
+    return _pool().submit(_verify, password, hashed).result()
+
+
+def shutdown():
+    """Stop the hashing pool; called from the app lifespan on shutdown"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
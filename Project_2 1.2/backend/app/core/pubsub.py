@@ -0,0 +1,122 @@
+"""
+Publish/subscribe broker for real-time pushes
+The in-process broker delivers to subscribers in this worker only; set
+REDIS_URL (with the redis package installed) to fan out across workers
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, Dict, Set, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def _put(queue: asyncio.Queue, message: Dict[str, Any]):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Slow consumer; the client resyncs over REST when it reconnects
+        pass
+
+
+class InProcessBroker:
+    """Channel -> subscriber queues, safe to publish to from any thread"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.Queue, asyncio.AbstractEventLoop]]] = {}
+        self._lock = threading.Lock()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def subscribe(self, channel: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add((queue, asyncio.get_running_loop()))
+        return queue
+
+    def unsubscribe(self, channel: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            for entry in [entry for entry in subscribers if entry[0] is queue]:
+                subscribers.discard(entry)
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+    def publish(self, channel: str, message: Dict[str, Any]):
+        self._deliver(channel, message)
+
+    def _deliver(self, channel: str, message: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for queue, loop in subscribers:
+            loop.call_soon_threadsafe(_put, queue, message)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Publishes through Redis and relays every message received on this
+    worker's pattern subscription to its local subscribers
+    """
+
+    CHANNEL_PREFIX = "prepsphere:"
+
+    def __init__(self, url: str):
+        super().__init__()
+        self._url = url
+        self._publisher = redis.Redis.from_url(url)
+        self._client = None
+        self._pubsub = None
+        self._reader = None
+
+    async def start(self):
+        self._client = redis_asyncio.from_url(self._url)
+        self._pubsub = self._client.pubsub()
+        await self._pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async for item in self._pubsub.listen():
+            if item.get("type") != "pmessage":
+                continue
+            channel = item["channel"].decode("utf-8")[len(self.CHANNEL_PREFIX):]
+            try:
+                self._deliver(channel, json.loads(item["data"]))
+            except Exception as e:
+                print(f"Error relaying pub/sub message: {e}")
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+        if self._pubsub:
+            await self._pubsub.close()
+        if self._client:
+            await self._client.close()
+        self._publisher.close()
+
+    def publish(self, channel: str, message: Dict[str, Any]):
+        self._publisher.publish(f"{self.CHANNEL_PREFIX}{channel}", json.dumps(message, default=str))
+
+
+def create_broker() -> InProcessBroker:
+    if settings.REDIS_URL:
+        if REDIS_AVAILABLE:
+            return RedisBroker(settings.REDIS_URL)
+        print("REDIS_URL is set but the redis package is not installed; using the in-process broker")
+    return InProcessBroker()
+
+
+broker = create_broker()
@@ -0,0 +1,384 @@
+"""
+File storage backends
+Uploads are streamed chunk by chunk into Cloudflare R2 (S3 multipart upload)
+or the local upload folder while the SHA-256 is computed incrementally, so
+memory per upload stays bounded and blocking I/O runs in the threadpool
+"""
+
+import base64
+import hashlib
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import quote
+
+import boto3
+from botocore.exceptions import ClientError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# Size of each read from the incoming request
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# S3 requires every part but the last to be at least 5 MB
+R2_PART_SIZE = 8 * 1024 * 1024
+# Content-addressed objects live under this prefix in R2 and the upload folder
+BLOB_PREFIX = "blobs"
+# Presigned download URLs are reused until this close to expiry
+PRESIGNED_URL_EXPIRES_SECONDS = 3600
+PRESIGNED_URL_REFRESH_MARGIN_SECONDS = 600
+PRESIGNED_URL_MAX_ENTRIES = 20000
+
+s3_client = None
+if settings.R2_ACCESS_KEY_ID and settings.R2_SECRET_ACCESS_KEY and settings.R2_ENDPOINT:
+    s3_client = boto3.client(
+        's3',
+        endpoint_url=settings.R2_ENDPOINT,
+        aws_access_key_id=settings.R2_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
+        region_name='auto'
+    )
+
+
+def r2_enabled() -> bool:
+    return bool(s3_client and settings.R2_BUCKET_NAME)
+
+
+def blob_key(file_hash: str) -> str:
+    return f"{BLOB_PREFIX}/{file_hash[:2]}/{file_hash}"
+
+
+def new_blob_key(file_hash: str) -> str:
+    """
+    Key for a newly stored copy of file_hash; unique per copy, so removing a
+    released copy can never delete one stored for a later re-upload
+    """
+    return f"{blob_key(file_hash)}.{uuid.uuid4().hex}"
+
+
+def is_r2_path(file_path: Optional[str]) -> bool:
+    """R2 keys are "<user_id>/<name>" or content-addressed blob keys; local paths sit under UPLOAD_FOLDER"""
+    if not (r2_enabled() and file_path):
+        return False
+    if file_path.startswith(f"{BLOB_PREFIX}/"):
+        return True
+    return file_path[0].isdigit() and "uploads" not in file_path
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+class StoredFile:
+    """Where an upload ended up, with its size and content hash"""
+
+    def __init__(self, file_path: str, size: int, file_hash: str, in_r2: bool):
+        self.file_path = file_path
+        self.size = size
+        self.file_hash = file_hash
+        self.in_r2 = in_r2
+
+
+class R2Writer:
+    """
+    Buffers up to one part and sends it with UploadPart; objects smaller than
+    a part are sent with a single PutObject instead
+    """
+
+    def __init__(self, object_key: str, content_type: Optional[str]):
+        self.object_key = object_key
+        self.content_type = content_type or "application/octet-stream"
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    async def write(self, data: bytes):
+        self._buffer.extend(data)
+        if len(self._buffer) >= R2_PART_SIZE:
+            await self._flush_part()
+
+    async def _flush_part(self):
+        if self._upload_id is None:
+            response = await run_in_threadpool(
+                s3_client.create_multipart_upload,
+                Bucket=settings.R2_BUCKET_NAME, Key=self.object_key, ContentType=self.content_type
+            )
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        response = await run_in_threadpool(
+            s3_client.upload_part,
+            Bucket=settings.R2_BUCKET_NAME, Key=self.object_key, UploadId=self._upload_id,
+            PartNumber=part_number, Body=body
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    async def close(self) -> str:
+        if self._upload_id is None:
+            await run_in_threadpool(
+                s3_client.put_object,
+                Bucket=settings.R2_BUCKET_NAME, Key=self.object_key,
+                Body=bytes(self._buffer), ContentType=self.content_type
+            )
+        else:
+            if self._buffer:
+                await self._flush_part()
+            await run_in_threadpool(
+                s3_client.complete_multipart_upload,
+                Bucket=settings.R2_BUCKET_NAME, Key=self.object_key, UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts}
+            )
+        return self.object_key
+
+    async def abort(self):
+        self._buffer.clear()
+        if self._upload_id is not None:
+            try:
+                await run_in_threadpool(
+                    s3_client.abort_multipart_upload,
+                    Bucket=settings.R2_BUCKET_NAME, Key=self.object_key, UploadId=self._upload_id
+                )
+            except Exception as e:
+                print(f"Error aborting multipart upload {self.object_key}: {e}")
+
+
+class LocalWriter:
+    """Writes to the local upload folder"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "wb")
+
+    async def write(self, data: bytes):
+        await run_in_threadpool(self._file.write, data)
+
+    async def close(self) -> str:
+        self._file.close()
+        return str(self.path)
+
+    async def abort(self):
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+async def store_stream(
+    chunks: AsyncIterator[bytes],
+    user_id: int,
+    file_name: str,
+    content_type: Optional[str],
+    max_size: int = settings.MAX_FILE_SIZE,
+    file_hash: Optional[str] = None
+) -> StoredFile:
+    """
+    Store an upload in R2 when configured, otherwise locally.
+    When the SHA-256 is known up front the object is stored under its
+    content-addressed blob key and the streamed bytes must match it.
+    Raises FileTooLarge as soon as more than max_size bytes arrive.
+    """
+    in_r2 = r2_enabled()
+    if in_r2:
+        key = new_blob_key(file_hash) if file_hash else f"{user_id}/{int(datetime.now().timestamp())}_{file_name}"
+        writer = R2Writer(key, content_type)
+    elif file_hash:
+        # Written under a .part name and moved into place once complete
+        writer = LocalWriter(Path(settings.UPLOAD_FOLDER) / f"{new_blob_key(file_hash)}.part")
+    else:
+        writer = LocalWriter(Path(settings.UPLOAD_FOLDER) / f"{uuid.uuid4()}_{file_name}")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLarge()
+            digest.update(chunk)
+            await writer.write(chunk)
+        if file_hash and digest.hexdigest() != file_hash:
+            raise ValueError("Stored content does not match its hash")
+        file_path = await writer.close()
+    except BaseException:
+        await writer.abort()
+        raise
+
+    if file_hash and not in_r2:
+        final_path = Path(file_path).with_suffix("")
+        await run_in_threadpool(Path(file_path).replace, final_path)
+        file_path = str(final_path)
+    return StoredFile(file_path, size, digest.hexdigest(), in_r2)
+
+
+async def hash_upload_file(upload, max_size: int = settings.MAX_FILE_SIZE) -> Tuple[str, int]:
+    """SHA-256 and size of a spooled UploadFile, rewound for a second read"""
+    digest = hashlib.sha256()
+    size = 0
+    async for chunk in iter_upload_file(upload):
+        size += len(chunk)
+        if size > max_size:
+            raise FileTooLarge()
+        digest.update(chunk)
+    await upload.seek(0)
+    return digest.hexdigest(), size
+
+
+def presign_blob_upload(object_key: str, file_hash: str, file_size: int, content_type: str, expires_in: int) -> Dict[str, str]:
+    """
+    Presigned PUT for a blob key. Length, type and SHA-256 are part of the
+    signature, so R2 rejects a body that does not match them.
+    """
+    checksum = base64.b64encode(bytes.fromhex(file_hash)).decode()
+    url = s3_client.generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': settings.R2_BUCKET_NAME,
+            'Key': object_key,
+            'ContentType': content_type,
+            'ContentLength': file_size,
+            'ChecksumSHA256': checksum,
+        },
+        ExpiresIn=expires_in
+    )
+    return {
+        "url": url,
+        "headers": {
+            "Content-Type": content_type,
+            "Content-Length": str(file_size),
+            "x-amz-checksum-sha256": checksum,
+        },
+    }
+
+
+def verify_r2_blob(object_key: str, file_hash: str, file_size: int) -> Optional[str]:
+    """
+    Check an object uploaded straight to R2 against its claimed size and hash.
+    Returns a reason when it does not match or is missing, otherwise None.
+    The stored checksum is used when R2 reports one; otherwise the object is
+    read back and hashed. A mismatching object is deleted so the key can be
+    uploaded again.
+    """
+    try:
+        head = s3_client.head_object(Bucket=settings.R2_BUCKET_NAME, Key=object_key, ChecksumMode='ENABLED')
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return "Upload not found"
+        raise
+
+    if head["ContentLength"] != file_size:
+        s3_client.delete_object(Bucket=settings.R2_BUCKET_NAME, Key=object_key)
+        return "Uploaded size does not match"
+
+    checksum = head.get("ChecksumSHA256")
+    if checksum:
+        actual = base64.b64decode(checksum).hex()
+    else:
+        digest = hashlib.sha256()
+        body = s3_client.get_object(Bucket=settings.R2_BUCKET_NAME, Key=object_key)["Body"]
+        for chunk in body.iter_chunks(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+        actual = digest.hexdigest()
+    if actual != file_hash:
+        s3_client.delete_object(Bucket=settings.R2_BUCKET_NAME, Key=object_key)
+        return "Uploaded content does not match its hash"
+    return None
+
+
+class PresignedUrlCache:
+    """
+    In-process cache of presigned GET URLs keyed by (file id, object key).
+    A URL is handed out until less than refresh_margin seconds of its
+    validity remain, then a new one is signed.
+    """
+
+    def __init__(self, expires_in: int, refresh_margin: int, max_entries: int):
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[int, str], Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, file_id: int, object_key: str, file_name: Optional[str] = None) -> str:
+        key = (file_id, object_key)
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry and entry[1] - now > self.refresh_margin:
+            return entry[0]
+
+        params = {'Bucket': settings.R2_BUCKET_NAME, 'Key': object_key}
+        if file_name:
+            # Blob keys are hashes, so name the download after the upload
+            params['ResponseContentDisposition'] = f"inline; filename*=UTF-8''{quote(file_name)}"
+        url = s3_client.generate_presigned_url('get_object', Params=params, ExpiresIn=self.expires_in)
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: v for k, v in self._entries.items() if v[1] - now > self.refresh_margin}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[key] = (url, now + self.expires_in)
+        return url
+
+    def invalidate(self, file_id: int):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == file_id]:
+                del self._entries[key]
+
+
+presigned_urls = PresignedUrlCache(
+    PRESIGNED_URL_EXPIRES_SECONDS, PRESIGNED_URL_REFRESH_MARGIN_SECONDS, PRESIGNED_URL_MAX_ENTRIES
+)
+
+
+def delete_stored_file(file_path: str, in_r2: bool):
+    if in_r2:
+        s3_client.delete_object(Bucket=settings.R2_BUCKET_NAME, Key=file_path)
+    else:
+        Path(file_path).unlink(missing_ok=True)
+
+
+async def iter_upload_file(upload, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Read a Starlette UploadFile in fixed-size chunks"""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], max_size: int = settings.MAX_FILE_SIZE):
+    """
+    Copy a stream of unknown length into a temporary file (kept in memory up
+    to one chunk) while hashing it. Returns (spool, sha256, size); the caller
+    closes the spool.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLarge()
+            digest.update(chunk)
+            await run_in_threadpool(spool.write, chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return spool, digest.hexdigest(), size
+
+
+async def iter_spool(spool, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    await run_in_threadpool(spool.seek, 0)
+    while True:
+        chunk = await run_in_threadpool(spool.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def r2_file_url(object_key: str) -> str:
+    return f"{settings.R2_ENDPOINT}/{settings.R2_BUCKET_NAME}/{object_key}"
@@ -0,0 +1,177 @@
+"""
+Incremental decoding of legacy base64 JSON uploads
+The content_base64 value is decoded chunk by chunk as the request body
+arrives instead of parsing the whole JSON document and decoding it in one go,
+so memory stays near the chunk size rather than several copies of the file
+"""
+
+import base64
+import binascii
+import json
+import re
+from typing import Any, Dict, Optional
+
+_STRING_END = re.compile(rb'["\\]')
+_WHITESPACE = b" \t\r\n"
+
+
+class Base64ChunkDecoder:
+    """Decodes base64 text fed in arbitrary pieces"""
+
+    def __init__(self):
+        self._pending = b""
+        self._padded = False
+
+    def decode(self, data: bytes) -> bytes:
+        data = self._pending + data.translate(None, _WHITESPACE)
+        if data and self._padded:
+            # Padding ends the value, even when it falls on a group boundary
+            raise binascii.Error("Excess data after padding")
+        cut = len(data) - len(data) % 4
+        self._pending = data[cut:]
+        if data[:cut].endswith(b"="):
+            self._padded = True
+        return base64.b64decode(data[:cut], validate=True)
+
+    def finish(self):
+        if self._pending:
+            raise binascii.Error("Incorrect padding")
+
+
+class JsonBase64FieldReader:
+    """
+    Splits a flat JSON object body into one base64 string field, decoded as
+    it streams, and the remaining fields, parsed once the body is complete.
+
+        reader = JsonBase64FieldReader("content_base64")
+        for chunk in body:
+            content = reader.feed(chunk)
+        fields = reader.close()
+
+    Invalid base64 sets reader.invalid, and more than max_size decoded bytes
+    sets reader.too_large; either stops decoding without stopping the parse.
+    """
+
+    def __init__(self, field: str, max_size: Optional[int] = None):
+        self.field = field.encode()
+        self.max_size = max_size
+        self.found = False
+        # Problems with the value are recorded rather than raised, so the
+        # rest of the body is still parsed and its errors can be reported first
+        self.invalid = False
+        self.too_large = False
+        self.value_size = 0  # encoded length
+        self.decoded_size = 0
+        self._skipping = False
+        self._decoder = Base64ChunkDecoder()
+        # Everything except the field's value, which is replaced by ""
+        self._meta = bytearray()
+        self._in_value = False
+        self._in_string = False
+        self._escaped = False
+        self._depth = 0
+        self._string_start = 0
+        # After the field's key: 1 = waiting for ':', 2 = waiting for the opening quote
+        self._expect = 0
+
+    def feed(self, chunk: bytes) -> bytes:
+        decoded = bytearray()
+        i = 0
+        while i < len(chunk):
+            if self._in_value:
+                i = self._feed_value(chunk, i, decoded)
+            else:
+                self._feed_meta(chunk[i])
+                i += 1
+        return bytes(decoded)
+
+    def _feed_value(self, chunk: bytes, i: int, decoded: bytearray) -> int:
+        if self._escaped:
+            self._escaped = False
+            escape = chunk[i:i + 1]
+            self.value_size += 2
+            if escape == b"/":
+                self._decode(b"/", decoded)
+            elif escape not in (b"n", b"r", b"t"):
+                self._fail()
+            return i + 1
+
+        match = _STRING_END.search(chunk, i)
+        end = match.start() if match else len(chunk)
+        self.value_size += end - i
+        self._decode(chunk[i:end], decoded)
+        if not match:
+            return end
+        if chunk[end:end + 1] == b"\\":
+            self._escaped = True
+        else:
+            if not self._skipping:
+                try:
+                    self._decoder.finish()
+                except binascii.Error:
+                    self._fail()
+            self._meta += b'""'
+            self._in_value = False
+        return end + 1
+
+    def _decode(self, data: bytes, decoded: bytearray):
+        if self._skipping or not data:
+            return
+        try:
+            content = self._decoder.decode(data)
+        except binascii.Error:
+            self._fail()
+            return
+        self.decoded_size += len(content)
+        if self.max_size is not None and self.decoded_size > self.max_size:
+            self.too_large = True
+            self._skipping = True
+            return
+        decoded += content
+
+    def _fail(self):
+        self.invalid = True
+        self._skipping = True
+
+    def _feed_meta(self, byte: int):
+        char = bytes((byte,))
+        if self._expect == 2 and char == b'"':
+            self._expect = 0
+            self._in_value = True
+            self.found = True
+            return
+
+        self._meta += char
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == b"\\":
+                self._escaped = True
+            elif char == b'"':
+                self._in_string = False
+                key = bytes(self._meta[self._string_start:-1])
+                if self._depth == 1 and key == self.field and not self.found:
+                    self._expect = 1
+            return
+
+        if char in _WHITESPACE:
+            return
+        if self._expect == 1 and char == b":":
+            self._expect = 2
+            return
+        self._expect = 0
+        if char == b'"':
+            self._in_string = True
+            self._string_start = len(self._meta)
+        elif char in b"{[":
+            self._depth += 1
+        elif char in b"}]":
+            self._depth -= 1
+
+    def close(self) -> Dict[str, Any]:
+        if self._in_value or self._in_string:
+            raise ValueError("Truncated JSON body")
+        fields = json.loads(bytes(self._meta))
+        if not isinstance(fields, dict):
+            raise ValueError("Expected a JSON object")
+        return fields
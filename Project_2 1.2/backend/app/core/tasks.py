@@ -0,0 +1,335 @@
+"""
+Durable background tasks
+Request handlers enqueue side effects (emails, broadcast fan-out) as rows in
+task_queue inside their own transaction and return straight away; workers
+claim due rows with SELECT ... FOR UPDATE SKIP LOCKED, run the registered
+handler and retry failures with exponential backoff. A task whose worker dies
+mid-run stops renewing its lock and is picked up again after
+TASK_LOCK_TIMEOUT_SECONDS, so queued work survives worker restarts.
+Payloads may hold secrets such as reset tokens, so they are cleared once a
+task succeeds or fails for good.
+
+    @task("users.send_reset_email")
+    def send_reset_email(to_email: str, reset_token: str): ...
+
+    enqueue(db, "users.send_reset_email", to_email=email, reset_token=token)
+    db.commit()
+"""
+
+import importlib
+import os
+import random
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, event, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.task import QueuedTask
+
+# Modules whose @task handlers a worker must import before it starts claiming
+TASK_MODULES = ("app.core.broadcasts", "app.api.v1.users", "app.core.clerk_webhooks")
+
+TASK_BACKOFF_BASE_SECONDS = 5
+TASK_BACKOFF_MAX_SECONDS = 3600
+TASK_PURGE_INTERVAL_SECONDS = 3600
+MAX_ERROR_LENGTH = 4000
+
+
+class PermanentTaskError(Exception):
+    """Raised by a handler when retrying cannot succeed; the task fails at once"""
+
+
+_registry: Dict[str, Callable[..., Any]] = {}
+_registry_max_attempts: Dict[str, int] = {}
+_registry_on_failure: Dict[str, Callable[..., Any]] = {}
+
+# Set when a transaction that enqueued tasks commits, so an in-process
+# worker starts on them without waiting for its next poll
+_wakeup = threading.Event()
+
+
+def task(name: str, max_attempts: Optional[int] = None, on_failure: Optional[Callable[..., Any]] = None):
+    """
+    Register a function as the handler for a task name. on_failure, if given,
+    is called with the same arguments once the task has failed for good.
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        _registry[name] = func
+        _registry_max_attempts[name] = max_attempts or settings.TASK_MAX_ATTEMPTS
+        if on_failure is not None:
+            _registry_on_failure[name] = on_failure
+        return func
+    return decorator
+
+
+def load_task_modules():
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue(db: Session, name: str, delay_seconds: float = 0, **payload) -> QueuedTask:
+    """
+    Add a task to the caller's transaction; it becomes visible to workers
+    when the caller commits, so it never runs for rolled-back work
+    """
+    queued = QueuedTask(
+        name=name,
+        payload=payload,
+        status="queued",
+        attempts=0,
+        max_attempts=_registry_max_attempts.get(name, settings.TASK_MAX_ATTEMPTS),
+        run_at=datetime.now() + timedelta(seconds=delay_seconds),
+    )
+    db.add(queued)
+    db.info["tasks_enqueued"] = True
+    return queued
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_workers(session):
+    if session.info.pop("tasks_enqueued", False):
+        _wakeup.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_enqueued(session):
+    session.info.pop("tasks_enqueued", None)
+
+
+def _claimable(now: datetime):
+    """Due queued tasks, plus running tasks whose worker stopped renewing the lock"""
+    stale = now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT_SECONDS)
+    return or_(
+        and_(QueuedTask.status == "queued", QueuedTask.run_at <= now),
+        and_(QueuedTask.status == "running", QueuedTask.locked_at < stale),
+    )
+
+
+def claim_tasks(db: Session, worker_id: str, limit: int) -> List[Any]:
+    """Lock up to limit due tasks for worker_id and return their rows"""
+    now = datetime.now()
+    candidate_ids = db.execute(
+        select(QueuedTask.id)
+        .where(_claimable(now))
+        .order_by(QueuedTask.run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not candidate_ids:
+        db.commit()
+        return []
+
+    # Re-checked in the UPDATE for databases without row locks (SQLite)
+    claimed = db.execute(
+        update(QueuedTask)
+        .where(QueuedTask.id.in_(candidate_ids), _claimable(now))
+        .values(
+            status="running",
+            attempts=QueuedTask.attempts + 1,
+            locked_at=now,
+            locked_by=worker_id,
+        )
+        .returning(QueuedTask.id, QueuedTask.name, QueuedTask.payload, QueuedTask.attempts, QueuedTask.max_attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # A task that keeps killing its worker is reclaimed once per lock timeout;
+    # give up on it once it has used all its attempts
+    abandoned = [row.id for row in claimed if row.attempts > row.max_attempts]
+    if abandoned:
+        db.execute(
+            update(QueuedTask)
+            .where(QueuedTask.id.in_(abandoned))
+            .values(status="failed", payload={}, finished_at=now, locked_at=None,
+                    last_error="Worker stopped while running the task")
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    for row in claimed:
+        if row.attempts > row.max_attempts:
+            _task_failed(row)
+    return [row for row in claimed if row.attempts <= row.max_attempts]
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential delay before the next attempt, with jitter"""
+    delay = min(TASK_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), TASK_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _task_failed(row):
+    """Run the task's on_failure hook after it has failed for good"""
+    on_failure = _registry_on_failure.get(row.name)
+    if on_failure is None:
+        return
+    try:
+        on_failure(**(row.payload or {}))
+    except Exception as e:
+        print(f"Error in failure hook of task {row.id} ({row.name}): {e}")
+
+
+def _finish(task_id: int, worker_id: str, **values):
+    db = SessionLocal()
+    try:
+        # Only the worker holding the lock may settle the task
+        db.execute(
+            update(QueuedTask)
+            .where(QueuedTask.id == task_id, QueuedTask.locked_by == worker_id, QueuedTask.status == "running")
+            .values(locked_at=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_task(row, worker_id: str):
+    """Run one claimed task and record the outcome"""
+    handler = _registry.get(row.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task {row.name}")
+        handler(**(row.payload or {}))
+    except Exception as e:
+        error = f"{e}\n{traceback.format_exc()}"[:MAX_ERROR_LENGTH]
+        if row.attempts >= row.max_attempts or handler is None or isinstance(e, PermanentTaskError):
+            print(f"Task {row.id} ({row.name}) failed permanently: {e}")
+            _finish(row.id, worker_id, status="failed", payload={}, last_error=error, finished_at=datetime.now())
+            _task_failed(row)
+        else:
+            retry_at = datetime.now() + timedelta(seconds=backoff_seconds(row.attempts))
+            print(f"Task {row.id} ({row.name}) failed, retrying at {retry_at:%H:%M:%S}: {e}")
+            _finish(row.id, worker_id, status="queued", last_error=error, run_at=retry_at)
+        return
+    _finish(row.id, worker_id, status="succeeded", payload={}, finished_at=datetime.now())
+
+
+def purge_finished_tasks(db: Session) -> int:
+    """Delete succeeded tasks older than TASK_RETENTION_DAYS; failed ones are kept for inspection"""
+    cutoff = datetime.now() - timedelta(days=settings.TASK_RETENTION_DAYS)
+    result = db.execute(
+        delete(QueuedTask)
+        .where(QueuedTask.status == "succeeded", QueuedTask.finished_at < cutoff)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+class TaskWorker:
+    """
+    Polls task_queue and runs claimed tasks on a thread pool. Several workers,
+    in any number of processes, can share one queue.
+    """
+
+    def __init__(self, concurrency: Optional[int] = None, poll_interval: Optional[float] = None, worker_id: Optional[str] = None):
+        self.concurrency = concurrency or settings.TASK_WORKER_CONCURRENCY
+        self.poll_interval = poll_interval or settings.TASK_POLL_INTERVAL_SECONDS
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(self.concurrency)
+        self._thread: Optional[threading.Thread] = None
+        self._last_purge = 0.0
+        self._last_heartbeat = 0.0
+
+    def _free_slots(self) -> int:
+        free = 0
+        while free < self.concurrency and self._slots.acquire(blocking=False):
+            free += 1
+        return free
+
+    def _run(self, row):
+        try:
+            run_task(row, self.worker_id)
+        finally:
+            self._slots.release()
+            _wakeup.set()
+
+    def run_once(self, executor: ThreadPoolExecutor) -> int:
+        """Claim as many tasks as there are idle threads; returns how many were started"""
+        free = self._free_slots()
+        if not free:
+            return 0
+        db = SessionLocal()
+        try:
+            rows = claim_tasks(db, self.worker_id, free)
+        except Exception as e:
+            db.rollback()
+            print(f"Error claiming tasks: {e}")
+            rows = []
+        finally:
+            db.close()
+        for _ in range(free - len(rows)):
+            self._slots.release()
+        for row in rows:
+            executor.submit(self._run, row)
+        return len(rows)
+
+    def _maybe_purge(self):
+        now = datetime.now().timestamp()
+        if now - self._last_purge < TASK_PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = now
+        db = SessionLocal()
+        try:
+            purge_finished_tasks(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Error purging finished tasks: {e}")
+        finally:
+            db.close()
+
+    def _maybe_heartbeat(self):
+        """Renew the locks of running tasks so long tasks are not reclaimed"""
+        now = datetime.now()
+        if now.timestamp() - self._last_heartbeat < settings.TASK_LOCK_TIMEOUT_SECONDS / 3:
+            return
+        self._last_heartbeat = now.timestamp()
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(QueuedTask)
+                .where(QueuedTask.locked_by == self.worker_id, QueuedTask.status == "running")
+                .values(locked_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error renewing task locks: {e}")
+        finally:
+            db.close()
+
+    def run(self):
+        """Work until stop() is called"""
+        load_task_modules()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="task") as executor:
+            while not self._stop.is_set():
+                self._maybe_purge()
+                self._maybe_heartbeat()
+                _wakeup.clear()
+                if self.run_once(executor):
+                    continue
+                _wakeup.wait(self.poll_interval)
+
+    def start(self):
+        """Run in a daemon thread of the current process"""
+        self._thread = threading.Thread(target=self.run, name="task-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop claiming and wait for running tasks. Anything unfinished when the
+        process exits is retried once its lock times out.
+        """
+        self._stop.set()
+        _wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
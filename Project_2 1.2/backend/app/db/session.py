@@ -1,11 +1,98 @@
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql import functions
 from app.core.config import settings
+from app.core.db_metrics import (
+    InstrumentedAsyncQueuePool, InstrumentedQueuePool, async_pool_metrics, sync_pool_metrics
+)
+
+
+@compiles(functions.now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is text without microseconds, while bound
+    # datetimes are stored with six digits; server defaults use the bound
+    # format so timestamps compare (and keyset cursors bind) the same way
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+def engine_options(database_url: str, poolclass) -> dict:
+    """Pool sizing and statement timeout from settings; SQLite keeps its default pool"""
+    url = make_url(database_url)
+    options = {"pool_pre_ping": True}
+    if url.get_backend_name() == "sqlite":
+        return options
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+    options.update(
+        poolclass=poolclass,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if settings.DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if url.get_driver_name() == "asyncpg":
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL, InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers matching each sync backend
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Derive the async driver URL from the sync DATABASE_URL"""
+    url = make_url(database_url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    if url.get_backend_name() == "postgresql":
+        # asyncpg takes ssl=... instead of libpq's sslmode and has no channel_binding
+        query = dict(url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        query.pop("channel_binding", None)
+        url = url.set(query=query)
+    return url.render_as_string(hide_password=False)
+
+
+# Optional async engine for read-heavy endpoints; needs asyncpg or aiosqlite
+try:
+    async_database_url = settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+    async_engine = create_async_engine(
+        async_database_url,
+        **engine_options(async_database_url, InstrumentedAsyncQueuePool)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+except ImportError as e:
+    print(f"Async database driver not available, async endpoints are disabled: {e}")
+    async_engine = None
+    AsyncSessionLocal = None
+
+def dialect_insert(db):
+    """insert() with ON CONFLICT support for the session's database"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    return insert
+
+
 Base = declarative_base()
 
 # Import all models so they are registered with Base
@@ -15,7 +102,20 @@ from app import models  # noqa: E402, F401
 # Dependency
 def get_db():
     db = SessionLocal()
+    started = time.perf_counter()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+        sync_pool_metrics.record_session(time.perf_counter() - started)
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Install asyncpg (PostgreSQL) or aiosqlite (SQLite) to use async endpoints")
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            yield db
+    finally:
+        async_pool_metrics.record_session(time.perf_counter() - started)
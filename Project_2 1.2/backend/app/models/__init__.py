@@ -4,8 +4,11 @@ from app.models.resume import Resume
 from app.models.certificate import Certificate
 from app.models.job import Job, JobApplication, ApplicationStatus
 from app.models.event import Event, EventRegistration
-from app.models.file import FileUpload
-from app.models.notification import Notification, NotificationType
+from app.models.file import FileUpload, FileBlob
+from app.models.notification import Notification, NotificationType, NotificationBroadcast
+from app.models.counter import StatCounter
+from app.models.task import QueuedTask
+from app.models.webhook import ClerkWebhookEvent
 
 __all__ = [
     "User",
@@ -19,6 +22,11 @@ __all__ = [
     "Event",
     "EventRegistration",
     "FileUpload",
+    "FileBlob",
     "Notification",
     "NotificationType",
+    "NotificationBroadcast",
+    "StatCounter",
+    "QueuedTask",
+    "ClerkWebhookEvent",
 ]
\ No newline at end of file
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, BigInteger, Boolean, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
 
 class FileUpload(Base):
     __tablename__ = "file_uploads"
+    __table_args__ = (
+        Index("ix_file_uploads_user_id_file_type", "user_id", "file_type"),
+        Index("ix_file_uploads_file_hash", "file_hash"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -22,4 +26,16 @@ class FileUpload(Base):
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+
+class FileBlob(Base):
+    """Stored content shared by every FileUpload with the same SHA-256"""
+    __tablename__ = "file_blobs"
+    
+    file_hash = Column(String(64), primary_key=True)
+    file_path = Column(String, nullable=False)  # content-addressed R2 key or local path
+    file_size = Column(BigInteger, nullable=False)
+    storage = Column(String, nullable=False)  # r2, local
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.session import Base
@@ -28,7 +28,40 @@ class Notification(Base):
     read_at = Column(DateTime(timezone=True), nullable=True)
     
     sent_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # ID of user who sent the notification (TPO, etc.)
+    broadcast_id = Column(Integer, ForeignKey("notification_broadcasts.id"), nullable=True, index=True)  # Set for broadcast fan-out copies
     
     # Relationships
     user = relationship("User", back_populates="notifications", foreign_keys=[user_id])
-    sender = relationship("User", foreign_keys=[sent_by])
\ No newline at end of file
+    sender = relationship("User", foreign_keys=[sent_by])
+    broadcast = relationship("NotificationBroadcast", back_populates="notifications")
+
+# Inbox listing and unread counts per user; id breaks created_at ties so
+# newest-first keyset pages are read straight from the index
+Index(
+    "ix_notifications_user_id_is_read_created_at_id",
+    Notification.user_id,
+    Notification.is_read,
+    Notification.created_at.desc(),
+    Notification.id.desc()
+)
+
+class NotificationBroadcast(Base):
+    __tablename__ = "notification_broadcasts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    notification_type = Column(Enum(NotificationType), default=NotificationType.SYSTEM, nullable=False)
+    sent_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    filter_degree = Column(String, nullable=True)
+    filter_year = Column(String, nullable=True)
+    status = Column(String, default="Pending")  # Pending, Sending, Completed, Failed
+    recipient_count = Column(Integer, default=0)  # Students matched when the broadcast was created
+    delivered_count = Column(Integer, default=0)  # Notifications inserted so far
+    read_count = Column(Integer, default=0)  # Recipients who have read their copy
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    notifications = relationship("Notification", back_populates="broadcast")
\ No newline at end of file
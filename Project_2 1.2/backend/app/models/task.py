@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+class QueuedTask(Base):
+    __tablename__ = "task_queue"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)  # registered task name, e.g. users.send_reset_email
+    payload = Column(JSON, nullable=False, default=dict)  # keyword arguments for the handler
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False)  # not before; pushed back after each failed attempt
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers poll for due tasks by status and run_at
+        Index("ix_task_queue_status_run_at", "status", "run_at"),
+    )
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Text, JSON, Index
+from app.db.session import Base
+
+class ClerkWebhookEvent(Base):
+    __tablename__ = "clerk_webhook_events"
+    
+    svix_id = Column(String(100), primary_key=True)  # Svix message id; redeliveries reuse it
+    event_type = Column(String(100), nullable=False)  # user.created, user.updated, user.deleted, ...
+    payload = Column(JSON, nullable=False)  # the event's data object
+    status = Column(String(20), nullable=False, default="pending")  # pending, processed, failed
+    error = Column(Text, nullable=True)
+    received_at = Column(DateTime, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The inbox worker drains pending events oldest first
+        Index("ix_clerk_webhook_events_status_received_at", "status", "received_at"),
+    )
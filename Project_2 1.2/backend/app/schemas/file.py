@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Literal, Optional
 from datetime import datetime
 
 class ResumeBase(BaseModel):
@@ -49,4 +49,31 @@ class CertificateResponse(CertificateBase):
     uploaded_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class UploadIntentCreate(BaseModel):
+    user_id: int
+    file_name: str
+    mime_type: str
+    file_type: str
+    file_size: int
+    file_hash: str  # hex SHA-256 of the content
+    object_key: Optional[str] = None  # from /upload-intent, required by /upload-complete after a PUT
+
+class UploadIntentResponse(BaseModel):
+    upload_required: bool
+    object_key: str
+    url: Optional[str] = None
+    method: Optional[str] = None
+    headers: Dict[str, str] = {}
+    expires_in: Optional[int] = None
+
+class PresignedUrlBatchRequest(BaseModel):
+    file_ids: List[int]
+
+class BulkFileReview(BaseModel):
+    file_ids: List[int]
+    action: Literal["verify", "unverify", "reject"]
+    verified_by: Optional[int] = None
+    notes: Optional[str] = None  # verification notes, or the reason when rejecting
+
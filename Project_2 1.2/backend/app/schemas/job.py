@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class JobBase(BaseModel):
@@ -52,6 +52,16 @@ class JobResponse(JobBase):
         if self.status is None:
              self.status = "Active" if self.is_active else "Inactive"
 
+class JobSearchHit(BaseModel):
+    job: JobResponse
+    rank: float
+    title_highlight: str  # HTML-escaped, matches wrapped in <mark>
+    snippet: str  # description excerpt around the matches, same markup
+
+class JobSearchResponse(BaseModel):
+    results: List[JobSearchHit]
+    next_offset: Optional[int] = None
+
 class JobApplicationBase(BaseModel):
     job_id: int
     user_id: int
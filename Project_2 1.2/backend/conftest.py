@@ -0,0 +1,72 @@
+"""
+Shared test fixtures
+Tests run on SQLite: an in-memory database whose one connection is shared by
+every session, or a file database where each thread or the async driver
+needs a connection of its own.
+"""
+
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.session import Base, get_db
+
+
+@pytest.fixture
+def engine():
+    """In-memory database with all tables"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def db(Session):
+    db = Session()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """File database with all tables; file_engine.url with sqlite+aiosqlite opens it async"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def FileSession(file_engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=file_engine)
+
+
+@pytest.fixture
+def api_client(Session):
+    """TestClient for the app with get_db served from the in-memory database"""
+    import main
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.pop(get_db, None)
@@ -1,10 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 
-from app.api.v1 import users, jobs, events, files, notifications, tpo, profiles, admin
+from app.api.v1 import users, jobs, events, files, notifications, tpo, profiles, admin, clerk_webhook
 from app.core.config import settings
-from app.db.session import engine, Base
+from app.db.session import engine, async_engine, Base
+from app.core.analytics import run_snapshot_refresher
+from app.core.pubsub import broker
+from app.core.tasks import TaskWorker
+from app.core.mail import mail_service
+from app.core import passwords
+from app.core.http_client import http_client
+from app.core.job_search import install_search_index
 
 # Create tables
 def create_tables():
@@ -12,14 +20,34 @@ def create_tables():
         Base.metadata.create_all(bind=engine)
     except Exception:
         pass
+    try:
+        install_search_index(engine)
+    except Exception as e:
+        print(f"Error creating job search index: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     create_tables()
+    await broker.start()
+    await http_client.start()
+    analytics_refresher = asyncio.create_task(run_snapshot_refresher())
+    task_worker = None
+    if settings.TASK_WORKER_IN_PROCESS:
+        task_worker = TaskWorker()
+        task_worker.start()
     yield
     # Shutdown
+    analytics_refresher.cancel()
+    if task_worker is not None:
+        await asyncio.to_thread(task_worker.stop, 30)
+    mail_service.close()
+    passwords.shutdown()
+    await broker.close()
+    await http_client.close()
     engine.dispose()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -47,6 +75,7 @@ app.include_router(notifications.router, prefix=f"{settings.API_V1_STR}/notifica
 app.include_router(tpo.router, prefix=f"{settings.API_V1_STR}/tpo", tags=["tpo"])
 app.include_router(profiles.router, prefix=f"{settings.API_V1_STR}", tags=["profiles"])
 app.include_router(admin.router, prefix=f"{settings.API_V1_STR}", tags=["admin"])
+app.include_router(clerk_webhook.router, prefix=f"{settings.API_V1_STR}/clerk", tags=["clerk"])
 
 @app.get("/")
 async def root():
@@ -11,6 +11,10 @@ def migrate():
     print(f"Connecting to database...")
     engine = create_engine(settings.DATABASE_URL)
     
+    # Create any new tables first so the columns below can reference them
+    from app.db.session import Base
+    Base.metadata.create_all(bind=engine)
+    
     with engine.connect() as conn:
         print("Connected. Checking schema...")
         
@@ -52,7 +56,21 @@ def migrate():
             
             # Notifications
              "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS sent_by INTEGER;",
-             "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS notification_type VARCHAR(50) DEFAULT 'SYSTEM';"
+             "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS notification_type VARCHAR(50) DEFAULT 'SYSTEM';",
+             "ALTER TABLE notifications ADD COLUMN IF NOT EXISTS broadcast_id INTEGER REFERENCES notification_broadcasts(id);",
+             "ALTER TABLE notification_broadcasts ADD COLUMN IF NOT EXISTS read_count INTEGER DEFAULT 0;",
+            
+            # Indexes
+            "CREATE INDEX IF NOT EXISTS ix_users_role_created_at_id ON users (role, created_at, id);",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_degree_year ON profiles (degree, year);",
+            "CREATE INDEX IF NOT EXISTS ix_profiles_placement_status ON profiles (placement_status);",
+            "CREATE INDEX IF NOT EXISTS ix_file_uploads_user_id_file_type ON file_uploads (user_id, file_type);",
+            "CREATE INDEX IF NOT EXISTS ix_file_uploads_file_hash ON file_uploads (file_hash);",
+            "CREATE INDEX IF NOT EXISTS ix_notifications_broadcast_id ON notifications (broadcast_id);",
+            "DROP INDEX IF EXISTS ix_notifications_user_id_is_read_created_at;",
+            "CREATE INDEX IF NOT EXISTS ix_notifications_user_id_is_read_created_at_id ON notifications (user_id, is_read, created_at DESC, id DESC);",
+            "CREATE INDEX IF NOT EXISTS ix_task_queue_status_run_at ON task_queue (status, run_at);",
+            "CREATE INDEX IF NOT EXISTS ix_clerk_webhook_events_status_received_at ON clerk_webhook_events (status, received_at);"
         ]
         
         for q in queries:
@@ -63,7 +81,15 @@ def migrate():
                 print(f"Error executing {q}: {e}")
                 
         conn.commit()
-        print("Migration complete.")
+    
+    # Full-text search column and GIN index (builds the index for existing jobs)
+    from app.core.job_search import install_search_index
+    try:
+        install_search_index(engine)
+        print("Job search index ready")
+    except Exception as e:
+        print(f"Error creating job search index: {e}")
+    print("Migration complete.")
 
 if __name__ == "__main__":
     migrate()
@@ -0,0 +1,26 @@
+"""
+Rebuild the stat_counters table from the underlying tables
+Run periodically (or after manual data fixes) to detect and repair counter drift
+"""
+
+from app.db.session import SessionLocal
+from app.core.counters import reconcile_counters
+
+def main():
+    db = SessionLocal()
+    try:
+        drift = reconcile_counters(db)
+        if not drift:
+            print("All counters are in sync")
+            return
+        for name, values in drift.items():
+            stored = "missing" if values["stored"] is None else values["stored"]
+            print(f"{name}: stored={stored} actual={values['actual']} (fixed)")
+    except Exception as e:
+        db.rollback()
+        print(f"Error reconciling counters: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Run a background task worker
+Start one or more of these next to the API (or set TASK_WORKER_IN_PROCESS)
+to process queued emails and broadcast deliveries; stop with Ctrl+C
+"""
+
+import argparse
+
+from app.core.tasks import TaskWorker
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued background tasks")
+    parser.add_argument("--concurrency", type=int, default=None, help="tasks run at once (default TASK_WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+
+    worker = TaskWorker(concurrency=args.concurrency)
+    print(f"Task worker {worker.worker_id} started with {worker.concurrency} threads")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        print("Stopping task worker")
+
+if __name__ == "__main__":
+    main()
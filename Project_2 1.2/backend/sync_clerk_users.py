@@ -0,0 +1,36 @@
+"""
+Bulk-sync users from Clerk into the users table
+Creates missing users and refreshes email and names of existing ones; run
+after webhook outages or when pointing the app at a new database
+"""
+
+import argparse
+import asyncio
+
+from app.core.clerk_sync import CLERK_PAGE_SIZE, CLERK_SYNC_CONCURRENCY, sync_all_clerk_users
+from app.core.http_client import http_client
+
+async def run(page_size: int, concurrency: int):
+    try:
+        return await sync_all_clerk_users(page_size=page_size, concurrency=concurrency)
+    finally:
+        await http_client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync all Clerk users into the database")
+    parser.add_argument("--page-size", type=int, default=CLERK_PAGE_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CLERK_SYNC_CONCURRENCY, help="Clerk pages fetched at once")
+    args = parser.parse_args()
+
+    try:
+        totals = asyncio.run(run(args.page_size, args.concurrency))
+    except Exception as e:
+        print(f"Error syncing Clerk users: {e}")
+        return
+    print(
+        f"Created {totals['created']}, updated {totals['updated']}, "
+        f"skipped {totals['skipped']}, failed pages {totals['failed_pages']}"
+    )
+
+if __name__ == "__main__":
+    main()
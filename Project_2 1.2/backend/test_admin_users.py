@@ -0,0 +1,96 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models.user import User, Profile, UserRole
+from app.models.file import FileUpload
+from app.api.v1.admin import get_all_tpos, get_all_users
+
+
+def seed_users(db, count):
+    start = db.query(User).count()
+    for i in range(start, start + count):
+        user = User(
+            clerk_user_id=f"test_{i}",
+            email=f"user{i}@example.com",
+            first_name="Test",
+            last_name=str(i),
+            role=UserRole.STUDENT if i % 3 else UserRole.TPO,
+        )
+        db.add(user)
+        db.flush()
+        db.add(Profile(user_id=user.id, degree="B.Tech", year="2025"))
+        db.add(FileUpload(user_id=user.id, file_name="cv.pdf", file_path=f"uploads/cv{i}.pdf",
+                          file_size=10, mime_type="application/pdf", file_type="resume",
+                          is_verified=(i % 2 == 0)))
+        if i % 4 == 0:
+            db.add(FileUpload(user_id=user.id, file_name="offer.pdf", file_path=f"uploads/offer{i}.pdf",
+                              file_size=10, mime_type="application/pdf", file_type="offer_letter"))
+    db.commit()
+    db.expire_all()
+
+
+def count_queries(engine, db):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = get_all_users(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, len(statements)
+
+
+def test_get_all_users_query_count_is_constant(engine, db):
+    counts = []
+    for size in (3, 40):
+        seed_users(db, size - db.query(User).count())
+        result, queries = count_queries(engine, db)
+        assert len(result) == size
+        counts.append(queries)
+
+    assert counts[0] == counts[1]
+    assert counts[0] <= 3
+
+
+def test_get_all_users_file_flags(db):
+    seed_users(db, 4)
+    result = {u["email"]: u for u in get_all_users(db)}
+
+    assert result["user0@example.com"]["has_verified_resume"] is True
+    assert result["user0@example.com"]["has_verified_offer_letter"] is True
+    assert result["user1@example.com"]["has_verified_resume"] is False
+    assert result["user1@example.com"]["resume_file_id"] is None
+    assert result["user1@example.com"]["has_verified_offer_letter"] is False
+    assert result["user2@example.com"]["profile"]["degree"] == "B.Tech"
+
+
+def test_tpo_pages_cover_every_row_once_in_index_order(engine, db):
+    seed_users(db, 12)
+    # Python-set timestamps tied on a whole second and with microseconds
+    db.query(User).filter(User.id <= 6).update({User.created_at: datetime(2030, 1, 1, 9, 30, 0)})
+    db.query(User).filter(User.id > 6).update({User.created_at: datetime(2030, 1, 1, 9, 30, 0, 250000)})
+    db.commit()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, *args: statements.append((statement, parameters)))
+    seen, cursor = [], None
+    while True:
+        page = get_all_tpos(cursor=cursor, limit=1, db=db)
+        seen += [tpo["id"] for tpo in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    expected = [user.id for user in db.query(User).filter(User.role == UserRole.TPO)
+                .order_by(User.created_at.desc(), User.id.desc())]
+    assert seen == expected and len(seen) == 4
+
+    page_query, parameters = next((s, p) for s, p in statements if "users.created_at <" in s)
+    assert "julianday" not in page_query and "NULLS" not in page_query
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + page_query, parameters))
+    assert "ix_users_role_created_at_id" in plan and "TEMP B-TREE" not in plan
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from app.core import analytics
+from app.core.analytics import AnalyticsSnapshot
+from app.models.notification import Notification, NotificationType
+from app.models.user import User, UserRole
+
+
+def test_invalidation_during_a_refresh_is_not_overwritten(monkeypatch):
+    snapshot = AnalyticsSnapshot(ttl_seconds=60)
+    results = iter([{"run": 1}, {"run": 2}])
+
+    def compute(db):
+        # A write commits while the first computation is still running
+        snapshot.invalidate()
+        monkeypatch.setattr(analytics, "compute_analytics", lambda db: next(results))
+        return next(results)
+
+    monkeypatch.setattr(analytics, "compute_analytics", compute)
+    assert snapshot.get(None) == {"run": 1}
+    assert snapshot.get(None) == {"run": 2}
+    assert snapshot.get(None) == {"run": 2}
+
+
+def test_concurrent_misses_compute_once(monkeypatch):
+    snapshot = AnalyticsSnapshot(ttl_seconds=60)
+    calls = []
+
+    def compute(db):
+        calls.append(1)
+        time.sleep(0.05)
+        return {"run": len(calls)}
+
+    monkeypatch.setattr(analytics, "compute_analytics", compute)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(snapshot.get(None))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [{"run": 1}] * 5
+
+
+def test_notification_writes_invalidate_the_snapshot(db, monkeypatch):
+    snapshot = AnalyticsSnapshot(ttl_seconds=60)
+    monkeypatch.setattr(analytics, "analytics_snapshot", snapshot)
+    db.add(User(clerk_user_id="s1", email="s1@example.com", first_name="S", last_name="1", role=UserRole.STUDENT))
+    db.commit()
+    assert snapshot.get(db)["totalApplications"] == 0
+
+    db.add(Notification(user_id=1, title="Update", message="m", notification_type=NotificationType.APPLICATION_UPDATE))
+    db.commit()
+    assert snapshot.get(db)["totalApplications"] == 1
@@ -0,0 +1,135 @@
+import base64
+import hashlib
+from pathlib import Path
+
+import pytest
+from botocore.exceptions import ClientError
+
+from app.core import storage
+from app.core.blobs import release_blob
+from app.core.config import settings
+from app.models.file import FileBlob, FileUpload
+from app.models.user import User, UserRole
+
+
+@pytest.fixture
+def client(api_client, Session, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+
+    db = Session()
+    db.add(User(clerk_user_id="s1", email="s1@example.com", first_name="S", last_name="1", role=UserRole.STUDENT))
+    db.commit()
+    db.close()
+    return api_client, Session
+
+
+def upload(client, content):
+    response = client.post("/api/v1/files/upload-binary?user_id=1&file_type=resume&file_name=cv.pdf",
+                           content=content, headers={"content-type": "application/pdf"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_identical_uploads_share_one_object_until_the_last_reference_goes(client):
+    client, Session = client
+    first = upload(client, b"%PDF same bytes")
+    second = upload(client, b"%PDF same bytes")
+    assert first["file_path"] == second["file_path"]
+    stored = Path(first["file_path"])
+    assert first["file_url"] == f"/api/v1/files/{first['id']}/download"
+
+    db = Session()
+    assert db.query(FileBlob).one().ref_count == 2
+
+    assert client.delete(f"/api/v1/files/{first['id']}").status_code == 200
+    assert stored.exists()
+    db.expire_all()
+    assert db.query(FileBlob).one().ref_count == 1
+
+    assert client.delete(f"/api/v1/files/{second['id']}").status_code == 200
+    assert not stored.exists()
+    assert db.query(FileBlob).count() == 0
+
+    # The same bytes uploaded again are stored under a fresh key
+    third = upload(client, b"%PDF same bytes")
+    assert third["file_path"] != first["file_path"]
+    assert Path(third["file_path"]).exists()
+
+
+def test_stored_object_survives_a_rolled_back_release(client):
+    client, Session = client
+    uploaded = upload(client, b"%PDF only copy")
+    stored = Path(uploaded["file_path"])
+
+    db = Session()
+    file_upload = db.get(FileUpload, uploaded["id"])
+    release_blob(db, file_upload)
+    db.delete(file_upload)
+    db.flush()
+    db.rollback()
+    assert stored.exists()
+    assert db.query(FileBlob).one().ref_count == 1
+
+    file_upload = db.get(FileUpload, uploaded["id"])
+    release_blob(db, file_upload)
+    db.delete(file_upload)
+    assert stored.exists()
+    db.commit()
+    assert not stored.exists()
+
+
+class FakeR2:
+    """In-memory stand-in for the boto3 S3 client"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://r2.example.com/{Params['Key']}"
+
+    def head_object(self, Bucket, Key, ChecksumMode=None):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        content = self.objects[Key]
+        return {"ContentLength": len(content),
+                "ChecksumSHA256": base64.b64encode(hashlib.sha256(content).digest()).decode()}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+def test_direct_upload_requires_possession_of_the_bytes(client, monkeypatch):
+    client, Session = client
+    r2 = FakeR2()
+    monkeypatch.setattr(storage, "s3_client", r2)
+    monkeypatch.setattr(settings, "R2_BUCKET_NAME", "uploads")
+    db = Session()
+    db.add(User(clerk_user_id="s2", email="s2@example.com", first_name="S", last_name="2", role=UserRole.STUDENT))
+    db.commit()
+
+    content = b"%PDF private document"
+    body = {"user_id": 1, "file_name": "cv.pdf", "mime_type": "application/pdf", "file_type": "resume",
+            "file_size": len(content), "file_hash": hashlib.sha256(content).hexdigest()}
+
+    intent = client.post("/api/v1/files/upload-intent", json=body).json()
+    assert intent["upload_required"]
+    r2.objects[intent["object_key"]] = content
+    owner_file = client.post("/api/v1/files/upload-complete", json={**body, "object_key": intent["object_key"]}).json()
+
+    # Knowing the hash, size and stored key is not enough for another user
+    other = {**body, "user_id": 2}
+    assert client.post("/api/v1/files/upload-intent", json=other).json()["upload_required"]
+    assert client.post("/api/v1/files/upload-complete", json=other).status_code == 400
+    stolen = client.post("/api/v1/files/upload-complete", json={**other, "object_key": owner_file["file_path"]})
+    assert stolen.status_code == 400
+    assert owner_file["file_path"] in r2.objects
+
+    # After uploading the bytes themselves they share the stored copy
+    intent = client.post("/api/v1/files/upload-intent", json=other).json()
+    r2.objects[intent["object_key"]] = content
+    shared = client.post("/api/v1/files/upload-complete", json={**other, "object_key": intent["object_key"]}).json()
+    assert shared["file_path"] == owner_file["file_path"]
+    assert list(r2.objects) == [owner_file["file_path"]]
+
+    # The owner re-adding the same content needs no upload
+    assert not client.post("/api/v1/files/upload-intent", json=body).json()["upload_required"]
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app.core import broadcasts, tasks
+from app.models.notification import Notification, NotificationBroadcast
+from app.models.task import QueuedTask
+from app.models.user import Profile, User, UserRole
+
+
+@pytest.fixture
+def Session(Session, monkeypatch):
+    monkeypatch.setattr(tasks, "SessionLocal", Session)
+    monkeypatch.setattr(broadcasts, "SessionLocal", Session)
+    monkeypatch.setattr(broadcasts, "BROADCAST_BATCH_SIZE", 2)
+
+    db = Session()
+    for i in range(5):
+        user = User(clerk_user_id=f"s{i}", email=f"s{i}@example.com", first_name="S", last_name=str(i), role=UserRole.STUDENT)
+        db.add(user)
+        db.flush()
+        db.add(Profile(user_id=user.id))
+    db.commit()
+    db.close()
+    return Session
+
+
+def queue_broadcast(db):
+    broadcast = broadcasts.create_broadcast(db, "Drive", "Placement drive on Monday")
+    queued = tasks.enqueue(db, "broadcasts.deliver", broadcast_id=broadcast.id)
+    db.commit()
+    return broadcast.id, queued.id
+
+
+def run_next_attempt(db):
+    db.execute(update(QueuedTask).values(run_at=datetime.now()))
+    db.commit()
+    rows = tasks.claim_tasks(db, "worker", 1)
+    assert len(rows) == 1
+    tasks.run_task(rows[0], "worker")
+    db.expire_all()
+
+
+def fail_second_batch(monkeypatch, times):
+    original = broadcasts._next_batch_upper_bound
+    calls = {"n": 0, "failures": 0}
+
+    def flaky(db, recipients, last_id):
+        calls["n"] += 1
+        if last_id and calls["failures"] < times:
+            calls["failures"] += 1
+            raise RuntimeError("connection reset")
+        return original(db, recipients, last_id)
+
+    monkeypatch.setattr(broadcasts, "_next_batch_upper_bound", flaky)
+
+
+def test_failed_delivery_is_retried_and_resumes(Session, monkeypatch):
+    db = Session()
+    broadcast_id, task_id = queue_broadcast(db)
+    fail_second_batch(monkeypatch, times=1)
+
+    run_next_attempt(db)
+    broadcast = db.get(NotificationBroadcast, broadcast_id)
+    assert broadcast.status == "Sending" and broadcast.error == "connection reset"
+    queued = db.get(QueuedTask, task_id)
+    assert queued.status == "queued" and queued.payload == {"broadcast_id": broadcast_id}
+
+    run_next_attempt(db)
+    broadcast = db.get(NotificationBroadcast, broadcast_id)
+    assert broadcast.status == "Completed" and broadcast.error is None
+    assert broadcast.delivered_count == 5
+    assert db.query(Notification).count() == 5
+    queued = db.get(QueuedTask, task_id)
+    assert queued.status == "succeeded" and queued.payload == {}
+
+
+def test_broadcast_is_failed_only_after_the_last_attempt(Session, monkeypatch):
+    db = Session()
+    broadcast_id, task_id = queue_broadcast(db)
+    db.execute(update(QueuedTask).values(max_attempts=2))
+    fail_second_batch(monkeypatch, times=2)
+
+    run_next_attempt(db)
+    assert db.get(NotificationBroadcast, broadcast_id).status == "Sending"
+
+    run_next_attempt(db)
+    assert db.get(NotificationBroadcast, broadcast_id).status == "Failed"
+    queued = db.get(QueuedTask, task_id)
+    assert queued.status == "failed" and queued.payload == {}
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import httpx
+from sqlalchemy import event
+
+from app.core import clerk_sync
+from app.models.counter import StatCounter
+from app.models.user import User, UserRole
+
+
+def clerk_user(i, **overrides):
+    return {
+        "id": f"user_{i}",
+        "first_name": "First",
+        "last_name": str(i),
+        "primary_email_address_id": f"idn_{i}",
+        "email_addresses": [
+            {"id": f"idn_other_{i}", "email_address": f"old{i}@example.com"},
+            {"id": f"idn_{i}", "email_address": f"user{i}@example.com"},
+        ],
+        "unsafe_metadata": {"role": "tpo" if i % 5 == 0 else "student"},
+        **overrides,
+    }
+
+
+def fake_clerk(users):
+    """MockTransport standing in for the Clerk users API"""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path == "/v1/users/count":
+            return httpx.Response(200, json={"object": "total_count", "total_count": len(users)})
+        limit = int(request.url.params["limit"])
+        offset = int(request.url.params["offset"])
+        if offset == 0 and not any(r.url.params.get("offset") == "0" for r in requests[:-1]):
+            # First request for the first page is rate limited once
+            return httpx.Response(429, headers={"retry-after": "0"})
+        return httpx.Response(200, content=json.dumps(users[offset:offset + limit]))
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+
+def test_upsert_creates_and_updates_in_one_statement(engine, db):
+    db.add(User(clerk_user_id="user_1", email="stale@example.com", first_name="Old", last_name="Name",
+                role=UserRole.TPO, is_approved=False))
+    db.add(User(clerk_user_id="local_abc", email="user2@example.com", first_name="Local", last_name="User",
+                role=UserRole.STUDENT))
+    db.commit()
+
+    inserts = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith("INSERT INTO users") else None)
+
+    counts = clerk_sync.upsert_clerk_users(db, [clerk_user(i) for i in range(1, 5)] + [{"id": "user_noemail"}])
+    db.commit()
+
+    assert counts == {"created": 2, "updated": 1, "skipped": 2}
+    assert len(inserts) == 1
+    updated = db.query(User).filter(User.clerk_user_id == "user_1").one()
+    # Email and names are refreshed; role and approval are kept
+    assert (updated.email, updated.first_name, updated.role, updated.is_approved) == \
+        ("user1@example.com", "First", UserRole.TPO, False)
+    # The email held by the local account is left alone
+    assert db.query(User).filter(User.email == "user2@example.com").one().clerk_user_id == "local_abc"
+    assert db.query(User).filter(User.clerk_user_id == "user_3").one().is_approved
+
+
+def test_sync_pages_through_clerk(FileSession, monkeypatch):
+    # Pages are written from several threads, each on its own connection as in production
+    monkeypatch.setattr(clerk_sync, "SessionLocal", FileSession)
+    users = [clerk_user(i) for i in range(1, 12)]
+    client, requests = fake_clerk(users)
+
+    totals = asyncio.run(clerk_sync.sync_all_clerk_users(page_size=4, concurrency=2, client=client))
+
+    assert totals == {"created": 11, "updated": 0, "skipped": 0, "failed_pages": 0}
+    page_offsets = sorted(int(r.url.params["offset"]) for r in requests if r.url.path == "/v1/users")
+    assert page_offsets == [0, 0, 4, 8]
+    db = FileSession()
+    assert db.query(User).count() == 11
+    students = db.query(StatCounter).filter(StatCounter.name == "students_total").one()
+    assert students.value == 9
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+import rsa
+from jose import jwk, jwt
+
+from app.core.clerk_tokens import InvalidSessionToken, JWKSCache, verify_session_token
+from app.core.config import settings
+
+
+class LocalSigningKeys:
+    """Stand-in for Clerk: signs session tokens and serves the matching JWKS"""
+
+    def __init__(self):
+        self.keys = {}
+        self.fetches = 0
+        self.rotate()
+
+    def rotate(self) -> str:
+        kid = f"ins_{len(self.keys) + 1}"
+        _, private = rsa.newkeys(1024)
+        self.keys[kid] = private.save_pkcs1().decode()
+        return kid
+
+    def jwks(self, kids=None):
+        keys = []
+        for kid in kids or self.keys:
+            public = jwk.construct(self.keys[kid], "RS256").public_key().to_dict()
+            keys.append({**public, "kid": kid, "use": "sig", "alg": "RS256"})
+        return {"keys": keys}
+
+    def cache(self, ttl_seconds=3600, min_refresh_seconds=0):
+        async def fetch():
+            self.fetches += 1
+            return self.jwks()
+        return JWKSCache(fetch, ttl_seconds, min_refresh_seconds)
+
+    def token(self, kid=None, **claims):
+        kid = kid or next(iter(self.keys))
+        now = int(time.time())
+        payload = {"sub": "user_123", "iat": now, "nbf": now, "exp": now + 60,
+                   "iss": "https://clerk.example.com", "azp": "http://localhost:3000", **claims}
+        return jwt.encode(payload, self.keys[kid], algorithm="RS256", headers={"kid": kid})
+
+
+def verify(token, cache):
+    return asyncio.run(verify_session_token(token, cache))
+
+
+def test_valid_token_is_verified_from_cached_keys():
+    clerk = LocalSigningKeys()
+    cache = clerk.cache()
+    for _ in range(3):
+        assert verify(clerk.token(), cache)["sub"] == "user_123"
+    assert clerk.fetches == 1
+
+
+def test_expired_and_tampered_tokens_are_rejected():
+    clerk = LocalSigningKeys()
+    cache = clerk.cache()
+    with pytest.raises(InvalidSessionToken):
+        verify(clerk.token(exp=int(time.time()) - 60), cache)
+
+    header, payload, signature = clerk.token().split(".")
+    forged = jwt.encode({"sub": "admin"}, clerk.keys["ins_1"], algorithm="RS256").split(".")[1]
+    with pytest.raises(InvalidSessionToken):
+        verify(".".join([header, forged, signature]), cache)
+
+
+def test_rotated_key_triggers_one_refresh():
+    clerk = LocalSigningKeys()
+    cache = clerk.cache()
+    verify(clerk.token(), cache)
+
+    new_kid = clerk.rotate()
+    assert verify(clerk.token(kid=new_kid), cache)["sub"] == "user_123"
+    assert clerk.fetches == 2
+
+
+def test_unknown_keys_do_not_refetch_within_min_interval():
+    clerk = LocalSigningKeys()
+    cache = clerk.cache(min_refresh_seconds=60)
+    verify(clerk.token(), cache)
+
+    stranger = LocalSigningKeys()
+    stranger.keys = {"ins_other": stranger.keys.pop("ins_1")}
+    for _ in range(3):
+        with pytest.raises(InvalidSessionToken):
+            verify(stranger.token(), cache)
+    assert clerk.fetches == 1
+
+
+def test_issuer_and_authorized_party_checks(monkeypatch):
+    clerk = LocalSigningKeys()
+    cache = clerk.cache()
+    monkeypatch.setattr(settings, "CLERK_JWT_ISSUER", "https://clerk.example.com")
+    monkeypatch.setattr(settings, "CLERK_AUTHORIZED_PARTIES", ["http://localhost:3000"])
+    assert verify(clerk.token(), cache)["sub"] == "user_123"
+
+    with pytest.raises(InvalidSessionToken):
+        verify(clerk.token(iss="https://evil.example.com"), cache)
+    with pytest.raises(InvalidSessionToken):
+        verify(clerk.token(azp="https://evil.example.com"), cache)
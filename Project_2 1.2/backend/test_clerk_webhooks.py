@@ -0,0 +1,115 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+from sqlalchemy import event
+
+from app.core import clerk_webhooks
+from app.core.config import settings
+from app.models.task import QueuedTask
+from app.models.user import User
+from app.models.webhook import ClerkWebhookEvent
+
+SECRET = "whsec_" + base64.b64encode(b"local-test-secret").decode()
+
+
+def sign(svix_id, body, timestamp=None):
+    timestamp = str(timestamp or int(time.time()))
+    key = base64.b64decode(SECRET.removeprefix("whsec_"))
+    digest = hmac.new(key, f"{svix_id}.{timestamp}.".encode() + body, hashlib.sha256).digest()
+    return {"svix-id": svix_id, "svix-timestamp": timestamp, "svix-signature": "v1," + base64.b64encode(digest).decode()}
+
+
+def user_event(event_type, clerk_user_id, first_name="Ada", updated_at=1):
+    data = {"id": clerk_user_id}
+    if event_type != "user.deleted":
+        data.update({
+            "first_name": first_name,
+            "last_name": "Lovelace",
+            "primary_email_address_id": "idn_1",
+            "email_addresses": [{"id": "idn_1", "email_address": f"{clerk_user_id}@example.com"}],
+            "updated_at": updated_at,
+        })
+    return {"type": event_type, "data": data}
+
+
+@pytest.fixture
+def client(api_client, Session, monkeypatch):
+    monkeypatch.setattr(settings, "CLERK_WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(clerk_webhooks, "SessionLocal", Session)
+    return api_client, Session
+
+
+def post(client, svix_id, payload, headers=None):
+    body = json.dumps(payload).encode()
+    return client.post("/api/v1/clerk/webhook", content=body, headers=headers or sign(svix_id, body))
+
+
+def test_signature_is_required(client):
+    client, _ = client
+    body = json.dumps(user_event("user.created", "user_1")).encode()
+    headers = sign("msg_1", body)
+
+    tampered = body.replace(b"Ada", b"Eve")
+    assert client.post("/api/v1/clerk/webhook", content=tampered, headers=headers).status_code == 400
+    stale = sign("msg_1", body, timestamp=int(time.time()) - 3600)
+    assert client.post("/api/v1/clerk/webhook", content=body, headers=stale).status_code == 400
+    assert client.post("/api/v1/clerk/webhook", content=body, headers=headers).status_code == 200
+
+
+def test_redeliveries_are_stored_once_and_bursts_share_one_task(client):
+    client, Session = client
+    payload = user_event("user.created", "user_1")
+    assert post(client, "msg_1", payload).json() == {"message": "Event received"}
+    assert post(client, "msg_1", payload).json() == {"message": "Duplicate event"}
+    for i in range(2, 6):
+        post(client, f"msg_{i}", user_event("user.created", f"user_{i}"))
+
+    db = Session()
+    assert db.query(ClerkWebhookEvent).count() == 5
+    assert db.query(QueuedTask).filter(QueuedTask.name == clerk_webhooks.APPLY_TASK).count() == 1
+    # Nothing is written to users until the inbox is drained
+    assert db.query(User).count() == 0
+
+
+def test_batch_collapses_events_per_user(client):
+    client, Session = client
+    post(client, "msg_1", user_event("user.created", "user_1"))
+    post(client, "msg_2", user_event("user.updated", "user_1", first_name="Augusta", updated_at=3))
+    # An older update delivered late does not win
+    post(client, "msg_3", user_event("user.updated", "user_1", first_name="Stale", updated_at=2))
+    post(client, "msg_4", user_event("user.created", "user_2"))
+    post(client, "msg_5", user_event("user.deleted", "user_2"))
+
+    engine = Session.kw["bind"]
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    clerk_webhooks.apply_webhook_events()
+
+    db = Session()
+    users = db.query(User).all()
+    assert [(user.clerk_user_id, user.first_name) for user in users] == [("user_1", "Augusta")]
+    assert {e.status for e in db.query(ClerkWebhookEvent)} == {"processed"}
+    assert sum(1 for s in statements if s.startswith("INSERT INTO users")) == 1
+
+
+def test_late_update_does_not_recreate_a_deleted_user(client):
+    client, Session = client
+    post(client, "msg_1", user_event("user.created", "user_1"))
+    clerk_webhooks.apply_webhook_events()
+    post(client, "msg_2", user_event("user.deleted", "user_1"))
+    clerk_webhooks.apply_webhook_events()
+
+    # An update from before the delete, delivered in a later batch
+    post(client, "msg_3", user_event("user.updated", "user_1", first_name="Stale", updated_at=2))
+    post(client, "msg_4", user_event("user.created", "user_2"))
+    clerk_webhooks.apply_webhook_events()
+
+    db = Session()
+    assert [user.clerk_user_id for user in db.query(User)] == ["user_2"]
+    assert {e.status for e in db.query(ClerkWebhookEvent)} == {"processed"}
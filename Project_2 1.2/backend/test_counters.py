@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from app.api.v1.events import delete_event
+from app.api.v1.tpo import delete_tpo_event
+from app.api.v1.users import delete_user
+from app.core import counters
+from app.models.counter import StatCounter
+from app.models.event import Event, EventRegistration
+from app.models.file import FileUpload
+from app.models.user import User, UserRole
+
+
+def counter_value(db, name):
+    row = db.query(StatCounter).filter(StatCounter.name == name).first()
+    return row.value if row else None
+
+
+def seed(db):
+    tpo = User(clerk_user_id="tpo", email="tpo@example.com", first_name="T", last_name="P", role=UserRole.TPO)
+    students = [
+        User(clerk_user_id=f"s{i}", email=f"s{i}@example.com", first_name="S", last_name=str(i), role=UserRole.STUDENT)
+        for i in range(3)
+    ]
+    db.add_all([tpo, *students])
+    db.flush()
+    events = [
+        Event(title=f"Event {i}", description="d", location="Hall", event_date=datetime(2030, 1, 1),
+              event_time="10:00", created_by=tpo.id)
+        for i in range(2)
+    ]
+    db.add_all(events)
+    db.flush()
+    for event in events:
+        for student in students:
+            db.add(EventRegistration(event_id=event.id, user_id=student.id))
+    for student in students:
+        db.add(FileUpload(user_id=student.id, file_name="cv.pdf", file_path=f"uploads/{student.id}.pdf",
+                          file_size=10, mime_type="application/pdf", file_type="resume"))
+    db.commit()
+    # Counters as they stand after a reconcile
+    counters.reconcile_counters(db)
+    return students, events
+
+
+def test_missing_counter_is_seeded_from_recount(db):
+    seed(db)
+    db.query(StatCounter).delete()
+    db.add(FileUpload(user_id=1, file_name="cv.pdf", file_path="uploads/new.pdf", file_size=10,
+                      mime_type="application/pdf", file_type="resume"))
+    counters.bump_file_counter(db, "resume")
+    db.commit()
+    # The recount already includes the new upload, so it is not counted twice
+    assert counter_value(db, "resumes_uploaded") == 4
+
+
+def test_concurrent_seed_falls_back_to_increment(db, monkeypatch):
+    recount = counters.recount
+
+    def racing_recount(db, name):
+        # Another transaction seeds the counter between our UPDATE and INSERT
+        db.execute(StatCounter.__table__.insert().values(name=name, value=10))
+        return recount(db, name)
+
+    monkeypatch.setattr(counters, "recount", racing_recount)
+    counters.bump_counter(db, counters.JOBS_TOTAL, 2)
+    db.commit()
+    assert counter_value(db, counters.JOBS_TOTAL) == 12
+
+
+def test_deleting_events_releases_registrations(db):
+    _, events = seed(db)
+    assert counter_value(db, counters.EVENT_REGISTRATIONS_TOTAL) == 6
+
+    delete_event(events[0].id, db)
+    assert counter_value(db, counters.EVENT_REGISTRATIONS_TOTAL) == 3
+    delete_tpo_event(events[1].id, db)
+    assert counter_value(db, counters.EVENT_REGISTRATIONS_TOTAL) == 0
+    assert counters.reconcile_counters(db) == {}
+
+
+def test_deleting_user_releases_registrations_and_uploads(db):
+    students, _ = seed(db)
+
+    student_id = students[0].id
+    delete_user(student_id, db)
+    assert db.query(EventRegistration).filter(EventRegistration.user_id == student_id).count() == 0
+    assert db.query(FileUpload).filter(FileUpload.user_id == student_id).count() == 0
+    assert counter_value(db, counters.STUDENTS_TOTAL) == 2
+    assert counter_value(db, counters.EVENT_REGISTRATIONS_TOTAL) == 4
+    assert counter_value(db, "resumes_uploaded") == 2
+    assert counters.reconcile_counters(db) == {}
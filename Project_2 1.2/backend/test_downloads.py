@@ -0,0 +1,67 @@
+import hashlib
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.downloads import FileMeta, serve_local_file
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "cv.pdf"
+    path.write_bytes(CONTENT)
+    files = {
+        "hashed": FileMeta(str(path), "cv.pdf", "application/pdf", hashlib.sha256(CONTENT).hexdigest(), None),
+        "legacy": FileMeta(str(path), "cv.pdf", "application/pdf", None, None),
+    }
+
+    app = FastAPI()
+
+    @app.get("/{name}")
+    async def download(name: str, request: Request):
+        return await serve_local_file(request, files[name])
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("name", ["hashed", "legacy"])
+def test_if_none_match_with_the_sent_etag_is_not_modified(client, name):
+    response = client.get(f"/{name}")
+    assert response.status_code == 200 and response.content == CONTENT
+    etag = response.headers["etag"]
+
+    revalidated = client.get(f"/{name}", headers={"if-none-match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert client.get(f"/{name}", headers={"if-none-match": '"other"'}).status_code == 200
+
+
+def test_range_returns_partial_content(client):
+    response = client.get("/hashed", headers={"range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+    suffix = client.get("/hashed", headers={"range": "bytes=-5"})
+    assert suffix.status_code == 206 and suffix.content == CONTENT[-5:]
+
+    outside = client.get("/hashed", headers={"range": f"bytes={len(CONTENT)}-"})
+    assert outside.status_code == 416
+
+
+def test_if_range_uses_strong_comparison(client):
+    etag = client.get("/hashed").headers["etag"]
+    assert client.get("/hashed", headers={"range": "bytes=0-9", "if-range": etag}).status_code == 206
+    # A weak form of the same tag, or a different one, gets the whole file
+    for if_range in (f"W/{etag}", '"other"'):
+        response = client.get("/hashed", headers={"range": "bytes=0-9", "if-range": if_range})
+        assert response.status_code == 200 and response.content == CONTENT
+
+    # Rows without a hash only have a weak validator, so ranges need no If-Range
+    weak = client.get("/legacy").headers["etag"]
+    assert weak.startswith("W/")
+    assert client.get("/legacy", headers={"range": "bytes=0-9", "if-range": weak}).status_code == 200
+    assert client.get("/legacy", headers={"range": "bytes=0-9"}).status_code == 206
@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.db.session import get_async_db
+from app.api.v1.notifications import mark_all_read
+from app.models.notification import Notification, NotificationBroadcast, NotificationType
+from app.models.user import User, UserRole
+
+
+@pytest.fixture
+def inbox(file_engine, FileSession):
+    import main
+    db = FileSession()
+    db.add(User(clerk_user_id="s1", email="s1@example.com", first_name="S", last_name="1", role=UserRole.STUDENT))
+    db.flush()
+    for i in range(7):
+        # Server-default timestamps mixed with Python-set ones, whole seconds included
+        created_at = [datetime(2030, 1, 1, 9, 30, 0, 500000), datetime(2030, 1, 1, 9, 30, 0), None][i % 3]
+        db.add(Notification(user_id=1, title=f"n{i}", message="m", notification_type=NotificationType.SYSTEM,
+                            is_read=(i == 4), created_at=created_at))
+    db.commit()
+
+    async_engine = create_async_engine(file_engine.url.set(drivername="sqlite+aiosqlite"))
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+    statements = []
+    event.listen(async_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, *args: statements.append((statement, parameters)))
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as session:
+            yield session
+
+    main.app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        yield TestClient(main.app), db, file_engine, statements
+    finally:
+        main.app.dependency_overrides.pop(get_async_db, None)
+        db.close()
+
+
+def test_unread_pages_are_read_in_index_order(inbox):
+    client, db, engine, statements = inbox
+    seen, cursor = [], None
+    while True:
+        response = client.get("/api/v1/notifications/user/1", params={"limit": 2, "unread_only": True, "cursor": cursor})
+        assert response.status_code == 200
+        seen += [n["id"] for n in response.json()]
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+
+    expected = [n.id for n in db.query(Notification).filter(Notification.is_read == False)
+                .order_by(Notification.created_at.desc(), Notification.id.desc())]
+    assert seen == expected and len(seen) == 6
+
+    page_query, parameters = next((s, p) for s, p in statements if "notifications.created_at <" in s)
+    assert "julianday" not in page_query and "NULLS" not in page_query
+    with engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + page_query, parameters))
+    assert "ix_notifications_user_id_is_read_created_at_id" in plan and "TEMP B-TREE" not in plan
+
+
+def test_mark_all_read_counts_the_rows_it_updates(inbox):
+    _, db, _, _ = inbox
+    broadcast = NotificationBroadcast(title="Drive", message="m", read_count=1, delivered_count=3)
+    db.add(broadcast)
+    db.flush()
+    db.query(Notification).filter(Notification.id <= 3).update(
+        {Notification.broadcast_id: broadcast.id}, synchronize_session=False)
+    db.query(Notification).filter(Notification.id == 1).update({Notification.is_read: True}, synchronize_session=False)
+    db.commit()
+
+    # Seven notifications, of which 1 and 5 (is_read set when seeded) were already read
+    assert mark_all_read(1, db) == {"user_id": 1, "updated": 5}
+    db.expire_all()
+    assert db.get(NotificationBroadcast, broadcast.id).read_count == 3
+    assert db.query(Notification).filter(Notification.is_read == False).count() == 0
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.job_search import install_search_index, render_highlight, search_jobs
+from app.models.job import Job
+from app.models.user import User, UserRole
+
+
+@pytest.fixture
+def database(file_engine, FileSession):
+    db = FileSession()
+    tpo = User(email="tpo@example.com", first_name="T", last_name="P", role=UserRole.TPO, clerk_user_id="user_tpo")
+    db.add(tpo)
+    db.flush()
+    # Rows that exist before the index is installed are picked up by the rebuild
+    db.add(Job(title="Data Engineer", company="Acme <Labs>", location="Pune",
+               description="Build pipelines in Python and Spark", requirements="SQL", created_by=tpo.id))
+    db.commit()
+    install_search_index(file_engine)
+    install_search_index(file_engine)  # Idempotent
+    db.add_all([
+        Job(title="Frontend Developer", company="Globex", location="Mumbai",
+            description="React work for the data engineering team", requirements="JavaScript", created_by=tpo.id),
+        Job(title="Sales Associate", company="Initech", location="Pune",
+            description="Selling", requirements="None", created_by=tpo.id, is_active=False),
+    ])
+    db.commit()
+    try:
+        yield db, file_engine.url.set(drivername="sqlite+aiosqlite")
+    finally:
+        db.close()
+
+
+def search(url, query, **kwargs):
+    async def run():
+        engine = create_async_engine(url)
+        try:
+            async with AsyncSession(engine) as db:
+                return await search_jobs(db, query, kwargs.pop("limit", 20), **kwargs)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+def test_prefix_terms_rank_title_matches_first(database):
+    _, url = database
+    results, has_more = search(url, "data engin")
+    assert [r["job"].title for r in results] == ["Data Engineer", "Frontend Developer"]
+    assert results[0]["rank"] > results[1]["rank"]
+    assert results[0]["title_highlight"] == "<mark>Data</mark> <mark>Engineer</mark>"
+    assert "<mark>engineering</mark>" in results[1]["snippet"]
+    assert has_more is False
+
+    results, has_more = search(url, "data engin", limit=1)
+    assert len(results) == 1 and has_more is True
+
+
+def test_index_follows_updates_deletes_and_active_flag(database):
+    db, url = database
+    assert search(url, "pune")[0][0]["job"].title == "Data Engineer"
+    assert len(search(url, "pune", include_inactive=True)[0]) == 2
+
+    job = db.query(Job).filter(Job.title == "Sales Associate").one()
+    job.title = "Sales Engineer"
+    db.commit()
+    assert [r["job"].id for r in search(url, "engineer", include_inactive=True)[0]].count(job.id) == 1
+    db.delete(job)
+    db.commit()
+    assert search(url, "sales", include_inactive=True)[0] == []
+
+
+def test_query_syntax_and_markup_are_inert(database):
+    _, url = database
+    assert search(url, 'NEAR("x" OR) title:*')[0] == []
+    assert search(url, "   ---  ")[0] == []
+    assert render_highlight("Acme <Labs> \ue000Data\ue001") == "Acme &lt;Labs&gt; <mark>Data</mark>"
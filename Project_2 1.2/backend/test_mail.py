@@ -0,0 +1,150 @@
+import socketserver
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from app.core.config import settings
+from app.core.mail import MAIL_OUTBOX_SIZE, MailError, MailRejected, MailService
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Minimal SMTP stand-in that records connections and accepted messages"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.refused = set()
+        self.drop_after_each_message = False
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                if address in server.refused:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while (chunk := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(chunk)
+                server.messages.append((recipients, b"".join(data)))
+                self.reply("250 Queued")
+                if server.drop_after_each_message:
+                    return
+            elif command in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+@contextmanager
+def local_smtp(monkeypatch):
+    server = LocalSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "MAIL_BACKEND", "smtp")
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_USE_SSL", False)
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    monkeypatch.setattr(settings, "SMTP_FROM", "PrepSphere <noreply@example.com>")
+    monkeypatch.setattr(settings, "SMTP_RATE_LIMIT_PER_MINUTE", 0)
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_messages_share_one_connection(monkeypatch):
+    with local_smtp(monkeypatch) as server:
+        service = MailService()
+        for i in range(5):
+            service.send(f"user{i}@example.com", "Hello", "Body")
+        service.close()
+
+    assert server.connections == 1
+    assert [recipients for recipients, _ in server.messages] == [[f"user{i}@example.com"] for i in range(5)]
+    assert b"Subject: Hello" in server.messages[0][1]
+
+
+def test_dropped_connection_is_replaced(monkeypatch):
+    with local_smtp(monkeypatch) as server:
+        server.drop_after_each_message = True
+        service = MailService()
+        service.send("a@example.com", "First", "Body")
+        service.send("b@example.com", "Second", "Body")
+        service.close()
+
+    assert len(server.messages) == 2
+    assert server.connections == 2
+
+
+def test_refused_recipient_is_permanent(monkeypatch):
+    with local_smtp(monkeypatch) as server:
+        server.refused.add("gone@example.com")
+        service = MailService()
+        with pytest.raises(MailRejected):
+            service.send("gone@example.com", "Hello", "Body")
+        # The connection survives a refused recipient
+        service.send("ok@example.com", "Hello", "Body")
+        service.close()
+
+    assert server.connections == 1
+    assert len(server.messages) == 1
+
+
+def test_memory_backend(monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_BACKEND", "memory")
+    service = MailService()
+    service.send("user@example.com", "Reset", "Link")
+    assert [msg["To"] for msg in service.outbox] == ["user@example.com"]
+
+
+def test_memory_backend_keeps_a_bounded_outbox(monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_BACKEND", "memory")
+    service = MailService()
+    for i in range(MAIL_OUTBOX_SIZE + 5):
+        service.send(f"user{i}@example.com", "Reset", "Link")
+    assert len(service.outbox) == MAIL_OUTBOX_SIZE
+    assert service.outbox[-1]["To"] == f"user{MAIL_OUTBOX_SIZE + 4}@example.com"
+
+
+def test_unconfigured_mail_fails_instead_of_dropping_messages(monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_BACKEND", "")
+    monkeypatch.setattr(settings, "SMTP_USER", "")
+    service = MailService()
+    with pytest.raises(MailError):
+        service.send("user@example.com", "Reset", "Link")
+    assert len(service.outbox) == 0
+    assert service._pool is None
@@ -0,0 +1,39 @@
+import bcrypt
+from werkzeug.security import generate_password_hash
+
+from app.core import passwords
+from app.core.config import settings
+
+
+def test_new_hashes_use_configured_rounds(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 4)
+    hashed = passwords.hash_password("secret")
+    assert hashed.startswith("$2b$04$")
+    assert passwords.verify_password("secret", hashed) == (True, None)
+    assert passwords.verify_password("wrong", hashed) == (False, None)
+
+
+def test_legacy_werkzeug_hash_is_upgraded(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 4)
+    legacy = generate_password_hash("secret")
+
+    valid, new_hash = passwords.verify_password("secret", legacy)
+    assert valid
+    assert new_hash.startswith("$2b$04$")
+    assert passwords.verify_password("secret", new_hash) == (True, None)
+
+    assert passwords.verify_password("wrong", legacy) == (False, None)
+
+
+def test_old_work_factor_is_upgraded(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_BCRYPT_ROUNDS", 5)
+    old = bcrypt.hashpw(b"secret", bcrypt.gensalt(rounds=4)).decode()
+
+    valid, new_hash = passwords.verify_password("secret", old)
+    assert valid
+    assert new_hash.startswith("$2b$05$")
+
+
+def test_unknown_or_missing_hash_is_rejected():
+    assert passwords.verify_password("secret", None) == (False, None)
+    assert passwords.verify_password("secret", "plaintext") == (False, None)
@@ -0,0 +1,76 @@
+import base64
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.core.streaming import JsonBase64FieldReader
+from app.models.user import User, UserRole
+
+CONTENT = bytes(range(256)) * 3
+
+
+def read_in_chunks(body: bytes, size: int, **kwargs):
+    reader = JsonBase64FieldReader("content_base64", **kwargs)
+    decoded = b"".join(reader.feed(body[i:i + size]) for i in range(0, len(body), size))
+    return reader, decoded, reader.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4, 5, 64, 10_000])
+def test_every_chunk_boundary_decodes_the_same(chunk_size):
+    # "/" escaped as "\/" and a line-wrapped value, as some encoders emit
+    encoded = base64.encodebytes(CONTENT).decode()
+    body = json.dumps({"user_id": 1, "content_base64": encoded, "file_name": "a.pdf"}).replace("/", "\\/").encode()
+
+    reader, decoded, fields = read_in_chunks(body, chunk_size)
+    assert decoded == CONTENT
+    assert fields == {"user_id": 1, "content_base64": "", "file_name": "a.pdf"}
+    assert not reader.invalid
+
+
+@pytest.mark.parametrize("value", ["QUJD", "QUI=", "QQ=="])
+def test_padding_is_accepted_at_the_end(value):
+    reader, decoded, _ = read_in_chunks(json.dumps({"content_base64": value}).encode(), 3)
+    assert decoded == base64.b64decode(value)
+    assert not reader.invalid
+
+
+@pytest.mark.parametrize("value", ["QUJ", "QQ==QUJD", "QQ==\n QUJD", "QU*D", "QUJDQ"])
+def test_invalid_base64_is_recorded_and_the_rest_still_parsed(value):
+    body = json.dumps({"content_base64": value, "file_name": "a.pdf"}).encode()
+    reader, _, fields = read_in_chunks(body, 2)
+    assert reader.invalid
+    assert fields["file_name"] == "a.pdf"
+
+
+def test_max_size_stops_decoding():
+    body = json.dumps({"content_base64": base64.b64encode(CONTENT).decode(), "file_name": "a.pdf"}).encode()
+    reader, decoded, fields = read_in_chunks(body, 64, max_size=100)
+    assert reader.too_large and len(decoded) <= 100
+    assert fields["file_name"] == "a.pdf"
+
+
+@pytest.fixture
+def client(api_client, Session, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "UPLOAD_FOLDER", str(tmp_path))
+    db = Session()
+    db.add(User(clerk_user_id="s1", email="s1@example.com", first_name="S", last_name="1", role=UserRole.STUDENT))
+    db.commit()
+    db.close()
+    return api_client
+
+
+def test_upload_errors_keep_their_original_order(client):
+    fields = {"user_id": 1, "file_name": "a.pdf", "mime_type": "application/pdf", "file_type": "resume"}
+
+    def post(**overrides):
+        response = client.post("/api/v1/files/upload", json={**fields, **overrides})
+        return response.status_code, response.json().get("detail")
+
+    # Missing fields and unknown users are reported before bad content
+    assert post(content_base64="!!!!", file_type=None) == (400, "Missing fields")
+    assert post(content_base64="!!!!", user_id=99) == (404, "User not found")
+    assert post(content_base64="!!!!") == (400, "Invalid base64 content")
+    assert post(content_base64="") == (400, "Missing fields")
+
+    assert post(content_base64=base64.b64encode(b"%PDF-1.4").decode())[0] == 200
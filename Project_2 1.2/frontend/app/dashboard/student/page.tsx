@@ -160,6 +160,16 @@ export default function StudentDashboard() {
     refreshNotifications()
   }, [activeTab, userId])
 
+  useEffect(() => {
+    if (!userId) return
+    const source = new EventSource(`${API_BASE}/api/v1/notifications/user/${userId}/stream`)
+    source.addEventListener('notification', (e) => {
+      const n = JSON.parse((e as MessageEvent).data)
+      setNotifications(prev => prev.some(p => p.id === n.id) ? prev : [{ id: n.id, title: n.title, message: n.message, time: new Date(n.created_at).toLocaleString(), read: n.is_read, sent_by: n.sent_by }, ...prev])
+    })
+    return () => source.close()
+  }, [userId])
+
   useEffect(() => {
     const refreshJobs = async () => {
       try {